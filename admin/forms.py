@@ -1,18 +1,25 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SelectField, BooleanField, IntegerField, FloatField, FieldList, FormField, PasswordField
-from wtforms.validators import DataRequired, Length, NumberRange, Optional
+from wtforms.validators import DataRequired, Length, NumberRange, Optional, Regexp, ValidationError
 from wtforms.widgets import TextArea
+from quiz.models import SLUG_PATTERN
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
 
 class QuizForm(FlaskForm):
+    slug = StringField('URL Slug', validators=[DataRequired(), Length(max=100),
+                                               Regexp(SLUG_PATTERN, message='Lowercase letters, digits and hyphens')],
+                       description='Served at /q/<slug>/; versions of one quiz share a slug')
     title = StringField('Quiz Title', validators=[DataRequired(), Length(min=1, max=200)])
     description = TextAreaField('Description', validators=[Optional(), Length(max=1000)])
     is_active = BooleanField('Active', default=True)
     version = StringField('Version', validators=[Optional(), Length(max=50)], default='v1')
 
+class QuizVersionForm(FlaskForm):
+    version = StringField('New Version', validators=[DataRequired(), Length(max=50)])
+
 class QuestionOptionForm(FlaskForm):
     option = StringField('Option', validators=[DataRequired(), Length(min=1, max=200)])
 
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
-from database import db, Quiz, Question, QuizSession, Response, Result
-from admin.forms import LoginForm, QuizForm, QuestionForm
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app, Response, stream_with_context
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from quiz import db
+from quiz.models import Quiz, QuizPointer, Question, CompletedQuiz
+from admin.forms import LoginForm, QuizForm, QuizVersionForm, QuestionForm
 from utils.security import sanitize_input
+from quiz.services import QuizService, catalog_cache
+from quiz.analytics import DashboardStats
+from quiz.funnel import funnel_report
 from functools import wraps
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -21,8 +27,9 @@ def login():
         username = sanitize_input(form.username.data)
         password = form.password.data
         
-        if (username == current_app.config['ADMIN_USERNAME'] and 
-            password == current_app.config['ADMIN_PASSWORD']):
+        expected = current_app.config.get('ADMIN_PASSWORD')
+        if (expected and username == current_app.config['ADMIN_USERNAME'] and 
+            password == expected):
             session['admin_logged_in'] = True
             flash('Login successful!', 'success')
             return redirect(url_for('admin.dashboard'))
@@ -41,44 +48,49 @@ def logout():
 @admin_bp.route('/dashboard')
 @admin_required
 def dashboard():
-    # Get stats
-    total_sessions = QuizSession.query.count()
-    completed_sessions = QuizSession.query.filter(QuizSession.completed_at.isnot(None)).count()
-    total_questions = Question.query.filter_by(is_active=True).count()
+    # Get stats from the pre-aggregated rollups
+    stats = DashboardStats.load()
+    total_questions = len(catalog_cache.get().questions)
     total_quizzes = Quiz.query.filter_by(is_active=True).count()
     
-    completion_rate = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
-    
-    # Recent sessions
-    recent_sessions = QuizSession.query.order_by(QuizSession.started_at.desc()).limit(10).all()
+    # Recent completions (primary key order, no scan)
+    recent_sessions = CompletedQuiz.query.order_by(CompletedQuiz.id.desc()).limit(10).all()
     
     return render_template('admin/dashboard.html', 
-                         total_sessions=total_sessions,
-                         completed_sessions=completed_sessions,
+                         total_sessions=stats['starts'],
+                         completed_sessions=stats['completions'],
                          total_questions=total_questions,
                          total_quizzes=total_quizzes,
-                         completion_rate=completion_rate,
+                         completion_rate=stats['completion_rate'],
                          recent_sessions=recent_sessions)
 
 @admin_bp.route('/quizzes')
 @admin_required
 def quizzes():
-    quizzes = Quiz.query.all()
-    return render_template('admin/quizzes.html', quizzes=quizzes)
+    quizzes = Quiz.query.order_by(Quiz.slug, Quiz.id).all()
+    live = {pointer.quiz_id for pointer in QuizPointer.query.all()}
+    return render_template('admin/quizzes.html', quizzes=quizzes, live=live, version_form=QuizVersionForm())
 
 @admin_bp.route('/quiz/new', methods=['GET', 'POST'])
 @admin_required
 def new_quiz():
     form = QuizForm()
     if form.validate_on_submit():
+        version = sanitize_input(form.version.data, 50) or 'v1'
+        if Quiz.query.filter_by(slug=form.slug.data, version=version).first():
+            flash(f'{form.slug.data} already has a version {version}', 'error')
+            return render_template('admin/quiz_form.html', form=form, title='New Quiz')
         quiz = Quiz(
+            slug=form.slug.data,
             title=sanitize_input(form.title.data),
             description=sanitize_input(form.description.data, 1000),
             is_active=form.is_active.data,
-            version=sanitize_input(form.version.data)
+            version=version
         )
         db.session.add(quiz)
         db.session.commit()
+        if db.session.get(QuizPointer, quiz.slug) is None:
+            QuizService.activate_quiz(quiz.id)  # first version of a new slug goes live
         flash('Quiz created successfully!', 'success')
         return redirect(url_for('admin.quizzes'))
     
@@ -94,14 +106,47 @@ def edit_quiz(quiz_id):
         quiz.title = sanitize_input(form.title.data)
         quiz.description = sanitize_input(form.description.data, 1000)
         quiz.is_active = form.is_active.data
-        quiz.version = sanitize_input(form.version.data)
+        quiz.version = sanitize_input(form.version.data, 50) or quiz.version
         
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash(f'{quiz.slug} already has a version {form.version.data}', 'error')
+            return render_template('admin/quiz_form.html', form=form, title='Edit Quiz', quiz=quiz)
+        catalog_cache.invalidate()  # is_active may take the slug's pointer offline
         flash('Quiz updated successfully!', 'success')
         return redirect(url_for('admin.quizzes'))
     
     return render_template('admin/quiz_form.html', form=form, title='Edit Quiz', quiz=quiz)
 
+@admin_bp.route('/quiz/<int:quiz_id>/activate', methods=['POST'])
+@admin_required
+def activate_quiz(quiz_id):
+    """Make this version live for its slug; running sessions finish on theirs."""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    QuizService.activate_quiz(quiz.id)
+    flash(f'{quiz.slug} {quiz.version} is now live', 'success')
+    return redirect(url_for('admin.quizzes'))
+
+@admin_bp.route('/quiz/<int:quiz_id>/copy', methods=['POST'])
+@admin_required
+def copy_quiz(quiz_id):
+    """Copy a quiz and its questions into a new draft version."""
+    quiz = Quiz.query.get_or_404(quiz_id)
+    form = QuizVersionForm()
+    if not form.validate_on_submit():
+        flash('A version name is required', 'error')
+        return redirect(url_for('admin.quizzes'))
+    version = sanitize_input(form.version.data, 50)
+    if Quiz.query.filter_by(slug=quiz.slug, version=version).first():
+        flash(f'{quiz.slug} already has a version {version}', 'error')
+        return redirect(url_for('admin.quizzes'))
+    
+    draft = QuizService.copy_quiz(quiz.id, version)
+    flash(f'Created {draft.slug} {draft.version}; activate it when ready', 'success')
+    return redirect(url_for('admin.quiz_questions', quiz_id=draft.id))
+
 @admin_bp.route('/quiz/<int:quiz_id>/questions')
 @admin_required
 def quiz_questions(quiz_id):
@@ -134,6 +179,7 @@ def new_question(quiz_id):
         
         db.session.add(question)
         db.session.commit()
+        catalog_cache.invalidate(quiz_id)
         flash('Question created successfully!', 'success')
         return redirect(url_for('admin.quiz_questions', quiz_id=quiz_id))
     
@@ -165,6 +211,7 @@ def edit_question(question_id):
             question.options = None
         
         db.session.commit()
+        catalog_cache.invalidate(question.quiz_id)
         flash('Question updated successfully!', 'success')
         return redirect(url_for('admin.quiz_questions', quiz_id=question.quiz_id))
     
@@ -178,46 +225,67 @@ def delete_question(question_id):
     
     db.session.delete(question)
     db.session.commit()
+    catalog_cache.invalidate(quiz_id)
     flash('Question deleted successfully!', 'success')
     return redirect(url_for('admin.quiz_questions', quiz_id=quiz_id))
 
 @admin_bp.route('/analytics')
 @admin_required
 def analytics():
-    # Session analytics
-    total_sessions = QuizSession.query.count()
-    completed_sessions = QuizSession.query.filter(QuizSession.completed_at.isnot(None)).count()
-    
-    # Response analytics
-    total_responses = Response.query.count()
-    
-    # Result type distribution
-    result_distribution = db.session.query(
-        Result.result_type,
-        db.func.count(Result.id).label('count')
-    ).group_by(Result.result_type).all()
+    days = request.args.get('days', 30, type=int)
+    quiz_id = request.args.get('quiz_id', type=int)
+    if quiz_id is not None:
+        Quiz.query.get_or_404(quiz_id)
+    stats = DashboardStats.load(quiz_id=quiz_id, days=days)
+    questions = QuizService.questions_by_id(quiz_id)
+    funnel = funnel_report(quiz_id=quiz_id, start=datetime.utcnow() - timedelta(days=days))
     
     return render_template('admin/analytics.html',
-                         total_sessions=total_sessions,
-                         completed_sessions=completed_sessions,
-                         total_responses=total_responses,
-                         result_distribution=result_distribution)
+                         total_sessions=stats['starts'],
+                         completed_sessions=stats['completions'],
+                         completion_rate=stats['completion_rate'],
+                         result_distribution=stats['result_distribution'],
+                         answer_histograms=stats['answer_histograms'],
+                         daily=stats['daily'],
+                         funnel=funnel,
+                         questions=questions,
+                         quizzes=Quiz.query.order_by(Quiz.slug, Quiz.id).all(),
+                         quiz_id=quiz_id)
 
 @admin_bp.route('/export/responses')
 @admin_required
 def export_responses():
-    # This would generate CSV export of responses
-    # For now, return JSON
-    responses = Response.query.join(Question).join(QuizSession).all()
-    
-    data = []
-    for response in responses:
-        data.append({
-            'session_id': response.session_id,
-            'question_text': response.question.question_text,
-            'question_type': response.question.question_type,
-            'answer': response.answer_value,
-            'created_at': response.created_at.isoformat() if response.created_at else None
-        })
-    
-    return jsonify(data)
\ No newline at end of file
+    """Stream responses as CSV (default) or NDJSON.
+    
+    Query parameters: format=csv|ndjson, quiz_id, start and end (ISO dates,
+    on completion time). Archived completions are included. Output is
+    gzip-compressed when the client accepts it.
+    """
+    from quiz.export import FORMATS, iter_completions, iter_answer_records, gzip_chunks
+    from quiz.retention import archive_root
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in FORMATS:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    try:
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start/end must be ISO dates'}), 400
+    quiz_id = request.args.get('quiz_id', type=int)
+    if quiz_id is not None:
+        Quiz.query.get_or_404(quiz_id)
+    
+    mimetype, render = FORMATS[export_format]
+    questions = QuizService.questions_by_id(quiz_id)
+    completions = iter_completions(quiz_id=quiz_id, start=start, end=end,
+                                   archive_dir=archive_root(current_app))
+    records = iter_answer_records(completions, questions)
+    body = render(records)
+    
+    headers = {'Content-Disposition': f'attachment; filename=responses.{export_format}'}
+    if 'gzip' in request.accept_encodings:
+        body = gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
@@ -1,21 +1,24 @@
 #!/usr/bin/env python3
 """
-Astroveda Quiz System - Entry Point
+Astroveda Quiz System - Development Entry Point
 
-A Flask-based quiz application with modular architecture.
+A Flask-based quiz application with modular architecture. This runs the
+single-process development server; production uses wsgi.py with gunicorn.
 """
 
 import os
 import signal
 import sys
+from config import config_name_from_env
 from quiz import create_app
 
 def find_and_kill_existing_process():
-    """Find and kill any existing Flask processes on port 8000."""
+    """Find and kill any existing Flask processes on the dev port."""
     try:
-        # Find process using port 8000
+        # Find process using the port
         import subprocess
-        result = subprocess.run(['lsof', '-ti:8000'], capture_output=True, text=True)
+        port = os.environ.get('PORT', '8000')
+        result = subprocess.run(['lsof', f'-ti:{port}'], capture_output=True, text=True)
         if result.returncode == 0 and result.stdout.strip():
             pids = result.stdout.strip().split('\n')
             for pid in pids:
@@ -32,31 +35,29 @@ def signal_handler(sig, frame):
     print('\nShutting down gracefully...')
     sys.exit(0)
 
-# Create the Flask application
-app = create_app('development')
-
-# Debug: Print registered routes
-print("Registered routes:")
-for rule in app.url_map.iter_rules():
-    print(f"  {rule.rule} -> {rule.endpoint}")
+# Create the Flask application (use wsgi.py with gunicorn in production)
+app = create_app(config_name_from_env())
 
 if __name__ == '__main__':
     # Handle Ctrl+C gracefully
     signal.signal(signal.SIGINT, signal_handler)
     
-    # Only kill existing processes if this is the main process (not auto-reload)
-    if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+    debug = app.config.get('DEBUG', False)
+    port = int(os.environ.get('PORT', 8000))
+    
+    # Only kill stale dev servers, and only in the main process (not auto-reload)
+    if debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
         find_and_kill_existing_process()
-        print("Starting Flask app on http://127.0.0.1:8000")
+        print(f"Starting Flask app on http://127.0.0.1:{port}")
     
     try:
-        app.run(debug=True, port=8000)
+        app.run(debug=debug, port=port)
     except OSError as e:
-        if "Address already in use" in str(e):
-            print("Port 8000 is still in use. Trying to force kill and restart...")
+        if debug and "Address already in use" in str(e):
+            print(f"Port {port} is still in use. Trying to force kill and restart...")
             find_and_kill_existing_process()
             import time
             time.sleep(1)
-            app.run(debug=True, port=8000)
+            app.run(debug=debug, port=port)
         else:
-            raise
\ No newline at end of file
+            raise
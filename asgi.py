@@ -0,0 +1,13 @@
+"""ASGI entry point for async servers.
+
+    uvicorn asgi:app --workers 4
+
+Needs an ASGI server (uvicorn, hypercorn) and, for async completion writes,
+aiosqlite or asyncpg; neither is required by the WSGI deployment. The config
+is chosen by FLASK_CONFIG (or FLASK_ENV) and defaults to production.
+"""
+
+from config import config_name_from_env
+from quiz.asgi import create_asgi_app
+
+app = create_asgi_app(config_name_from_env(default='production'))
@@ -0,0 +1,4 @@
+"""Benchmark scripts for the quiz application.
+
+Run from the repository root, e.g. ``python -m benchmarks.bench_options``.
+"""
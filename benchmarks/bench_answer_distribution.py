@@ -0,0 +1,92 @@
+"""Benchmark: per-question answer distribution, JSON scan vs. completed_answers.
+
+Generates N synthetic completions (with their normalized answers) in a
+throwaway SQLite database, then times "how many chose each option for
+question Q" by decoding every CompletedQuiz.responses blob and by the
+indexed GROUP BY in quiz.analytics.answer_distribution().
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app
+
+def populate(db, rows, batch_size=20000, seed=1):
+    from quiz.models import CompletedQuiz, CompletedAnswer
+    from quiz.services import catalog_cache
+    
+    rng = random.Random(seed)
+    questions = [q for q in catalog_cache.get().questions.values() if q.page_number > 1]
+    choices = {q.id: q.get_options() or ['yes', 'no'] for q in questions}
+    completions = CompletedQuiz.__table__
+    answers = CompletedAnswer.__table__
+    started = datetime(2025, 1, 1)
+    
+    next_id = 1
+    while next_id <= rows:
+        quiz_batch, answer_batch = [], []
+        for completion_id in range(next_id, min(next_id + batch_size, rows + 1)):
+            responses = {str(qid): rng.choice(options) for qid, options in choices.items()}
+            completed_at = started + timedelta(seconds=completion_id * 30)
+            quiz_batch.append({
+                'id': completion_id, 'session_id': f'bench-{completion_id}', 'quiz_id': 1,
+                'user_ip': '127.0.0.1', 'user_agent': 'bench', 'started_at': completed_at,
+                'completed_at': completed_at, 'result_type': 'Type A', 'result_data': '{}',
+                'responses': json.dumps(responses)
+            })
+            answer_batch.extend(
+                {'completion_id': completion_id, 'quiz_id': 1, 'question_id': int(qid),
+                 'answer': answer, 'completed_at': completed_at}
+                for qid, answer in responses.items()
+            )
+        db.session.execute(completions.insert(), quiz_batch)
+        db.session.execute(answers.insert(), answer_batch)
+        db.session.commit()
+        next_id += batch_size
+    return questions[0].id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='completed quizzes to generate')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    app = make_app(ROLLUPS_ENABLED=False)
+    from quiz import db
+    from quiz.analytics import answer_distribution
+    from quiz.models import CompletedQuiz
+    
+    with app.app_context():
+        start = time.perf_counter()
+        question_id = populate(db, args.rows)
+        print(f"generated {args.rows} completions in {time.perf_counter() - start:.1f}s")
+        
+        def json_scan():
+            counts = Counter()
+            table = CompletedQuiz.__table__
+            for (responses,) in db.session.execute(
+                db.select(table.c.responses).where(table.c.quiz_id == 1)
+            ):
+                answer = json.loads(responses).get(str(question_id))
+                if answer is not None:
+                    counts[answer] += 1
+            return counts.most_common()
+        
+        def indexed():
+            return answer_distribution(1, question_id)
+        
+        for label, fn in (('JSON scan of completed_quizzes', json_scan),
+                          ('GROUP BY on completed_answers index', indexed)):
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = fn()
+                timings.append(time.perf_counter() - start)
+            print(f"{label:<40} best {min(timings) * 1000:10.1f} ms  -> {list(result)[:2]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark: NDJSON response export vs. the columnar export.
+
+Generates N synthetic completions, writes them once as the per-answer
+NDJSON export (quiz.export) and once as a columnar .npy export
+(quiz.columnar), and reports output size, write time and the time to load
+every answer back (json.loads per line vs. reading the column files).
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_answer_distribution import populate
+from benchmarks.common import make_app
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='completed quizzes to generate')
+    args = parser.parse_args()
+    
+    app = make_app(ROLLUPS_ENABLED=False)
+    from quiz import db
+    from quiz.columnar import export_columnar, load_export
+    from quiz.export import iter_answer_records, iter_completions, ndjson_chunks
+    from quiz.services import QuizService
+    
+    out = tempfile.mkdtemp(prefix='quiz-bench-export-')
+    json_path = os.path.join(out, 'responses.ndjson')
+    columnar_dir = os.path.join(out, 'columnar')
+    
+    with app.app_context():
+        start = time.perf_counter()
+        populate(db, args.rows)
+        print(f"generated {args.rows} completions in {time.perf_counter() - start:.1f}s")
+        questions = QuizService.questions_by_id()
+        
+        start = time.perf_counter()
+        with open(json_path, 'w', encoding='utf-8') as f:
+            for chunk in ndjson_chunks(iter_answer_records(iter_completions(chunk_size=5000), questions)):
+                f.write(chunk)
+        json_write = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        export_columnar(columnar_dir, lambda after_id: iter_completions(chunk_size=5000, after_id=after_id),
+                        questions, log=lambda message: None)
+        columnar_write = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    answers = 0
+    with open(json_path, encoding='utf-8') as f:
+        for line in f:
+            json.loads(line)
+            answers += 1
+    json_load = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    exported = load_export(columnar_dir)
+    columns = sum(len(part) for column in exported['answers'].values() for part in column)
+    columnar_load = time.perf_counter() - start
+    assert columns == answers * len(exported['answers'])
+    
+    json_size, columnar_size = os.path.getsize(json_path), directory_size(columnar_dir)
+    print(f"{answers} answers")
+    print(f"{'':<12} {'size MB':>10} {'write s':>10} {'load s':>10}")
+    print(f"{'ndjson':<12} {json_size / 1e6:10.1f} {json_write:10.2f} {json_load:10.2f}")
+    print(f"{'columnar':<12} {columnar_size / 1e6:10.1f} {columnar_write:10.2f} {columnar_load:10.2f}")
+    print(f"size ratio {json_size / columnar_size:.1f}x, load speedup {json_load / columnar_load:.1f}x")
+
+if __name__ == '__main__':
+    main()
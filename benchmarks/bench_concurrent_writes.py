@@ -0,0 +1,145 @@
+"""Benchmark: completion throughput with concurrent writer processes.
+
+Several processes (standing in for gunicorn workers) each insert single
+completions through QuizService.save_completions, one transaction per
+completion as a synchronous /submit does, while reader processes run the
+per-question answer distribution like the admin dashboard. Runs once with
+the stock SQLite settings (rollback journal, full fsync) and once with the
+DB_SQLITE_PRAGMAS profile, each on a fresh database file.
+
+    python -m benchmarks.bench_concurrent_writes --writers 4 --readers 2 --seconds 5
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+RESPONSES = {
+    '1': 'Bench User', '2': '1990-04-12', '3': 'Urban', '4': 'Learning something new',
+    '5': 'yes', '6': 'Take time alone to think', '7': 'yes', '8': 'Observe and analyze', '9': 'no',
+}
+
+VARIANTS = {
+    'stock sqlite': {},
+    'tuned (DB_SQLITE_PRAGMAS)': None,  # None keeps the config default
+}
+
+def _app(database_path, pragmas):
+    from quiz import create_app
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database_path,
+        'SESSION_STORE': 'cookie',
+        'ROLLUPS_ENABLED': False,
+        'LOG_LEVEL': 'WARNING',
+    }
+    if pragmas is not None:
+        overrides['DB_SQLITE_PRAGMAS'] = pragmas
+    return create_app('production', config_overrides=overrides)
+
+def _record():
+    now = datetime.utcnow()
+    return {
+        'session_id': uuid.uuid4().hex, 'quiz_id': 1, 'user_ip': '127.0.0.1',
+        'user_agent': 'bench', 'started_at': now, 'completed_at': now,
+        'result_type': 'Type A', 'result_data': '{"result_type": "Type A"}',
+        'responses': json.dumps(RESPONSES),
+    }
+
+def _writer(database_path, pragmas, start_at, deadline, results):
+    from quiz import db
+    from quiz.services import QuizService
+    app = _app(database_path, pragmas)
+    done = errors = 0
+    latencies = []
+    time.sleep(max(0.0, start_at - time.time()))
+    with app.app_context():
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                QuizService.save_completions([_record()])
+                done += 1
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('write', done, errors, latencies))
+
+def _reader(database_path, pragmas, start_at, deadline, results):
+    from quiz import db
+    from quiz.analytics import answer_distribution
+    app = _app(database_path, pragmas)
+    done = errors = 0
+    latencies = []
+    time.sleep(max(0.0, start_at - time.time()))
+    with app.app_context():
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                answer_distribution(1, 4)
+                db.session.rollback()
+                done += 1
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('read', done, errors, latencies))
+
+def run_variant(pragmas, writers, readers, seconds):
+    database_path = os.path.join(tempfile.mkdtemp(prefix='quiz-bench-'), 'bench.db')
+    app = _app(database_path, pragmas)
+    with app.app_context():
+        from quiz import init_database
+        init_database(seed=True)
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + 3  # let every interpreter boot before the clock starts
+    deadline = start_at + seconds
+    processes = [context.Process(target=_writer, args=(database_path, pragmas, start_at, deadline, results))
+                 for _ in range(writers)]
+    processes += [context.Process(target=_reader, args=(database_path, pragmas, start_at, deadline, results))
+                  for _ in range(readers)]
+    for process in processes:
+        process.start()
+    totals = {'write': [0, 0, []], 'read': [0, 0, []]}
+    for _ in processes:
+        kind, done, errors, latencies = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+        totals[kind][2].extend(latencies)
+    for process in processes:
+        process.join()
+    return totals
+
+def _p99(latencies):
+    if not latencies:
+        return float('nan')
+    return sorted(latencies)[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, ~{args.seconds:.0f}s per variant")
+    print(f"{'variant':<28} {'writes/s':>9} {'w p99 ms':>9} {'w errors':>9} "
+          f"{'reads/s':>8} {'r p99 ms':>9} {'r errors':>9}")
+    for label, pragmas in VARIANTS.items():
+        totals = run_variant(pragmas, args.writers, args.readers, args.seconds)
+        writes, write_errors, write_latencies = totals['write']
+        reads, read_errors, read_latencies = totals['read']
+        print(f"{label:<28} {writes / args.seconds:9.0f} {_p99(write_latencies) * 1e3:9.1f} "
+              f"{write_errors:9d} {reads / args.seconds:8.0f} {_p99(read_latencies) * 1e3:9.1f} "
+              f"{read_errors:9d}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Micro-benchmark: memoized Question.get_options() vs. decoding on every call.
+
+Renders templates/questions.html for each seeded page with the options JSON
+either re-parsed on every template access (the previous behaviour) or
+decoded once per loaded row.
+"""
+
+import argparse
+import json
+from datetime import date
+
+from flask import render_template
+
+from benchmarks.common import make_app, best_of, report
+
+def legacy_get_options(self):
+    """The previous implementation: parse the JSON on every call."""
+    if self.options:
+        try:
+            return json.loads(self.options)
+        except json.JSONDecodeError:
+            return []
+    return []
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=2000, help='renders per timing run')
+    args = parser.parse_args()
+    
+    app = make_app()
+    from quiz.models import Question
+    
+    with app.test_request_context():
+        rows = Question.query.order_by(Question.page_number, Question.order_index).all()
+        pages = {}
+        for row in rows:
+            pages.setdefault(row.page_number, []).append(row)
+        max_page = max(pages)
+        
+        def render(questions, page):
+            return render_template('questions.html', questions=questions, page=page,
+                                   max_page=max_page, existing_responses={}, today=date.today())
+        
+        def run_both(fn):
+            memoized = Question.get_options
+            Question.get_options = legacy_get_options
+            try:
+                legacy = best_of(fn, args.number)
+            finally:
+                Question.get_options = memoized
+            return legacy, best_of(fn, args.number)
+        
+        legacy_call, memo_call = run_both(lambda: [q.get_options() for q in pages[2]])
+        report('get_options() x page 2, decode every call', legacy_call)
+        report('get_options() x page 2, memoized', memo_call)
+        
+        for page in sorted(pages):
+            legacy, memo = run_both(lambda: render(pages[page], page))
+            report(f'render page {page}, decode every call', legacy)
+            report(f'render page {page}, memoized', memo)
+            print(f"{'  saving per render':<45} {(legacy - memo) * 1e6:10.2f} us")
+
+if __name__ == '__main__':
+    main()
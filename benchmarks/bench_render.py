@@ -0,0 +1,55 @@
+"""Benchmark: question/landing page rendering with and without the page cache.
+
+Requests go through the Flask test client with a live quiz session, so the
+numbers include routing and session handling, not just Jinja. Compares
+rendering every request (optionally gzipping the whole body, as a generic
+compression middleware would) with the per-catalog-version page cache that
+splices the user's answers into a cached, gzip-precompressed page.
+
+    python -m benchmarks.bench_render --number 500
+"""
+
+import argparse
+import gzip
+
+from benchmarks.common import best_of, make_app, report
+
+ANSWERS = {'4': 'Learning something new', '5': 'yes', '6': 'Take time alone to think'}
+
+def _client(cache_enabled):
+    app = make_app(PAGE_CACHE_ENABLED=cache_enabled, SESSION_STORE='memory', LOG_LEVEL='WARNING')
+    client = app.test_client()
+    client.get('/begin')
+    client.post('/save_answers', json={'answers': ANSWERS})
+    return client
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=500)
+    args = parser.parse_args()
+    
+    uncached = _client(False)
+    cached = _client(True)
+    gzip_headers = {'Accept-Encoding': 'gzip'}
+    
+    def render_and_gzip():
+        gzip.compress(uncached.get('/questions/2').data, 6)
+    
+    report('questions: render per request', best_of(lambda: uncached.get('/questions/2'), args.number))
+    report('questions: render + gzip per request', best_of(render_and_gzip, args.number))
+    report('questions: page cache, identity', best_of(lambda: cached.get('/questions/2'), args.number))
+    report('questions: page cache, gzip', best_of(lambda: cached.get('/questions/2', headers=gzip_headers), args.number))
+    
+    plain = cached.get('/questions/2').data
+    packed = cached.get('/questions/2', headers=gzip_headers).data
+    assert gzip.decompress(packed) == plain
+    
+    # The landing page ends the quiz session, so it goes last
+    etag = cached.get('/').headers['ETag']
+    report('landing: render per request', best_of(lambda: uncached.get('/'), args.number))
+    report('landing: page cache', best_of(lambda: cached.get('/'), args.number))
+    report('landing: page cache, 304', best_of(lambda: cached.get('/', headers={'If-None-Match': etag}), args.number))
+    print(f"questions page body: {len(plain)} B identity, {len(packed)} B gzip")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: cookie-held quiz state vs. server-side session stores.
+
+Drives one full quiz flow per iteration through the Flask test client and
+reports the session cookie the browser would upload on each request, the
+Set-Cookie bytes sent back, and CPU time per request for each backend.
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.common import make_app
+
+BACKENDS = ('cookie', 'memory', 'sqlite')
+
+ANSWERS = {
+    1: 'Alexandra Montgomery-Whitfield', 2: '1990-04-12', 3: 'Suburban',
+    4: 'Learning something new', 5: 'yes', 6: 'Take time alone to think',
+    7: 'yes', 8: 'Observe and analyze', 9: 'no',
+}
+
+def run_flow(client, samples):
+    """One user: begin, autosave every answer, submit each page, view results."""
+    def request(method, url, **kwargs):
+        cookie = client.get_cookie('session')
+        sent = len(cookie.value) if cookie else 0
+        start = time.process_time()
+        response = getattr(client, method)(url, **kwargs)
+        cpu = time.process_time() - start
+        received = sum(len(v) for v in response.headers.getlist('Set-Cookie'))
+        samples.append((sent, received, cpu))
+        return response
+    
+    request('get', '/begin')
+    for page, question_ids in ((1, (1, 2, 3)), (2, (4, 5, 6)), (3, (7, 8, 9))):
+        request('get', f'/questions/{page}')
+        for question_id in question_ids:
+            request('post', '/save_answer', json={'question_id': question_id, 'answer': ANSWERS[question_id]})
+        form = {f'question_{qid}': ANSWERS[qid] for qid in question_ids}
+        form['next_page'] = 'results' if page == 3 else str(page + 1)
+        request('post', '/submit', data=form)
+    request('get', '/results')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200, help='quiz flows per backend')
+    args = parser.parse_args()
+    
+    print(f"{'backend':<8} {'cookie up (avg/max B)':>22} {'set-cookie (avg B)':>19} {'cpu/request (us)':>17}")
+    for backend in BACKENDS:
+        app = make_app(SESSION_STORE=backend, RATE_LIMIT_ENABLED=False)
+        samples = []
+        for _ in range(args.users):
+            run_flow(app.test_client(), samples)
+        sent = [s[0] for s in samples]
+        received = [s[1] for s in samples]
+        cpu = [s[2] for s in samples]
+        print(f"{backend:<8} {statistics.mean(sent):>14.0f} / {max(sent):<5} "
+              f"{statistics.mean(received):>19.0f} {statistics.mean(cpu) * 1e6:>17.1f}")
+
+if __name__ == '__main__':
+    main()
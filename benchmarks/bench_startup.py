@@ -0,0 +1,73 @@
+"""Benchmark: cold application startup.
+
+Each sample is a fresh interpreter that imports the app factory and builds
+the app, the way a gunicorn worker (or `flask` CLI call) boots. Compares the
+old boot path (create_all + seed + admin on every start) with the lean path
+used in production, where schema and seed data are deploy-time steps.
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+from quiz import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1], config_overrides=json.loads(sys.argv[2]))
+built = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': built - imported,
+    'modules': len(sys.modules),
+}))
+'''
+
+VARIANTS = {
+    'eager (create_all + seed + admin)': {'AUTO_INIT_DB': True, 'ADMIN_ENABLED': True},
+    'lean (production default)': {'AUTO_INIT_DB': False, 'ADMIN_ENABLED': False},
+}
+
+def boot(overrides, database_path):
+    config = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database_path,
+        'SESSION_STORE': 'sqlite',
+        'SESSION_STORE_PATH': database_path + '.sessions',
+        'LOG_LEVEL': 'WARNING',
+    }
+    config.update(overrides)
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, 'production', json.dumps(config)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='quiz-bench-')
+    database_path = os.path.join(tmpdir, 'bench.db')
+    # Seed once so the eager variant measures the steady-state reboot cost
+    boot(VARIANTS['eager (create_all + seed + admin)'], database_path)
+
+    print(f"{'variant':<36} {'import ms':>10} {'create_app ms':>14} {'modules':>8}")
+    for label, overrides in VARIANTS.items():
+        samples = [boot(overrides, database_path) for _ in range(args.runs)]
+        print(f"{label:<36} "
+              f"{statistics.median(s['import'] for s in samples) * 1e3:10.1f} "
+              f"{statistics.median(s['create_app'] for s in samples) * 1e3:14.1f} "
+              f"{max(s['modules'] for s in samples):8d}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Shared helpers for the benchmark scripts."""
+
+import os
+import tempfile
+import time
+
+def make_app(config_name='development', **overrides):
+    """Create an app bound to a throwaway SQLite database."""
+    tmpdir = tempfile.mkdtemp(prefix='quiz-bench-')
+    config_overrides = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmpdir, 'bench.db'),
+        'SESSION_STORE_PATH': os.path.join(tmpdir, 'sessions.db'),
+    }
+    config_overrides.update(overrides)
+    from quiz import create_app
+    return create_app(config_name, config_overrides=config_overrides)
+
+def best_of(fn, number, repeat=5):
+    """Return the best per-call time in seconds over `repeat` runs of `number` calls."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def report(label, seconds):
+    """Print one benchmark line in microseconds."""
+    print(f"{label:<45} {seconds * 1e6:10.2f} us")
@@ -0,0 +1,339 @@
+"""Load generator for the full quiz flow.
+
+Each simulated user runs /begin -> /questions/<n> -> /save_answer (one per
+answer) -> /submit for every page -> /results. Users run concurrently on a
+thread pool, either in-process against quiz.create_app through the Flask
+test client (the default) or over HTTP against a running server (--url).
+
+Reported per endpoint are latency percentiles, request counts and errors.
+Also reported are overall throughput, the session cookie size each request
+uploads, and (in-process only) SQL statements per request. Use --output to
+save the report as JSON and --compare to diff it against an earlier run:
+
+    python -m benchmarks.loadtest --users 2000 --concurrency 64 --output after.json
+    python -m benchmarks.loadtest --compare before.json after.json
+"""
+
+import argparse
+import http.cookiejar
+import json
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+
+class QuestionFormParser(HTMLParser):
+    """Collect question field names, candidate answers and next_page from a page."""
+    
+    def __init__(self):
+        super().__init__()
+        self.answers = {}
+        self.next_page = None
+        self._select = None
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get('name', '')
+        if tag == 'input' and name == 'next_page':
+            self.next_page = attrs.get('value')
+        elif tag == 'input' and name.startswith('question_'):
+            kind = attrs.get('type')
+            if kind == 'radio':
+                self.answers.setdefault(name, []).append(attrs.get('value'))
+            elif kind == 'date':
+                self.answers[name] = ['1990-01-01']
+            else:
+                self.answers[name] = ['Load Test User']
+        elif tag == 'select' and name.startswith('question_'):
+            self._select = name
+        elif tag == 'option' and self._select and attrs.get('value'):
+            self.answers.setdefault(self._select, []).append(attrs['value'])
+    
+    def handle_endtag(self, tag):
+        if tag == 'select':
+            self._select = None
+
+class Stats:
+    """Thread-safe per-endpoint samples."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sql = defaultdict(list)
+        self.cookie_bytes = []
+    
+    def add(self, endpoint, seconds, ok, sql_count, cookie_size):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if sql_count is not None:
+                self.sql[endpoint].append(sql_count)
+            self.cookie_bytes.append(cookie_size)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class TestClientTransport:
+    """In-process requests through the Flask test client, with SQL counting."""
+    
+    def __init__(self, app):
+        from sqlalchemy import event
+        from quiz import db
+        
+        self.app = app
+        self._local = threading.local()
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._count_sql)
+    
+    def _count_sql(self, *args):
+        self._local.sql = getattr(self._local, 'sql', 0) + 1
+    
+    def session(self):
+        return self.app.test_client()
+    
+    def request(self, client, method, path, data=None, json_body=None):
+        cookie = client.get_cookie('session')
+        self._local.sql = 0
+        if method == 'GET':
+            response = client.get(path)
+        else:
+            response = client.post(path, data=data, json=json_body)
+        return response.status_code, response.get_data(as_text=True), self._local.sql, \
+            len(cookie.value) if cookie else 0
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HTTPTransport:
+    """Requests against a running server; one cookie jar per simulated user."""
+    
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+    
+    def session(self):
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect())
+        return opener, jar
+    
+    def request(self, client, method, path, data=None, json_body=None):
+        opener, jar = client
+        cookie_size = sum(len(c.value) for c in jar if c.name == 'session')
+        body, headers = None, {}
+        if json_body is not None:
+            body, headers = json.dumps(json_body).encode(), {'Content-Type': 'application/json'}
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode(), None, cookie_size
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode(errors='replace'), None, cookie_size
+
+def run_user(transport, stats, rng_seed, autosave):
+    import random
+    rng = random.Random(rng_seed)
+    client = transport.session()
+    
+    def call(endpoint, method, path, expect, **kwargs):
+        start = time.perf_counter()
+        status, body, sql_count, cookie_size = transport.request(client, method, path, **kwargs)
+        stats.add(endpoint, time.perf_counter() - start, status in expect, sql_count, cookie_size)
+        return status, body
+    
+    call('begin', 'GET', '/begin', (302,))
+    page = '1'
+    while page != 'results':
+        status, body = call('questions_page', 'GET', f'/questions/{page}', (200,))
+        if status != 200:
+            return
+        parser = QuestionFormParser()
+        parser.feed(body)
+        answers = {name: rng.choice(values) for name, values in parser.answers.items() if values}
+        
+        if autosave == 'batch':
+            call('save_answers', 'POST', '/save_answers', (200,),
+                 json_body={'answers': {name.split('_')[1]: value for name, value in answers.items()}})
+        else:
+            for name, value in answers.items():
+                call('save_answer', 'POST', '/save_answer', (200,),
+                     json_body={'question_id': int(name.split('_')[1]), 'answer': value})
+        
+        page = parser.next_page or 'results'
+        call('submit', 'POST', '/submit', (302,), data=dict(answers, next_page=page))
+    call('results', 'GET', '/results', (200,))
+
+def run_single_page_user(transport, stats, rng_seed, catalog_cache):
+    """One user in QUIZ_MODE=single_page: shell, catalog JSON, one JSON submit, results.
+    
+    The catalog is fetched once per version and then reused, as a browser
+    would from its HTTP cache.
+    """
+    import random
+    rng = random.Random(rng_seed)
+    client = transport.session()
+    
+    def call(endpoint, method, path, expect, **kwargs):
+        start = time.perf_counter()
+        status, body, sql_count, cookie_size = transport.request(client, method, path, **kwargs)
+        stats.add(endpoint, time.perf_counter() - start, status in expect, sql_count, cookie_size)
+        return status, body
+    
+    status, body = call('begin', 'GET', '/begin', (200,))
+    match = re.search(r"CATALOG_URL = '([^']+)'", body)
+    if status != 200 or not match:
+        return
+    catalog_url = match.group(1)
+    if catalog_url not in catalog_cache:
+        status, body = call('catalog', 'GET', catalog_url, (200,))
+        if status != 200:
+            return
+        catalog_cache[catalog_url] = json.loads(body)
+    
+    answers = {}
+    for page in catalog_cache[catalog_url]['pages']:
+        for question in page['questions']:
+            if question['options']:
+                answers[str(question['id'])] = rng.choice(question['options'])
+            elif question['type'] == 'yes_no':
+                answers[str(question['id'])] = rng.choice(('yes', 'no'))
+            elif question['text'] == 'Date of birth':
+                answers[str(question['id'])] = '1990-01-01'
+            else:
+                answers[str(question['id'])] = 'Load Test User'
+    
+    call('submit', 'POST', '/submit', (200,), json_body={'answers': answers})
+    call('results', 'GET', '/results', (200,))
+
+def summarize(stats, elapsed, args):
+    endpoints = {}
+    for endpoint, samples in sorted(stats.latencies.items()):
+        entry = {
+            'requests': len(samples),
+            'errors': stats.errors[endpoint],
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+            'mean_ms': statistics.mean(samples) * 1000,
+        }
+        if stats.sql[endpoint]:
+            entry['sql_per_request'] = statistics.mean(stats.sql[endpoint])
+        endpoints[endpoint] = entry
+    
+    total = sum(len(s) for s in stats.latencies.values())
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat(),
+            'target': args.url or 'test-client',
+            'users': args.users,
+            'concurrency': args.concurrency,
+            'autosave': args.autosave,
+            'mode': args.mode,
+        },
+        'elapsed_s': elapsed,
+        'requests': total,
+        'throughput_rps': total / elapsed if elapsed else 0,
+        'completed_flows_per_s': args.users / elapsed if elapsed else 0,
+        'cookie_bytes': {
+            'mean': statistics.mean(stats.cookie_bytes) if stats.cookie_bytes else 0,
+            'max': max(stats.cookie_bytes, default=0),
+        },
+        'endpoints': endpoints,
+    }
+
+def print_report(report):
+    meta = report['meta']
+    print(f"{meta['users']} users x {meta['concurrency']} concurrent against {meta['target']} "
+          f"(commit {meta['commit']})")
+    print(f"{report['requests']} requests in {report['elapsed_s']:.2f}s = "
+          f"{report['throughput_rps']:.1f} req/s; cookie mean {report['cookie_bytes']['mean']:.0f} B, "
+          f"max {report['cookie_bytes']['max']} B")
+    print(f"{'endpoint':<16} {'reqs':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8}")
+    for endpoint, e in report['endpoints'].items():
+        sql = f"{e['sql_per_request']:.2f}" if 'sql_per_request' in e else '-'
+        print(f"{endpoint:<16} {e['requests']:>7} {e['errors']:>5} {e['p50_ms']:>9.2f} "
+              f"{e['p95_ms']:>9.2f} {e['p99_ms']:>9.2f} {sql:>8}")
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    print(f"throughput {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f} req/s")
+    print(f"{'endpoint':<16} {'p95 before':>11} {'p95 after':>10} {'change':>8}")
+    for endpoint in sorted(set(before['endpoints']) | set(after['endpoints'])):
+        old = before['endpoints'].get(endpoint, {}).get('p95_ms')
+        new = after['endpoints'].get(endpoint, {}).get('p95_ms')
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new else '-'
+        print(f"{endpoint:<16} {old if old is not None else float('nan'):>11.2f} "
+              f"{new if new is not None else float('nan'):>10.2f} {change:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help='simulated users (full quiz flows)')
+    parser.add_argument('--concurrency', type=int, default=32, help='users in flight at once')
+    parser.add_argument('--url', help='base URL of a running server; default is in-process')
+    parser.add_argument('--config', default='development', help='config name for the in-process app')
+    parser.add_argument('--autosave', choices=('single', 'batch'), default='single',
+                        help='one /save_answer per answer, or one /save_answers per page')
+    parser.add_argument('--mode', choices=('pages', 'single_page'), default='pages',
+                        help='page-per-request flow, or the single-page flow (QUIZ_MODE=single_page)')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two JSON reports')
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare(*args.compare)
+        return
+    
+    if args.url:
+        transport = HTTPTransport(args.url)
+    else:
+        from benchmarks.common import make_app
+        # Every simulated user shares one client address, so the autosave
+        # limits (quiz/ratelimit.py) would measure themselves
+        transport = TestClientTransport(make_app(args.config, QUIZ_MODE=args.mode,
+                                                 RATE_LIMIT_ENABLED=False, LOAD_SHED_MAX_PENDING=0))
+    
+    stats = Stats()
+    catalogs = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if args.mode == 'single_page':
+            futures = [pool.submit(run_single_page_user, transport, stats, seed, catalogs)
+                       for seed in range(args.users)]
+        else:
+            futures = [pool.submit(run_user, transport, stats, seed, args.autosave) for seed in range(args.users)]
+        for future in futures:
+            future.result()
+    report = summarize(stats, time.perf_counter() - start, args)
+    
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
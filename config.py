@@ -8,22 +8,157 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///quiz.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Largest request body accepted; quiz forms and autosaves are a few KB
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 1024 * 1024))
+    
+    # Database tuning (see quiz/engine.py). PRAGMAs run on every new SQLite
+    # connection; the pool settings only apply to server databases.
+    DB_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',        # readers don't block the writer
+        'synchronous': 'NORMAL',      # fsync at checkpoints, safe with WAL
+        'busy_timeout': 5000,         # ms to wait for the write lock
+        'cache_size': -20000,         # ~20 MB page cache per connection
+        'mmap_size': 268435456,       # 256 MB memory-mapped reads
+        'temp_store': 'MEMORY',
+    }
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = 30  # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE = 1800  # seconds; stays under typical server idle timeouts
+    DB_POOL_PRE_PING = True
+    
+    # ASGI serving (asgi.py / quiz/asgi.py): threads that run Flask views, and
+    # the async driver URL for completion writes (derived from
+    # SQLALCHEMY_DATABASE_URI when aiosqlite/asyncpg is installed)
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+    # Threads per gunicorn worker, shared with gunicorn.conf.py
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    ASYNC_ENGINE_OPTIONS = {}
+    
+    # Run create_all + seed inside create_app. Off outside development so
+    # workers boot without touching the database; use `flask init-db` and
+    # `flask seed` as explicit deploy steps instead.
+    AUTO_INIT_DB = os.environ.get('AUTO_INIT_DB', '').lower() in ('1', 'true', 'yes')
+    
+    # Admin blueprint (/admin); skipped entirely when disabled
+    ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', '').lower() in ('1', 'true', 'yes')
+    ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME') or 'admin'
+    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD')
     
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    
+    # Where quiz state lives: 'cookie', 'memory' (single process) or 'sqlite'
+    SESSION_STORE = os.environ.get('SESSION_STORE') or 'memory'
+    SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH')  # defaults to instance/sessions.db
+    SESSION_STORE_TTL = None  # seconds; defaults to PERMANENT_SESSION_LIFETIME
+    SESSION_STORE_MAX_ENTRIES = 10000
+    
+    # Completion writes: 'sync' commits inside /submit, 'write_behind' queues
+    # them to a background group-commit writer (see quiz/writer.py)
+    COMPLETION_WRITE_MODE = os.environ.get('COMPLETION_WRITE_MODE') or 'sync'
+    COMPLETION_QUEUE_SIZE = 1000
+    COMPLETION_BATCH_SIZE = 100
+    COMPLETION_FLUSH_INTERVAL = 0.05  # seconds to wait for a batch to fill
+    COMPLETION_ENQUEUE_TIMEOUT = 0.5  # seconds before falling back to a sync write
+    COMPLETION_SPOOL_DIR = os.environ.get('COMPLETION_SPOOL_DIR')  # defaults to instance/spool; '' disables
+    COMPLETION_SPOOL_FSYNC = False
+    COMPLETION_DEDUP_SIZE = 10000  # recent session ids remembered to answer repeated submits
+    
+    # Autosave/beacon protection (see quiz/ratelimit.py). Limits are
+    # (tokens per second, burst); RATE_LIMIT_STORE is 'memory' (per process)
+    # or 'sqlite' (shared by the workers on one host)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE') or 'memory'
+    RATE_LIMIT_STORE_PATH = os.environ.get('RATE_LIMIT_STORE_PATH')  # defaults to instance/ratelimit.db
+    RATE_LIMIT_SESSION = (2.0, 30)
+    RATE_LIMIT_IP = (20.0, 300)  # several sessions can share an IP behind NAT
+    # Reverse proxies in front of the app (nginx, a load balancer) whose
+    # X-Forwarded-For/-Proto are trusted, so request.remote_addr (per-IP
+    # limits, stored user_ip) is the client rather than the proxy. Leave 0
+    # when clients connect directly, or they can spoof their address.
+    TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+    # Requests in flight per process above which autosaves and beacons get
+    # 503. Under gunicorn this counts busy threads and can never exceed
+    # GUNICORN_THREADS, so unset it is GUNICORN_THREADS - 1 (shed once every
+    # thread is busy). Under ASGI it also counts requests queued for
+    # ASGI_THREADS, and unset it is 4 x ASGI_THREADS. 0 disables.
+    LOAD_SHED_MAX_PENDING = int(os.environ['LOAD_SHED_MAX_PENDING']) if os.environ.get('LOAD_SHED_MAX_PENDING') else None
+    
+    # Retention (see quiz/retention.py): `flask retention archive` moves
+    # completions older than RETENTION_DAYS into gzip NDJSON partitions
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 365))
+    RETENTION_BATCH_SIZE = 1000
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')  # defaults to instance/archive
+    
+    # Dashboard rollups (see quiz/analytics.py)
+    ROLLUPS_ENABLED = True
+    ROLLUP_FLUSH_INTERVAL = 10.0  # seconds between background flushes
+    ROLLUP_DAILY_RETENTION_DAYS = 90  # older daily buckets are folded into months
+    
+    # Funnel events (see quiz/funnel.py): buffered in memory, flushed in bulk
+    FUNNEL_ENABLED = True
+    FUNNEL_SINK = os.environ.get('FUNNEL_SINK') or 'db'  # db (funnel_events table) or file (NDJSON)
+    FUNNEL_LOG_PATH = os.environ.get('FUNNEL_LOG_PATH')  # defaults to instance/funnel-events.ndjson
+    FUNNEL_BUFFER_SIZE = 100000  # oldest events are dropped beyond this
+    FUNNEL_FLUSH_INTERVAL = 5.0  # seconds
+    
+    # Logging (see quiz/logs.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or 'json'  # json or text
+    LOG_PAYLOADS = False  # include submitted answers in debug logs
+    LOG_SAMPLE_RATES = {'autosave': 0.01}  # fraction of records kept per event
+    
+    # Per-request instrumentation (see quiz/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+    METRICS_PATH = '/metrics'
+    
+    # Question catalog cache (seconds before a worker reloads; 0 = only on invalidation)
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+    # Seconds before a worker re-reads which version of each quiz is live
+    CATALOG_POINTER_TTL = int(os.environ.get('CATALOG_POINTER_TTL', 5))
+    
+    # Quiz served at / (the others are at /q/<slug>/); unset = first slug
+    DEFAULT_QUIZ_SLUG = os.environ.get('DEFAULT_QUIZ_SLUG')
+    
+    # 'pages' posts every question page to /submit; 'single_page' has /begin
+    # serve one client-side app that loads the versioned catalog JSON and
+    # submits all answers at the end
+    QUIZ_MODE = os.environ.get('QUIZ_MODE') or 'pages'
+    
+    # Landing/question pages rendered once per catalog version and kept
+    # gzip-precompressed (see quiz/render.py)
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_GZIP_LEVEL = 6
+    
+    # JSON scoring profile replacing quiz.scoring.DEFAULT_PROFILE
+    SCORING_PROFILE_PATH = os.environ.get('SCORING_PROFILE_PATH')
 
 class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
     TEMPLATES_AUTO_RELOAD = True
+    AUTO_INIT_DB = os.environ.get('AUTO_INIT_DB', 'true').lower() in ('1', 'true', 'yes')
+    ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD') or 'admin'
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')  # pick up template edits
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'DEBUG'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or 'text'
+    LOG_PAYLOADS = True
+    LOG_SAMPLE_RATES = {}
 
 class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
     SESSION_COOKIE_SECURE = True
+    SESSION_STORE = os.environ.get('SESSION_STORE') or 'sqlite'
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE') or 'sqlite'
+    LOG_PAYLOADS = False
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'change-this-in-production'
 
 # Configuration mapping
@@ -31,4 +166,9 @@ config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'default': DevelopmentConfig
-}
\ No newline at end of file
+}
+
+def config_name_from_env(default='default'):
+    """Pick a config name from FLASK_CONFIG, falling back to FLASK_ENV."""
+    name = os.environ.get('FLASK_CONFIG') or os.environ.get('FLASK_ENV') or default
+    return name if name in config else default
\ No newline at end of file
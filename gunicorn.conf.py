@@ -0,0 +1,49 @@
+"""Gunicorn settings for the quiz app, tunable through the environment.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Graceful reload: ``kill -HUP <master pid>`` starts fresh workers with newly
+loaded code and config, then retires the old ones after their in-flight
+requests finish. With GUNICORN_PRELOAD=1 code is loaded once in the master
+(faster spawns, less memory) and a code reload needs the USR2 + QUIT
+binary-upgrade sequence instead.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+
+# Processes x threads: threads suit the I/O-bound quiz routes
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # off unless set
+errorlog = '-'
+
+def worker_exit(server, worker):
+    """Flush queued completions, funnel events and rollup deltas before the worker goes away."""
+    app = getattr(worker, 'wsgi', None)
+    if app is None or not hasattr(app, 'extensions'):
+        return
+    writer = app.extensions.get('completion_writer')
+    if writer is not None:
+        writer.shutdown()
+    funnel = app.extensions.get('funnel')
+    if funnel is not None:
+        funnel.flush()  # abandons feed the rollups, so flush these first
+    rollups = app.extensions.get('rollups')
+    if rollups is not None:
+        rollups.flush()
@@ -1,12 +1,16 @@
 """Quiz application factory."""
 
+import logging
+import os
+import weakref
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
 # Initialize extensions
 db = SQLAlchemy()
 
-def create_app(config_name='default'):
+def create_app(config_name='default', config_overrides=None):
     """Create and configure the Flask application."""
     app = Flask(__name__, 
                 template_folder='../templates',
@@ -15,25 +19,124 @@ def create_app(config_name='default'):
     # Load configuration
     from config import config
     app.config.from_object(config[config_name])
+    if config_overrides:
+        app.config.update(config_overrides)
+    
+    # Client address and scheme from the X-Forwarded-* headers of trusted proxies
+    proxy_hops = app.config.get('TRUSTED_PROXY_HOPS', 0)
+    if proxy_hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
     
-    # Initialize extensions
+    # Initialize extensions, with the engine tuning profile (quiz/engine.py)
+    from quiz.engine import engine_options, init_engine_tuning
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    init_engine_tuning(app, db)
+    _register_fork_handler(app)
+    
+    # Structured, queue-based logging for the quiz and admin packages
+    from quiz.logs import configure_logging
+    configure_logging(app)
+    
+    # Opt-in request instrumentation; registered first so its after_request
+    # hook runs after the session store has been written
+    from quiz.metrics import init_metrics
+    init_metrics(app)
+    
+    # Token-bucket limits and load shedding for the autosave/beacon endpoints
+    from quiz.ratelimit import init_rate_limiting
+    init_rate_limiting(app)
+    
+    # Server-side quiz session state (None keeps everything in the cookie)
+    from quiz.session_store import create_session_store
+    from quiz.services import SessionService
+    app.extensions['quiz_session_store'] = create_session_store(app)
+    app.after_request(SessionService.persist_state)
+    
+    # Rendered-page cache for the landing and question pages
+    from quiz.render import PageCache
+    app.extensions['quiz_page_cache'] = PageCache.from_config(app)
+    
+    # Recently completed sessions, so repeated submits skip the database
+    from quiz.services import RecentCompletions
+    app.extensions['recent_completions'] = RecentCompletions(app.config.get('COMPLETION_DEDUP_SIZE', 10000))
+    
+    # Interned User-Agent ids, so completions store an integer
+    from quiz.retention import UserAgentCache
+    app.extensions['user_agents'] = UserAgentCache()
+    
+    # Optional background group-commit of completed quizzes
+    if app.config.get('COMPLETION_WRITE_MODE') == 'write_behind':
+        from quiz.writer import CompletionWriter
+        app.extensions['completion_writer'] = CompletionWriter.from_config(app)
+    
+    # Dashboard rollups, buffered in memory and flushed in the background
+    if app.config.get('ROLLUPS_ENABLED', True):
+        from quiz.analytics import RollupBuffer
+        app.extensions['rollups'] = RollupBuffer.from_config(app)
+    
+    # Funnel events (begin, page views, autosaves, abandons, completions)
+    if app.config.get('FUNNEL_ENABLED', True):
+        from quiz.funnel import FunnelBuffer
+        app.extensions['funnel'] = FunnelBuffer.from_config(app)
     
     # Register blueprints
     from quiz.routes import quiz_bp
     app.register_blueprint(quiz_bp)
+    app.register_blueprint(quiz_bp, url_prefix='/q/<slug>', name='quiz_scoped')
+    
+    # Admin blueprint is optional; skipping it keeps WTForms out of the boot path
+    if app.config.get('ADMIN_ENABLED'):
+        try:
+            from admin.routes import admin_bp
+            app.register_blueprint(admin_bp, url_prefix='/admin')
+        except ImportError:
+            logging.getLogger(__name__).exception("Admin blueprint unavailable")
     
-    # Register admin blueprint if needed
-    try:
-        from admin.routes import admin_bp
-        app.register_blueprint(admin_bp, url_prefix='/admin')
-    except ImportError:
-        pass  # Admin module is optional
+    # CLI commands (flask init-db, flask seed, flask upgrade-db, ...)
+    from quiz.cli import register_commands
+    register_commands(app)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Development convenience only: production schema and seed data are
+    # explicit deploy steps, so workers boot without any database I/O
+    if app.config.get('AUTO_INIT_DB'):
+        with app.app_context():
+            init_database(seed=True)
+    
+    return app
+
+def init_database(seed=True):
+    """Create missing tables, apply migrations and optionally seed sample data.
+    
+    Must be called inside an application context.
+    """
+    from quiz.migrations import upgrade
+    db.create_all()
+    applied = upgrade(log=logging.getLogger(__name__).info)
+    if seed:
         from quiz.services import QuizService
         QuizService.seed_database()
+    return applied
+
+def _register_fork_handler(app):
+    """Make the module-level `db` safe under pre-fork servers.
+    
+    Pooled connections opened in the parent (e.g. with gunicorn --preload)
+    must not be shared with workers, so each child drops the inherited pool
+    without closing the parent's sockets and opens its own connections.
+    Background threads (completion writer, rollup compactor, log listener)
+    restart themselves lazily per process.
+    """
+    app_ref = weakref.ref(app)
+    
+    def reset_after_fork():
+        app = app_ref()
+        if app is None:
+            return
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
     
-    return app
\ No newline at end of file
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=reset_after_fork)
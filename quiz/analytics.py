@@ -0,0 +1,287 @@
+"""Incremental analytics rollups for the admin dashboard.
+
+The hot paths never write rollups directly: /begin and the completion
+write add deltas to an in-memory RollupBuffer, and a background compactor
+thread periodically upserts the accumulated deltas into analytics_rollups.
+The same thread folds daily buckets older than ROLLUP_DAILY_RETENTION_DAYS
+into monthly buckets, so dashboard reads touch O(#buckets) rows rather
+than scanning completed_quizzes.
+
+``flask rollups rebuild`` recomputes everything from completed_quizzes
+(e.g. after enabling rollups on an existing database); starts and
+abandons (counted from funnel events, which may live in a file) cannot be
+reconstructed and are left as recorded.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from quiz import db
+from quiz.models import AnalyticsRollup, CompletedAnswer
+
+logger = logging.getLogger(__name__)
+
+# Rollups `flask rollups rebuild` cannot recompute from completions
+UNREBUILT_METRICS = ('start', 'abandon')
+
+def _histogram_questions(questions):
+    """Ids of questions with a fixed answer set worth counting per option."""
+    return {
+        str(q.id) for q in questions.values()
+        if q.get_options() or q.question_type == 'yes_no'
+    }
+
+def completion_deltas(records, questions):
+    """Rollup deltas for completed quiz records (dicts or rows with the same fields)."""
+    counted = _histogram_questions(questions)
+    deltas = Counter()
+    for record in records:
+        get = record.get if isinstance(record, dict) else lambda key: getattr(record, key)
+        quiz_id = get('quiz_id')
+        day = (get('completed_at') or datetime.utcnow()).date()
+        deltas[(quiz_id, day, 'completion', '', '')] += 1
+        deltas[(quiz_id, day, 'result_type', '', get('result_type'))] += 1
+        
+        responses = get('responses')
+        if isinstance(responses, str):
+            try:
+                responses = json.loads(responses)
+            except json.JSONDecodeError:
+                responses = {}
+        for question_id, answer in (responses or {}).items():
+            if question_id in counted and isinstance(answer, str):
+                deltas[(quiz_id, day, 'answer', question_id, answer[:200])] += 1
+    return deltas
+
+def apply_deltas(deltas, granularity='day'):
+    """Add counter deltas to analytics_rollups in one transaction."""
+    if not deltas:
+        return
+    rows = [
+        {'quiz_id': quiz_id, 'granularity': granularity, 'bucket_date': day, 'metric': metric,
+         'dimension': dimension, 'value': value, 'count': count}
+        for (quiz_id, day, metric, dimension, value), count in deltas.items()
+    ]
+    table = AnalyticsRollup.__table__
+    dialect = db.engine.dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['quiz_id', 'granularity', 'bucket_date', 'metric', 'dimension', 'value'],
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+        db.session.execute(stmt, rows)
+    else:
+        # Portable fallback: update, then insert whatever did not exist
+        for row in rows:
+            key = [table.c[name] == row[name] for name in
+                   ('quiz_id', 'granularity', 'bucket_date', 'metric', 'dimension', 'value')]
+            updated = db.session.execute(
+                table.update().where(*key).values(count=table.c.count + row['count'])
+            ).rowcount
+            if not updated:
+                db.session.execute(table.insert(), [row])
+    db.session.commit()
+
+def fold_daily_buckets(before):
+    """Merge daily buckets dated before `before` into monthly buckets."""
+    table = AnalyticsRollup.__table__
+    month = func.strftime('%Y-%m', table.c.bucket_date) if db.engine.dialect.name == 'sqlite' \
+        else func.to_char(table.c.bucket_date, 'YYYY-MM')
+    old = (table.c.granularity == 'day') & (table.c.bucket_date < before)
+    grouped = db.session.execute(
+        select(table.c.quiz_id, month.label('month'), table.c.metric, table.c.dimension,
+               table.c.value, func.sum(table.c.count))
+        .where(old)
+        .group_by(table.c.quiz_id, month, table.c.metric, table.c.dimension, table.c.value)
+    ).all()
+    if not grouped:
+        return 0
+    
+    deltas = Counter()
+    for quiz_id, month_key, metric, dimension, value, count in grouped:
+        year, month_number = (int(part) for part in month_key.split('-'))
+        deltas[(quiz_id, date(year, month_number, 1), metric, dimension, value)] += count
+    db.session.execute(delete(table).where(old))
+    apply_deltas(deltas, granularity='month')  # commits the delete and the fold together
+    return len(grouped)
+
+def rebuild_rollups(chunk_size=1000, archive_dir=None):
+    """Recompute completion rollups from completed_quizzes (and the archive).
+    
+    Start and abandon rollups are not derived from completions and are kept.
+    """
+    from quiz.export import iter_completions
+    from quiz.services import QuizService
+    
+    table = AnalyticsRollup.__table__
+    db.session.execute(delete(table).where(table.c.metric.notin_(UNREBUILT_METRICS)))
+    db.session.commit()
+    
+    questions = QuizService.questions_by_id()
+    batch = []
+    total = 0
+    for row in iter_completions(chunk_size=chunk_size, archive_dir=archive_dir):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            apply_deltas(completion_deltas(batch, questions))
+            total += len(batch)
+            batch = []
+    if batch:
+        apply_deltas(completion_deltas(batch, questions))
+        total += len(batch)
+    return total
+
+def answer_distribution(quiz_id, question_id, start=None, end=None):
+    """Answer counts for one question from completed_answers, most common first.
+    
+    Served from the (quiz_id, question_id, answer) index without touching
+    completed_quizzes; a completed_at range uses the companion index.
+    """
+    table = CompletedAnswer.__table__
+    query = (
+        select(table.c.answer, func.count())
+        .where(table.c.quiz_id == quiz_id, table.c.question_id == question_id)
+        .group_by(table.c.answer)
+        .order_by(func.count().desc())
+    )
+    if start is not None:
+        query = query.where(table.c.completed_at >= start)
+    if end is not None:
+        query = query.where(table.c.completed_at < end)
+    return db.session.execute(query).all()
+
+class RollupBuffer:
+    """Thread-safe in-memory rollup deltas with a background compactor."""
+    
+    def __init__(self, app, flush_interval=10.0, daily_retention_days=90):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.daily_retention_days = daily_retention_days
+        self._lock = threading.Lock()
+        self._deltas = Counter()
+        self._pid = None
+        self._wakeup = threading.Event()
+    
+    @classmethod
+    def from_config(cls, app):
+        return cls(app,
+                   flush_interval=app.config.get('ROLLUP_FLUSH_INTERVAL', 10.0),
+                   daily_retention_days=app.config.get('ROLLUP_DAILY_RETENTION_DAYS', 90))
+    
+    def _ensure_started(self):
+        # One compactor per process; threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._deltas = Counter()
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='rollup-compactor', daemon=True)
+            thread.start()
+            atexit.register(self.flush)
+    
+    def add(self, deltas):
+        self._ensure_started()
+        with self._lock:
+            self._deltas.update(deltas)
+    
+    def record_start(self, quiz_id):
+        self.add({(quiz_id, datetime.utcnow().date(), 'start', '', ''): 1})
+    
+    def record_completions(self, records, questions):
+        self.add(completion_deltas(records, questions))
+    
+    def flush(self):
+        """Write pending deltas now. Returns the number of buckets touched."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+        if not deltas:
+            return 0
+        with self.app.app_context():
+            try:
+                apply_deltas(deltas)
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._deltas.update(deltas)  # retry on the next cycle
+                raise
+        return len(deltas)
+    
+    def compact(self):
+        """Flush deltas and fold old daily buckets into months."""
+        self.flush()
+        before = datetime.utcnow().date() - timedelta(days=self.daily_retention_days)
+        with self.app.app_context():
+            return fold_daily_buckets(before.replace(day=1))
+    
+    def _run(self):
+        cycles = 0
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            cycles += 1
+            try:
+                # Folding is cheap but rarely useful; do it about hourly
+                if cycles % max(1, int(3600 / self.flush_interval)) == 0:
+                    self.compact()
+                else:
+                    self.flush()
+            except Exception:
+                logger.exception("Rollup flush failed")
+
+class DashboardStats:
+    """Dashboard numbers read from analytics_rollups."""
+    
+    @staticmethod
+    def load(quiz_id=None, days=30):
+        table = AnalyticsRollup.__table__
+        scope = [table.c.quiz_id == quiz_id] if quiz_id is not None else []
+        
+        totals = Counter()
+        results = Counter()
+        answers = {}
+        for metric, dimension, value, count in db.session.execute(
+            select(table.c.metric, table.c.dimension, table.c.value, func.sum(table.c.count))
+            .where(*scope)
+            .group_by(table.c.metric, table.c.dimension, table.c.value)
+        ):
+            if metric in ('start', 'completion'):
+                totals[metric] += count
+            elif metric == 'result_type':
+                results[value] += count
+            elif metric == 'answer':
+                answers.setdefault(dimension, Counter())[value] += count
+        
+        since = datetime.utcnow().date() - timedelta(days=days)
+        daily = {}
+        for day, metric, count in db.session.execute(
+            select(table.c.bucket_date, table.c.metric, func.sum(table.c.count))
+            .where(table.c.granularity == 'day', table.c.bucket_date >= since,
+                   table.c.metric.in_(('start', 'completion')), *scope)
+            .group_by(table.c.bucket_date, table.c.metric)
+            .order_by(table.c.bucket_date)
+        ):
+            daily.setdefault(day, {'start': 0, 'completion': 0})[metric] = count
+        
+        starts, completions = totals['start'], totals['completion']
+        return {
+            'starts': starts,
+            'completions': completions,
+            'completion_rate': (completions / starts * 100) if starts else 0,
+            'result_distribution': results.most_common(),
+            'answer_histograms': {qid: counts.most_common() for qid, counts in answers.items()},
+            'daily': sorted(daily.items())
+        }
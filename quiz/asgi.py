@@ -0,0 +1,336 @@
+"""ASGI serving path for the quiz app.
+
+    uvicorn asgi:app --workers 4
+
+Autosave traffic is tiny and idle-heavy: most of a request's lifetime is
+spent waiting on the client. Under WSGI every open request holds a worker
+thread for that whole time. Here the event loop owns all connections and
+reads request bodies asynchronously. A request only borrows a thread from a
+small pool (ASGI_THREADS) for the moment the Flask view actually runs. The
+views, SessionService and QuizService are the same code the WSGI server runs,
+so behaviour (cookies, session store, validation) is identical.
+
+Completion writes from /submit go through an async driver (aiosqlite or
+asyncpg, when installed): QuizService.complete_quiz queues the record on
+the WSGI environ instead of writing it, and the session write is held back
+too. Once the view has returned and its thread is free, the insert runs on
+the event loop; only after it commits are the session state saved and the
+response sent. If it fails, the request is run again on the sync path, so
+the session is never marked completed without its row. Without an async
+driver the insert runs on the view's thread as it does under WSGI.
+
+Request bodies larger than MAX_CONTENT_LENGTH get a 413 before they are
+buffered.
+
+Requests are counted for load shedding (quiz/ratelimit.py) as soon as
+their body is read, so autosaves can be turned away while others are
+still queued for the pool.
+"""
+
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+from quiz.models import CompletedAnswer
+from quiz.ratelimit import PENDING_KEY, finish_dispatch, shed_before_dispatch, use_asgi_threads
+from quiz.services import COMPLETION_DEFER_KEY, DEFERRED_STATE_KEY, QuizService, catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# Async drivers tried for each sync backend, in order
+ASYNC_DRIVERS = {
+    'sqlite': ('aiosqlite', 'sqlite+aiosqlite'),
+    'postgresql': ('asyncpg', 'postgresql+asyncpg'),
+}
+
+# Response bytes gathered on the first trip to the thread pool; streamed
+# responses (CSV export) continue chunk by chunk after that
+_FIRST_CHUNK_BYTES = 64 * 1024
+
+def async_database_url(config):
+    """Return the async SQLAlchemy URL to use, or None if no driver is installed."""
+    if config.get('ASYNC_DATABASE_URL'):
+        return config['ASYNC_DATABASE_URL']
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    module, drivername = ASYNC_DRIVERS.get(url.get_backend_name(), (None, None))
+    if module is None:
+        return None
+    try:
+        __import__(module)
+    except ImportError:
+        return None
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+class AsyncCompletionStore:
+    """Writes completion records through an async driver on the event loop."""
+    
+    def __init__(self, app):
+        self.app = app
+        self.engine = None
+        url = async_database_url(app.config)
+        if url:
+            try:
+                from sqlalchemy.ext.asyncio import create_async_engine
+            except ImportError:  # needs greenlet: pip install sqlalchemy[asyncio]
+                logger.warning("SQLAlchemy asyncio support unavailable; completion writes run on the view threads")
+            else:
+                self.engine = create_async_engine(url, **app.config.get('ASYNC_ENGINE_OPTIONS', {}))
+                self._register_pragmas()
+        logger.info("Completion writes under ASGI use %s",
+                    self.engine.url.drivername if self.engine else 'the view threads')
+    
+    def _register_pragmas(self):
+        if self.engine.dialect.name != 'sqlite':
+            return
+        from sqlalchemy import event
+        from quiz.engine import sqlite_pragma_statements
+        statements = sqlite_pragma_statements(self.app.config.get('DB_SQLITE_PRAGMAS') or {})
+        
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.close()
+        
+        event.listen(self.engine.sync_engine, 'connect', set_pragmas)
+    
+    async def commit(self, environ, executor):
+        """Write the completions a view deferred, then its session state.
+        
+        Runs on the event loop after the view has returned. Returns False,
+        with nothing saved, if the insert failed.
+        """
+        pending = environ[COMPLETION_DEFER_KEY]
+        try:
+            inserted = await self.save([record for record, _ in pending])
+        except IntegrityError:
+            return False  # dialect without ON CONFLICT: the sync path sorts out duplicates
+        except Exception:
+            logger.exception("Async completion write failed; retrying on a view thread")
+            return False
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self._after_commit, inserted, environ.get(DEFERRED_STATE_KEY))
+        recent = self.app.extensions.get('recent_completions')
+        if recent is not None:
+            stored = {record['session_id'] for record in inserted}
+            for record, result_data in pending:
+                if record['session_id'] in stored:
+                    recent.add(record['session_id'], result_data)
+        return True
+    
+    def _after_commit(self, inserted, state):
+        with self.app.app_context():
+            if state is not None:
+                self.app.extensions['quiz_session_store'].save(*state)
+            rollups = self.app.extensions.get('rollups')
+            if rollups is not None and inserted:
+                rollups.record_completions(inserted, catalog_cache.questions_for(r['quiz_id'] for r in inserted))
+    
+    async def save(self, records):
+        """Insert `records` with the async engine and return the ones inserted.
+        
+        On dialects without ON CONFLICT a duplicate raises IntegrityError.
+        """
+        async with self.engine.begin() as conn:
+            result = await conn.execute(QuizService.completion_insert(conn.dialect.name), records)
+            ids = dict(result.all())
+            inserted = QuizService.inserted_records(records, ids)
+            answers = QuizService.answer_rows(inserted, ids)
+            if answers:
+                await conn.execute(CompletedAnswer.__table__.insert(), answers)
+        return inserted
+    
+    async def close(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+class QuizASGI:
+    """ASGI callable wrapping the Flask app with a bounded thread pool."""
+    
+    def __init__(self, app, threads=8):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='quiz-asgi')
+        self.completions = AsyncCompletionStore(app)
+        use_asgi_threads(app, threads)
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def shutdown(self):
+        """Flush background writers and release the pool and async engine."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._flush_extensions)
+        await self.completions.close()
+        self.executor.shutdown(wait=True)
+    
+    def _flush_extensions(self):
+        writer = self.app.extensions.get('completion_writer')
+        if writer is not None:
+            writer.shutdown()
+        funnel = self.app.extensions.get('funnel')
+        if funnel is not None:
+            funnel.flush()  # abandons feed the rollups, so flush these first
+        rollups = self.app.extensions.get('rollups')
+        if rollups is not None:
+            rollups.flush()
+    
+    async def _http(self, scope, receive, send):
+        limit = self.app.config.get('MAX_CONTENT_LENGTH')
+        declared = dict(scope.get('headers', [])).get(b'content-length', b'')
+        if limit and declared.isdigit() and int(declared) > limit:
+            await _send_error(send, 413, b'{"error":"Request body too large"}')
+            return
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if limit and len(body) > limit:
+                await _send_error(send, 413, b'{"error":"Request body too large"}')
+                return
+            if not message.get('more_body'):
+                break
+        
+        body = bytes(body)
+        environ = build_environ(scope, body)
+        if shed_before_dispatch(self.app, environ):
+            # Overloaded: turn autosaves away without waiting for a thread
+            await _send_error(send, 503, b'{"error":"Server busy"}', [(b'retry-after', b'1')])
+            return
+        try:
+            await self._dispatch(environ, send, partial(build_environ, scope, body))
+        finally:
+            finish_dispatch(self.app, environ)
+    
+    async def _dispatch(self, environ, send, rebuild_environ):
+        loop = asyncio.get_running_loop()
+        if self.completions.engine is not None:
+            environ[COMPLETION_DEFER_KEY] = []
+        status, headers, chunks, iterator = await loop.run_in_executor(
+            self.executor, self._start_response, environ
+        )
+        if environ.get(COMPLETION_DEFER_KEY) and not await self.completions.commit(environ, self.executor):
+            # Nothing from the first run was saved: run the request again on the sync path
+            if iterator is not None:
+                await loop.run_in_executor(self.executor, _close, iterator)
+            retry = rebuild_environ()
+            if PENDING_KEY in environ:
+                retry[PENDING_KEY] = environ[PENDING_KEY]
+            status, headers, chunks, iterator = await loop.run_in_executor(
+                self.executor, self._start_response, retry
+            )
+        
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        while iterator is not None:
+            chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+            if chunk is None:
+                await loop.run_in_executor(self.executor, _close, iterator)
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    
+    def _start_response(self, environ):
+        """Run the WSGI app; return status, headers and the first body chunks."""
+        started = {}
+        
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin1'), value.encode('latin1'))
+                                  for name, value in headers]
+        
+        result = self.app(environ, start_response)
+        iterator = iter(result)
+        chunks, size = [], 0
+        for chunk in iterator:
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+            if size >= _FIRST_CHUNK_BYTES:
+                return started['status'], started['headers'], chunks, _Closing(iterator, result)
+        _close(result)
+        return started['status'], started['headers'], chunks, None
+
+class _Closing:
+    """Iterator that remembers the WSGI result so it can be closed."""
+    
+    def __init__(self, iterator, result):
+        self.iterator = iterator
+        self.result = result
+    
+    def __next__(self):
+        return next(self.iterator)
+    
+    def close(self):
+        _close(self.result)
+
+async def _send_error(send, status, body, headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+def _close(result):
+    if hasattr(result, 'close'):
+        result.close()
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_LENGTH':
+            continue  # the body has already been read in full
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+def create_asgi_app(config_name='production', config_overrides=None):
+    """Build the Flask app and wrap it for an ASGI server."""
+    from quiz import create_app
+    app = create_app(config_name, config_overrides=config_overrides)
+    return QuizASGI(app, threads=app.config.get('ASGI_THREADS', 8))
@@ -0,0 +1,181 @@
+"""Flask CLI commands for quiz maintenance tasks."""
+
+import json
+
+import click
+
+def register_commands(app):
+    """Attach the quiz maintenance commands to ``app.cli``."""
+    
+    @app.cli.command('init-db')
+    @click.option('--seed/--no-seed', default=False, show_default=True,
+                  help='Also insert the sample quiz and questions.')
+    def init_db_command(seed):
+        """Create tables and apply migrations (run once per deploy)."""
+        from quiz import init_database
+        applied = init_database(seed=seed)
+        click.echo(f"Database ready; applied {len(applied)} migration(s)")
+    
+    @app.cli.command('seed')
+    def seed_command():
+        """Insert the sample quiz and questions if the database is empty."""
+        from quiz.services import QuizService, catalog_cache
+        QuizService.seed_database()
+        click.echo(f"Seeded catalog version {catalog_cache.get().version}")
+    
+    @app.cli.command('activate-quiz')
+    @click.argument('quiz_id', type=int)
+    def activate_quiz_command(quiz_id):
+        """Make a quiz version the live one for its slug."""
+        from quiz.services import QuizService
+        try:
+            quiz = QuizService.activate_quiz(quiz_id)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"{quiz.slug} -> {quiz.version} (quiz {quiz.id})")
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Apply pending schema migrations (indexes, backfills)."""
+        from quiz.migrations import upgrade
+        applied = upgrade(log=lambda message: click.echo(message, err=True))
+        click.echo(f"Applied {len(applied)} migration(s)")
+    
+    @app.cli.command('rescore')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows per read/update batch.')
+    @click.option('--dry-run', is_flag=True, help='Score and report differences without writing.')
+    @click.option('--checkpoint', 'checkpoint_path', type=click.Path(dir_okay=False),
+                  help='File recording progress after each committed chunk.')
+    @click.option('--resume', is_flag=True, help='Continue from --checkpoint.')
+    @click.option('--workers', default=1, show_default=True, help='Processes used for scoring.')
+    @click.option('--profile', 'profile_path', type=click.Path(exists=True, dir_okay=False),
+                  help='Score with this profile instead of SCORING_PROFILE_PATH.')
+    @click.option('--quiz-id', type=int,
+                  help='Quiz version to re-score (default: the live version of the default quiz).')
+    @click.option('--archive/--no-archive', 'include_archive', default=True, show_default=True,
+                  help='Also re-score archived completions (see `flask retention archive`).')
+    def rescore_command(chunk_size, dry_run, checkpoint_path, resume, workers, profile_path, quiz_id,
+                        include_archive):
+        """Recompute result_type/result_data for one quiz version's completions."""
+        from quiz.rescore import rescore, rescore_archive
+        from quiz.retention import archive_root
+        from quiz.scoring import ScoringTable, load_profile
+        from quiz.services import catalog_cache
+        
+        if resume and not checkpoint_path:
+            raise click.UsageError('--resume requires --checkpoint')
+        
+        snapshot = catalog_cache.get(quiz_id)
+        if snapshot.quiz is None:
+            raise click.ClickException('No such quiz')
+        table = snapshot.scoring
+        if profile_path:
+            table = ScoringTable.compile(snapshot.questions.values(), load_profile(profile_path))
+        
+        def progress(state):
+            click.echo(f"  scanned {state['scanned']} (last id {state['last_id']}), "
+                       f"{'would change' if dry_run else 'changed'} {state['changed']}", err=True)
+        
+        click.echo(f"Re-scoring {snapshot.quiz.slug} {snapshot.quiz.version} "
+                   f"with scoring version {table.version}"
+                   f"{' (dry run)' if dry_run else ''}", err=True)
+        summary = rescore(table, chunk_size=chunk_size, dry_run=dry_run,
+                          checkpoint_path=checkpoint_path, resume=resume,
+                          workers=workers, progress=progress, quiz_id=snapshot.quiz_id)
+        if include_archive:
+            def archive_progress(state):
+                click.echo(f"  archive: {state['files']} files, scanned {state['scanned']}, "
+                           f"{'would change' if dry_run else 'changed'} {state['changed']}", err=True)
+            summary['archive'] = rescore_archive(table, archive_root(app), quiz_id=snapshot.quiz_id,
+                                                 dry_run=dry_run, progress=archive_progress)
+        click.echo(json.dumps(summary, indent=2))
+    
+    @app.cli.group('rollups')
+    def rollups_group():
+        """Maintain the dashboard analytics rollups."""
+    
+    @rollups_group.command('rebuild')
+    @click.option('--chunk-size', default=1000, show_default=True)
+    def rollups_rebuild_command(chunk_size):
+        """Recompute completion rollups from completed_quizzes."""
+        from quiz.analytics import rebuild_rollups
+        from quiz.retention import archive_root
+        total = rebuild_rollups(chunk_size=chunk_size, archive_dir=archive_root(app))
+        click.echo(f"Rebuilt rollups from {total} completed quizzes")
+    
+    @rollups_group.command('compact')
+    def rollups_compact_command():
+        """Flush buffered deltas and fold old daily buckets into months."""
+        rollups = app.extensions.get('rollups')
+        if rollups is None:
+            raise click.ClickException('Rollups are disabled (ROLLUPS_ENABLED)')
+        folded = rollups.compact()
+        click.echo(f"Folded {folded} daily bucket groups")
+    
+    @app.cli.group('retention')
+    def retention_group():
+        """Archive old completed quizzes out of the hot table."""
+    
+    @retention_group.command('archive')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive completions older than this (default: RETENTION_DAYS).')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Completions moved per transaction (default: RETENTION_BATCH_SIZE).')
+    @click.option('--dry-run', is_flag=True, help='Count what would be archived without moving anything.')
+    @click.option('--vacuum', is_flag=True, help='VACUUM the SQLite file afterwards to return freed space.')
+    def retention_archive_command(older_than_days, batch_size, dry_run, vacuum):
+        """Move old completions into date-partitioned gzip NDJSON files."""
+        from datetime import datetime, time, timedelta
+        from quiz.retention import archive_completions, archive_root, reclaim_space
+        
+        days = older_than_days if older_than_days is not None else app.config.get('RETENTION_DAYS', 365)
+        if days <= 0:
+            raise click.UsageError('Retention age must be positive')
+        # Whole days only, so a day's rows are archived together
+        before = datetime.combine((datetime.utcnow() - timedelta(days=days)).date(), time.min)
+        root = archive_root(app)
+        log = lambda message: click.echo(message, err=True)
+        total = archive_completions(root, before,
+                                    batch_size=batch_size or app.config.get('RETENTION_BATCH_SIZE', 1000),
+                                    dry_run=dry_run, log=log)
+        if vacuum and total and not dry_run:
+            reclaim_space(log=log)
+        click.echo(f"{'Would archive' if dry_run else 'Archived'} {total} completions "
+                   f"older than {before:%Y-%m-%d} to {root}")
+    
+    @app.cli.group('export')
+    def export_group():
+        """Batch exports for offline analysis."""
+    
+    @export_group.command('columnar')
+    @click.argument('out_dir', type=click.Path(file_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['npy', 'parquet']), default='npy', show_default=True,
+                  help='Column files: .npy (no extra dependencies) or Parquet (needs pyarrow).')
+    @click.option('--full', is_flag=True, help='Discard the existing export and start again from the first completion.')
+    @click.option('--chunk-size', default=5000, show_default=True)
+    def export_columnar_command(out_dir, fmt, full, chunk_size):
+        """Append completions added since the last run to a columnar export."""
+        from quiz.columnar import export_columnar
+        from quiz.export import iter_completions
+        from quiz.retention import archive_root
+        from quiz.services import QuizService
+        
+        if fmt == 'parquet':
+            try:
+                import pyarrow
+            except ImportError:
+                raise click.ClickException('--format parquet needs pyarrow (pip install pyarrow)')
+        root = archive_root(app)
+        completions_since = lambda after_id: iter_completions(chunk_size=chunk_size, archive_dir=root,
+                                                              after_id=after_id)
+        try:
+            part = export_columnar(out_dir, completions_since,
+                                   QuizService.questions_by_id(), fmt=fmt, full=full,
+                                   log=lambda message: click.echo(message, err=True))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if part is None:
+            click.echo(f"No new completions since the last export in {out_dir}")
+        else:
+            click.echo(f"Wrote {part['name']}: {part['completions']} completions, {part['answers']} answers "
+                       f"(ids {part['first_id']}-{part['last_id']})")
@@ -0,0 +1,351 @@
+"""Columnar batch export of completions and answers for offline analysis.
+
+    flask export columnar exports/            # completions added since the last run
+    flask export columnar exports/ --full     # start a fresh export
+
+Output directory layout:
+
+    manifest.json        format, id watermark and the parts written so far
+    dictionaries.json    code tables shared by every part
+    part-00001/
+        completions/{id,quiz_id,session_id,result_type,started_at,completed_at}.npy
+        answers/{completion_id,question_id,option,value}.npy
+
+Each run exports the completions with an id above the watermark (archived
+ones included, see quiz/retention.py) as one new part. Columns are plain
+NumPy .npy files, written here without needing numpy, so they can be opened
+with ``np.load(path, mmap_mode='r')`` or load_export(). With pyarrow
+installed, format 'parquet' writes each table of a part as one Parquet
+file with the same columns instead.
+
+Codes:
+
+- answers.question_id is the Question id.
+- answers.option indexes dictionaries['options'][question_id], seeded
+  from the question catalog (['yes', 'no'] for yes/no questions). It is
+  -1 when the answer is not one of the options.
+- answers.value indexes dictionaries['values'] for free-form answers
+  (names, dates, retired options). It is -1 when option is set.
+- completions.result_type indexes dictionaries['result_types'].
+- Timestamps are int64 microseconds since the Unix epoch (UTC); -1 when
+  missing.
+
+Dictionaries are only ever appended to, so codes stay valid across parts.
+"""
+
+import ast
+import glob
+import json
+import os
+import shutil
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+FORMATS = ('npy', 'parquet')
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_SESSION_ID_BYTES = 36
+
+# column name -> (array typecode, .npy descr); typecode None = fixed-width bytes
+COMPLETION_COLUMNS = {
+    'id': ('q', '<i8'),
+    'quiz_id': ('i', '<i4'),
+    'session_id': (None, f'|S{_SESSION_ID_BYTES}'),
+    'result_type': ('i', '<i4'),
+    'started_at': ('q', '<i8'),
+    'completed_at': ('q', '<i8'),
+}
+ANSWER_COLUMNS = {
+    'completion_id': ('q', '<i8'),
+    'question_id': ('i', '<i4'),
+    'option': ('h', '<i2'),
+    'value': ('i', '<i4'),
+}
+
+def _timestamp(value):
+    return (value - _EPOCH) // _MICROSECOND if value is not None else -1
+
+class NpyColumnWriter:
+    """Streams one column to a version 1.0 .npy file."""
+    
+    HEADER_SIZE = 128
+    FLUSH_ITEMS = 65536
+    
+    def __init__(self, path, typecode, descr):
+        self.path = path
+        self.typecode = typecode
+        self.descr = descr
+        self.length = 0
+        self._file = open(path, 'wb')
+        self._file.write(b'\0' * self.HEADER_SIZE)  # rewritten once the length is known
+        self._pending = self._new_buffer()
+    
+    def _new_buffer(self):
+        return array(self.typecode) if self.typecode else []
+    
+    def append(self, value):
+        self._pending.append(value)
+        if len(self._pending) >= self.FLUSH_ITEMS:
+            self._flush()
+    
+    def _flush(self):
+        if not self._pending:
+            return
+        if self.typecode is None:
+            width = int(self.descr[2:])
+            data = b''.join(value.encode('utf-8')[:width].ljust(width, b'\0') for value in self._pending)
+        else:
+            if sys.byteorder == 'big':
+                self._pending.byteswap()
+            data = self._pending.tobytes()
+        self._file.write(data)
+        self.length += len(self._pending)
+        self._pending = self._new_buffer()
+    
+    def close(self):
+        self._flush()
+        header = repr({'descr': self.descr, 'fortran_order': False, 'shape': (self.length,)})
+        prefix = b'\x93NUMPY\x01\x00' + struct.pack('<H', self.HEADER_SIZE - 10)
+        header = header.ljust(self.HEADER_SIZE - len(prefix) - 1) + '\n'
+        self._file.seek(0)
+        self._file.write(prefix + header.encode('latin1'))
+        self._file.close()
+
+def read_npy(path):
+    """Read a .npy column: a memory-mapped numpy array if numpy is installed, else an array.array."""
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        return numpy.load(path, mmap_mode='r')
+    
+    with open(path, 'rb') as f:
+        prefix = f.read(10)
+        header = ast.literal_eval(f.read(struct.unpack('<H', prefix[8:10])[0]).decode('latin1'))
+        data = f.read()
+    descr = header['descr']
+    if descr.startswith('|S'):
+        width = int(descr[2:])
+        return [data[i:i + width].rstrip(b'\0').decode('utf-8') for i in range(0, len(data), width)]
+    typecode = {'<i8': 'q', '<i4': 'i', '<i2': 'h'}[descr]
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+class _NpyTable:
+    def __init__(self, directory, columns):
+        os.makedirs(directory)
+        self.writers = {name: NpyColumnWriter(os.path.join(directory, f'{name}.npy'), typecode, descr)
+                        for name, (typecode, descr) in columns.items()}
+    
+    def append(self, row):
+        for name, writer in self.writers.items():
+            writer.append(row[name])
+    
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+class _ParquetTable:
+    BATCH_ROWS = 65536
+    
+    def __init__(self, path, columns):
+        import pyarrow
+        import pyarrow.parquet
+        types = {'q': pyarrow.int64(), 'i': pyarrow.int32(), 'h': pyarrow.int16(), None: pyarrow.string()}
+        self._pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, types[typecode]) for name, (typecode, _) in columns.items()])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        self.rows = {name: [] for name in columns}
+    
+    def append(self, row):
+        for name, values in self.rows.items():
+            values.append(row[name])
+        if len(values) >= self.BATCH_ROWS:
+            self._flush()
+    
+    def _flush(self):
+        if self.rows and next(iter(self.rows.values())):
+            self.writer.write_table(self._pyarrow.table(self.rows, schema=self.schema))
+            self.rows = {name: [] for name in self.rows}
+    
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+class Dictionaries:
+    """Append-only code tables stored in dictionaries.json."""
+    
+    def __init__(self, data=None):
+        data = data or {}
+        self.options = {int(qid): list(values) for qid, values in data.get('options', {}).items()}
+        self.values = list(data.get('values', []))
+        self.result_types = list(data.get('result_types', []))
+        self._option_codes = {qid: {v: i for i, v in enumerate(values)} for qid, values in self.options.items()}
+        self._value_codes = {v: i for i, v in enumerate(self.values)}
+        self._result_codes = {v: i for i, v in enumerate(self.result_types)}
+    
+    def add_catalog(self, questions):
+        """Register each question's current options, keeping existing codes."""
+        for question in questions.values():
+            options = question.get_options() or (['yes', 'no'] if question.question_type == 'yes_no' else [])
+            codes = self._option_codes.setdefault(question.id, {})
+            known = self.options.setdefault(question.id, [])
+            for option in options:
+                if option not in codes:
+                    codes[option] = len(known)
+                    known.append(option)
+    
+    def encode_answer(self, question_id, answer):
+        """(option code, value code) for one answer."""
+        option = self._option_codes.get(question_id, {}).get(answer)
+        if option is not None:
+            return option, -1
+        return -1, self._code(self._value_codes, self.values, answer)
+    
+    def encode_result_type(self, result_type):
+        return self._code(self._result_codes, self.result_types, result_type)
+    
+    @staticmethod
+    def _code(codes, values, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+    
+    def to_json(self):
+        return {'options': {str(qid): values for qid, values in sorted(self.options.items())},
+                'values': self.values, 'result_types': self.result_types}
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def read_manifest(out_dir):
+    return _read_json(os.path.join(out_dir, 'manifest.json'), None)
+
+def clear_export(out_dir):
+    """Delete the files an export wrote to `out_dir`, leaving anything else there."""
+    # Manifest first, so an interrupted clear reads as an empty export
+    for name in ('manifest.json', 'manifest.json.tmp', 'dictionaries.json', 'dictionaries.json.tmp'):
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except FileNotFoundError:
+            pass
+    for part_dir in glob.glob(os.path.join(out_dir, 'part-[0-9][0-9][0-9][0-9][0-9]*')):
+        if os.path.isdir(part_dir):
+            shutil.rmtree(part_dir)
+
+def export_columnar(out_dir, completions_since, questions, fmt='npy', full=False, log=print):
+    """Write completions newer than the watermark in `out_dir` as a new part.
+    
+    `completions_since(after_id)` yields completion rows with id > after_id
+    in id order (e.g. a partial of export.iter_completions); `questions`
+    maps question id -> question for seeding the option codes. Returns the
+    manifest entry for the new part, or None if there was nothing new.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    if full:
+        clear_export(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    manifest = read_manifest(out_dir) or {'format': fmt, 'watermark': 0, 'parts': []}
+    if manifest['format'] != fmt:
+        raise ValueError(f"{out_dir} holds a {manifest['format']} export; use --full to switch formats")
+    dictionaries = Dictionaries(_read_json(os.path.join(out_dir, 'dictionaries.json'), None))
+    dictionaries.add_catalog(questions)
+    
+    name = f"part-{len(manifest['parts']) + 1:05d}"
+    part_dir = os.path.join(out_dir, name)
+    tmp_dir = part_dir + '.tmp'
+    for stale in (part_dir, tmp_dir):  # left behind by an interrupted run
+        if os.path.isdir(stale):
+            shutil.rmtree(stale)
+    os.makedirs(tmp_dir)
+    if fmt == 'parquet':
+        completions = _ParquetTable(os.path.join(tmp_dir, 'completions.parquet'), COMPLETION_COLUMNS)
+        answers = _ParquetTable(os.path.join(tmp_dir, 'answers.parquet'), ANSWER_COLUMNS)
+    else:
+        completions = _NpyTable(os.path.join(tmp_dir, 'completions'), COMPLETION_COLUMNS)
+        answers = _NpyTable(os.path.join(tmp_dir, 'answers'), ANSWER_COLUMNS)
+    
+    completion_count = answer_count = 0
+    first_id = last_id = None
+    for row in completions_since(manifest['watermark']):
+        try:
+            responses = json.loads(row.responses) if row.responses else {}
+        except json.JSONDecodeError:
+            responses = {}
+        completions.append({
+            'id': row.id,
+            'quiz_id': row.quiz_id,
+            'session_id': row.session_id,
+            'result_type': dictionaries.encode_result_type(row.result_type),
+            'started_at': _timestamp(row.started_at),
+            'completed_at': _timestamp(row.completed_at),
+        })
+        for question_id, answer in responses.items():
+            if not question_id.isdigit():
+                continue
+            option, value = dictionaries.encode_answer(int(question_id), str(answer))
+            answers.append({'completion_id': row.id, 'question_id': int(question_id),
+                            'option': option, 'value': value})
+            answer_count += 1
+        completion_count += 1
+        first_id = row.id if first_id is None else first_id
+        last_id = row.id
+        if completion_count % 100000 == 0:
+            log(f"  exported {completion_count} completions")
+    completions.close()
+    answers.close()
+    
+    if not completion_count:
+        shutil.rmtree(tmp_dir)
+        return None
+    
+    # Codes first, then the part, then the manifest that makes it visible
+    _write_json(os.path.join(out_dir, 'dictionaries.json'), dictionaries.to_json())
+    os.replace(tmp_dir, part_dir)
+    part = {'name': name, 'completions': completion_count, 'answers': answer_count,
+            'first_id': first_id, 'last_id': last_id, 'exported_at': datetime.utcnow().isoformat()}
+    manifest['parts'].append(part)
+    manifest['watermark'] = max(manifest['watermark'], last_id)
+    _write_json(os.path.join(out_dir, 'manifest.json'), manifest)
+    return part
+
+def load_export(out_dir):
+    """Load an npy export: {'completions': {column: [parts]}, 'answers': ..., 'dictionaries': ...}.
+    
+    Each column is a list with one array per part (numpy arrays when numpy
+    is installed; concatenate as needed).
+    """
+    manifest = read_manifest(out_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No columnar export in {out_dir}")
+    if manifest['format'] != 'npy':
+        raise ValueError("Parquet exports are read with pyarrow.parquet / pandas directly")
+    result = {'dictionaries': _read_json(os.path.join(out_dir, 'dictionaries.json'), {}),
+              'completions': {name: [] for name in COMPLETION_COLUMNS},
+              'answers': {name: [] for name in ANSWER_COLUMNS}}
+    for part in manifest['parts']:
+        for table, columns in (('completions', COMPLETION_COLUMNS), ('answers', ANSWER_COLUMNS)):
+            for name in columns:
+                result[table][name].append(read_npy(os.path.join(out_dir, part['name'], table, f'{name}.npy')))
+    return result
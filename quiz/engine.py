@@ -0,0 +1,57 @@
+"""Database engine tuning profile.
+
+SQLite files get per-connection PRAGMAs applied from a ``connect`` event
+(WAL journal so readers never block the writer, relaxed fsync, a busy
+timeout instead of immediate "database is locked" errors, and larger page
+and mmap caches). Server databases get pool sizing, recycling and pre-ping
+through ``SQLALCHEMY_ENGINE_OPTIONS``. Both are driven by the ``DB_*``
+settings in config.py; explicit ``SQLALCHEMY_ENGINE_OPTIONS`` keys win.
+"""
+
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+def is_sqlite(uri):
+    """True if the SQLAlchemy URI points at SQLite."""
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def engine_options(config):
+    """Return SQLALCHEMY_ENGINE_OPTIONS with the pool profile filled in."""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return options  # file locks, not sockets: the default pool is fine
+    
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+    return options
+
+def sqlite_pragma_statements(pragmas):
+    """Render a {name: value} mapping as PRAGMA statements."""
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+def init_engine_tuning(app, db):
+    """Apply DB_SQLITE_PRAGMAS to every new connection of the app's SQLite engines."""
+    statements = sqlite_pragma_statements(app.config.get('DB_SQLITE_PRAGMAS') or {})
+    if not statements:
+        return
+    
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', set_pragmas)
+                logger.debug("SQLite tuning for %s: %s", engine.url, '; '.join(statements))
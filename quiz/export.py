@@ -0,0 +1,122 @@
+"""Streaming export of quiz responses.
+
+Completed quizzes are read in keyset-paginated chunks (after any archived
+ones, see quiz/retention.py) and expanded into one record per answered
+question. Question text and type come from the
+in-memory catalog, so no per-row queries are issued. Output is produced
+incrementally as CSV or NDJSON, optionally gzip-compressed on the fly, so
+memory use does not grow with table size.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+from quiz import db
+from quiz.models import CompletedQuiz
+
+EXPORT_FIELDS = ('session_id', 'quiz_id', 'question_id', 'question_text', 'question_type',
+                 'answer', 'result_type', 'created_at')
+
+def iter_completions(chunk_size=1000, quiz_id=None, start=None, end=None, archive_dir=None, after_id=0):
+    """Yield completed quiz rows in id order, one chunk per query.
+    
+    start/end filter on completed_at (start inclusive, end exclusive) and
+    after_id skips rows up to that id. With archive_dir, archived
+    completions are yielded first; they are older than anything still in
+    the table.
+    """
+    if archive_dir:
+        from quiz.retention import iter_archived_completions
+        yield from iter_archived_completions(archive_dir, quiz_id=quiz_id, start=start, end=end,
+                                             after_id=after_id)
+    
+    table = CompletedQuiz.__table__
+    query = select(table.c.id, table.c.session_id, table.c.quiz_id, table.c.responses,
+                   table.c.result_type, table.c.started_at, table.c.completed_at)
+    if quiz_id is not None:
+        query = query.where(table.c.quiz_id == quiz_id)
+    if start is not None:
+        query = query.where(table.c.completed_at >= start)
+    if end is not None:
+        query = query.where(table.c.completed_at < end)
+    
+    last_id = after_id
+    while True:
+        rows = db.session.execute(
+            query.where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1].id
+
+def iter_answer_records(completions, questions):
+    """Expand completion rows into one export record per answer.
+    
+    `questions` maps question id -> question (e.g. the catalog snapshot).
+    """
+    for row in completions:
+        try:
+            responses = json.loads(row.responses) if row.responses else {}
+        except json.JSONDecodeError:
+            continue
+        created_at = row.completed_at.isoformat() if row.completed_at else None
+        for question_id, answer in responses.items():
+            question = questions.get(int(question_id)) if question_id.isdigit() else None
+            yield {
+                'session_id': row.session_id,
+                'quiz_id': row.quiz_id,
+                'question_id': question_id,
+                'question_text': question.question_text if question else None,
+                'question_type': question.question_type if question else None,
+                'answer': answer,
+                'result_type': row.result_type,
+                'created_at': created_at
+            }
+
+def _batched(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def csv_chunks(records, batch_size=500):
+    """Render records as CSV text, one string per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for batch in _batched(records, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def ndjson_chunks(records, batch_size=500):
+    """Render records as newline-delimited JSON, one string per batch."""
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    for batch in _batched(records, batch_size):
+        yield ''.join(dumps(record) + '\n' for record in batch)
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compress a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'ndjson': ('application/x-ndjson', ndjson_chunks),
+}
@@ -0,0 +1,198 @@
+"""Quiz funnel events: begin, page_view, autosave, abandon and complete.
+
+Hot routes only append a tuple to an in-memory ring buffer; under sustained
+overload the oldest events are dropped (and counted) rather than slowing a
+request down. A background thread flushes the buffer in bulk every
+FUNNEL_FLUSH_INTERVAL seconds, either into the append-only funnel_events
+table or, with FUNNEL_SINK = 'file', as NDJSON lines appended to
+FUNNEL_LOG_PATH for shipping to another store. Abandons are also counted
+into the dashboard rollups (metric 'abandon', dimension = page).
+
+funnel_report() turns funnel_events into per-page reach and drop-off.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from quiz import db
+from quiz.models import FunnelEvent
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ('begin', 'page_view', 'autosave', 'abandon', 'complete')
+
+class FunnelBuffer:
+    """Bounded event buffer with a background bulk writer."""
+    
+    def __init__(self, app, sink='db', path=None, max_events=100000, flush_interval=5.0):
+        if sink not in ('db', 'file'):
+            raise ValueError(f"Unknown FUNNEL_SINK: {sink}")
+        self.app = app
+        self.sink = sink
+        self.path = path
+        self.flush_interval = flush_interval
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._wakeup = threading.Event()
+        self.written = 0
+        self.dropped = 0
+    
+    @classmethod
+    def from_config(cls, app):
+        return cls(app,
+                   sink=app.config.get('FUNNEL_SINK', 'db'),
+                   path=app.config.get('FUNNEL_LOG_PATH') or os.path.join(app.instance_path, 'funnel-events.ndjson'),
+                   max_events=app.config.get('FUNNEL_BUFFER_SIZE', 100000),
+                   flush_interval=app.config.get('FUNNEL_FLUSH_INTERVAL', 5.0))
+    
+    def _ensure_started(self):
+        # One flusher per process; threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._events.clear()
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='funnel-flusher', daemon=True)
+            thread.start()
+            atexit.register(self._flush_at_exit)
+    
+    def record(self, event, session_id, quiz_id, page=None):
+        """Queue one event; never blocks on I/O."""
+        self._ensure_started()
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append((datetime.utcnow(), session_id, quiz_id, event, page))
+    
+    def flush(self):
+        """Write buffered events now. Returns the number written."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.popleft())
+            except IndexError:
+                break
+        if not events:
+            return 0
+        
+        try:
+            if self.sink == 'file':
+                self._write_file(events)
+            else:
+                self._write_db(events)
+        except Exception:
+            self._events.extendleft(reversed(events))  # retry on the next cycle
+            raise
+        self.written += len(events)
+        self._count_abandons(events)
+        return len(events)
+    
+    def stats(self):
+        return {'buffered': len(self._events), 'written': self.written, 'dropped': self.dropped}
+    
+    def _write_db(self, events):
+        rows = [
+            {'created_at': created_at, 'session_id': session_id, 'quiz_id': quiz_id,
+             'event': event, 'page': page}
+            for created_at, session_id, quiz_id, event, page in events
+        ]
+        with self.app.app_context():
+            try:
+                db.session.execute(FunnelEvent.__table__.insert(), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+    
+    def _write_file(self, events):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = ''.join(
+            json.dumps({'ts': created_at.isoformat(), 'session_id': session_id, 'quiz_id': quiz_id,
+                        'event': event, 'page': page}, separators=(',', ':')) + '\n'
+            for created_at, session_id, quiz_id, event, page in events
+        )
+        # One O_APPEND write per batch keeps lines from different workers whole
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+    
+    def _count_abandons(self, events):
+        rollups = self.app.extensions.get('rollups')
+        if rollups is None:
+            return
+        deltas = Counter(
+            (quiz_id, created_at.date(), 'abandon', str(page or ''), '')
+            for created_at, session_id, quiz_id, event, page in events
+            if event == 'abandon'
+        )
+        if deltas:
+            rollups.add(deltas)
+    
+    def _flush_at_exit(self):
+        self.flush()
+        rollups = self.app.extensions.get('rollups')
+        if rollups is not None:
+            rollups.flush()  # pick up the abandons just counted
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Funnel flush failed")
+
+def record_event(event, session_id, quiz_id, page=None):
+    """Record a funnel event for the current app, if funnel tracking is enabled."""
+    funnel = current_app.extensions.get('funnel')
+    if funnel is not None and session_id:
+        funnel.record(event, session_id, quiz_id, page=page)
+
+def funnel_report(quiz_id=None, start=None, end=None):
+    """Distinct sessions per funnel step and page, with per-page drop-off.
+    
+    quiz_id None reports across all quizzes and versions.
+    """
+    table = FunnelEvent.__table__
+    scope = [table.c.quiz_id == quiz_id] if quiz_id is not None else []
+    if start is not None:
+        scope.append(table.c.created_at >= start)
+    if end is not None:
+        scope.append(table.c.created_at < end)
+    
+    counts = {
+        (event, page): sessions
+        for event, page, sessions in db.session.execute(
+            select(table.c.event, table.c.page, func.count(func.distinct(table.c.session_id)))
+            .where(*scope)
+            .group_by(table.c.event, table.c.page)
+        )
+    }
+    
+    pages = []
+    for page in sorted({page for event, page in counts if event == 'page_view' and page is not None}):
+        reached = counts.get(('page_view', page), 0)
+        abandoned = counts.get(('abandon', page), 0)
+        pages.append({
+            'page': page,
+            'reached': reached,
+            'abandoned': abandoned,
+            'drop_off_rate': abandoned / reached * 100 if reached else 0.0,
+        })
+    return {
+        'starts': sum(n for (event, _), n in counts.items() if event == 'begin'),
+        'completions': sum(n for (event, _), n in counts.items() if event == 'complete'),
+        'abandons': sum(n for (event, _), n in counts.items() if event == 'abandon'),
+        'pages': pages,
+    }
@@ -0,0 +1,122 @@
+"""Structured, non-blocking logging for the quiz package.
+
+configure_logging() routes the ``quiz`` and ``admin`` loggers through a
+QueueHandler, so request threads only enqueue records. A listener thread
+formats them (JSON lines by default) and writes them to stderr.
+
+High-frequency events can be sampled. Pass ``extra={'event': name}`` and
+set LOG_SAMPLE_RATES, e.g. ``{'autosave': 0.01}`` keeps about 1% of
+autosave records. Warnings and errors are never sampled.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields become top-level keys."""
+    
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records for configured events below WARNING."""
+    
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates or {})
+    
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < rate
+
+class ForkSafeQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that (re)starts its listener thread in each process."""
+    
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+    
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self.queue, self.target,
+                                                            respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._stop_listener)
+    
+    def _stop_listener(self):
+        # Drains queued records; safe to call more than once
+        if self._listener is not None and self._pid == os.getpid() and self._listener._thread is not None:
+            self._listener.stop()
+    
+    def prepare(self, record):
+        # Format in the listener thread, not the request thread; only make
+        # sure the message and exception are resolved and picklable
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+    
+    def close(self):
+        self._stop_listener()
+        super().close()
+
+def configure_logging(app):
+    """Install the queue-based handler on the quiz and admin loggers."""
+    level = app.config.get('LOG_LEVEL', 'INFO')
+    target = logging.StreamHandler(sys.stderr)
+    if app.config.get('LOG_FORMAT', 'json') == 'json':
+        target.setFormatter(JSONFormatter())
+    else:
+        target.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    
+    handler = ForkSafeQueueHandler(target)
+    handler.addFilter(SamplingFilter(app.config.get('LOG_SAMPLE_RATES')))
+    
+    for name in ('quiz', 'admin'):
+        logger = logging.getLogger(name)
+        for existing in [h for h in logger.handlers if isinstance(h, ForkSafeQueueHandler)]:
+            logger.removeHandler(existing)
+            existing.close()
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
@@ -0,0 +1,220 @@
+"""Opt-in per-request instrumentation.
+
+With METRICS_ENABLED the app records, per endpoint, request count and
+latency, SQL statement count and time (SQLAlchemy engine events),
+template render time (Flask template signals), and session save time
+(cookie signing plus server-side store writes).
+
+Totals are served in Prometheus text format at METRICS_PATH. With
+METRICS_SERVER_TIMING, each response also carries a ``Server-Timing``
+header. Counters are per process.
+
+When disabled nothing is registered; the only cost left is the
+module-level flag check in track().
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from flask import Response, current_app, g, has_request_context, request
+from flask import before_render_template, request_finished, request_started, template_rendered
+from flask.sessions import SecureCookieSessionInterface
+from sqlalchemy import event
+
+from quiz import db
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_enabled = False
+
+def track(kind):
+    """Context manager adding elapsed time to the current request's `kind` timer."""
+    if not _enabled or not has_request_context() or 'request_metrics' not in g:
+        return nullcontext()
+    return _track(kind)
+
+@contextmanager
+def _track(kind):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.request_metrics[kind] += time.perf_counter() - start
+
+class MetricsRegistry:
+    """Thread-safe per-endpoint aggregates."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)          # (endpoint, status) -> count
+        self.duration_sum = defaultdict(float)    # endpoint -> seconds
+        self.duration_buckets = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+        self.totals = defaultdict(lambda: defaultdict(float))  # endpoint -> kind -> value
+    
+    def observe(self, endpoint, status, duration, timers):
+        with self._lock:
+            self.requests[(endpoint, status)] += 1
+            self.duration_sum[endpoint] += duration
+            buckets = self.duration_buckets[endpoint]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            totals = self.totals[endpoint]
+            for kind, value in timers.items():
+                totals[kind] += value
+    
+    def render(self, extra_gauges=()):
+        """Prometheus text exposition format."""
+        lines = []
+        
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        
+        with self._lock:
+            metric('quiz_requests_total', 'counter', 'Requests handled.',
+                   [({'endpoint': e, 'status': s}, n) for (e, s), n in sorted(self.requests.items())])
+            
+            lines.append('# HELP quiz_request_duration_seconds Request latency.')
+            lines.append('# TYPE quiz_request_duration_seconds histogram')
+            for endpoint, buckets in sorted(self.duration_buckets.items()):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS + ('+Inf',), buckets):
+                    cumulative += count
+                    lines.append(f'quiz_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'quiz_request_duration_seconds_sum{{endpoint="{endpoint}"}} {self.duration_sum[endpoint]}')
+                lines.append(f'quiz_request_duration_seconds_count{{endpoint="{endpoint}"}} {cumulative}')
+            
+            for kind, name, help_text in (
+                ('sql_count', 'quiz_sql_queries_total', 'SQL statements executed.'),
+                ('sql', 'quiz_sql_duration_seconds_total', 'Time spent executing SQL.'),
+                ('template', 'quiz_template_render_seconds_total', 'Time spent rendering templates.'),
+                ('session', 'quiz_session_save_seconds_total', 'Time spent serializing and saving session state.'),
+            ):
+                metric(name, 'counter', help_text,
+                       [({'endpoint': e}, totals[kind]) for e, totals in sorted(self.totals.items())])
+        
+        for name, help_text, value in extra_gauges:
+            metric(name, 'gauge', help_text, [({}, value)])
+        return '\n'.join(lines) + '\n'
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """Cookie session interface that reports save time to the request metrics."""
+    
+    def save_session(self, app, session, response):
+        with track('session'):
+            return super().save_session(app, session, response)
+
+def init_metrics(app):
+    """Register instrumentation hooks when METRICS_ENABLED is set."""
+    global _enabled
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    _enabled = True
+    registry = app.extensions['metrics'] = MetricsRegistry()
+    
+    def on_request_started(sender, **extra):
+        g.request_metrics = defaultdict(float)
+        g.request_metrics_start = time.perf_counter()
+    
+    def on_request_finished(sender, response, **extra):
+        timers = g.pop('request_metrics', None)
+        if timers is None:
+            return
+        duration = time.perf_counter() - g.pop('request_metrics_start')
+        registry.observe(request.endpoint or 'unmatched', response.status_code, duration, timers)
+    
+    def on_before_render(sender, template, context, **extra):
+        if 'request_metrics' in g:
+            g.request_metrics_template_start = time.perf_counter()
+    
+    def on_rendered(sender, template, context, **extra):
+        start = g.pop('request_metrics_template_start', None)
+        if start is not None:
+            g.request_metrics['template'] += time.perf_counter() - start
+    
+    request_started.connect(on_request_started, app, weak=False)
+    request_finished.connect(on_request_finished, app, weak=False)
+    before_render_template.connect(on_before_render, app, weak=False)
+    template_rendered.connect(on_rendered, app, weak=False)
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'request_metrics' in g:
+            context._metrics_start = time.perf_counter()
+    
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_metrics_start', None)
+        if start is not None and has_request_context() and 'request_metrics' in g:
+            g.request_metrics['sql'] += time.perf_counter() - start
+            g.request_metrics['sql_count'] += 1
+    
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+    
+    app.session_interface = TimedSessionInterface()
+    
+    if app.config.get('METRICS_SERVER_TIMING'):
+        @app.after_request
+        def add_server_timing(response):
+            timers = g.get('request_metrics')
+            if timers is not None:
+                total = time.perf_counter() - g.request_metrics_start
+                response.headers['Server-Timing'] = ', '.join([
+                    f'sql;desc="{int(timers["sql_count"])} queries";dur={timers["sql"] * 1000:.2f}',
+                    f'tpl;dur={timers["template"] * 1000:.2f}',
+                    f'session;dur={timers["session"] * 1000:.2f}',
+                    f'app;dur={total * 1000:.2f}',
+                ])
+            return response
+    
+    @app.route(app.config.get('METRICS_PATH', '/metrics'), endpoint='metrics')
+    def metrics_endpoint():
+        from quiz.services import catalog_cache
+        cache = catalog_cache.stats()
+        gauges = [
+            ('quiz_catalog_cache_hits', 'Catalog cache hits in this process.', cache['hits']),
+            ('quiz_catalog_cache_misses', 'Catalog cache misses in this process.', cache['misses']),
+            ('quiz_catalog_snapshots', 'Quiz catalog versions held in this process.', cache['quizzes']),
+        ]
+        pages = current_app.extensions.get('quiz_page_cache')
+        if pages is not None:
+            stats = pages.stats()
+            gauges += [
+                ('quiz_page_cache_hits', 'Rendered-page cache hits in this process.', stats['hits']),
+                ('quiz_page_cache_misses', 'Rendered-page cache misses in this process.', stats['misses']),
+            ]
+        funnel = current_app.extensions.get('funnel')
+        if funnel is not None:
+            stats = funnel.stats()
+            gauges += [
+                ('quiz_funnel_events_buffered', 'Funnel events waiting to be flushed.', stats['buffered']),
+                ('quiz_funnel_events_written', 'Funnel events flushed by this process.', stats['written']),
+                ('quiz_funnel_events_dropped', 'Funnel events dropped because the buffer was full.', stats['dropped']),
+            ]
+        shedder = current_app.extensions.get('load_shedder')
+        if shedder is not None:
+            stats = shedder.stats()
+            gauges += [
+                ('quiz_requests_in_flight', 'Requests in flight in this process.', stats['pending']),
+                ('quiz_requests_shed', 'Autosave/beacon requests rejected under load.', stats['shed']),
+            ]
+        writer = current_app.extensions.get('completion_writer')
+        if writer is not None:
+            stats = writer.stats()
+            gauges += [
+                ('quiz_completion_queue_depth', 'Completions waiting for the writer.', stats['queued']),
+                ('quiz_completions_written', 'Completions written by the writer.', stats['written']),
+                ('quiz_completions_rejected', 'Completions that fell back to a sync write.', stats['rejected']),
+                ('quiz_completions_unsaved', 'Completions held for a retry after a database error.', stats['unsaved']),
+                ('quiz_completions_quarantined', 'Completions moved to the rejected file.', stats['quarantined']),
+            ]
+        return Response(registry.render(gauges), mimetype='text/plain; version=0.0.4')
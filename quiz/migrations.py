@@ -0,0 +1,152 @@
+"""Schema upgrades for existing databases.
+
+db.create_all() only creates missing tables; it never adds indexes or
+columns to tables that already exist. Each migration here is an idempotent
+step, recorded in schema_migrations once applied. Run ``flask upgrade-db``
+after deploying a release that adds one.
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import exists, inspect, select, text
+
+from quiz import db
+from quiz.models import Quiz, QuizPointer, Question, CompletedQuiz, CompletedAnswer, FunnelEvent, UserAgent, slugify
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('id', db.String(100), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+MIGRATIONS = []
+
+def migration(migration_id):
+    """Register an upgrade step; steps run in registration order."""
+    def decorator(fn):
+        MIGRATIONS.append((migration_id, fn))
+        return fn
+    return decorator
+
+def applied_migrations():
+    schema_migrations.create(bind=db.engine, checkfirst=True)
+    return {row[0] for row in db.session.execute(select(schema_migrations.c.id))}
+
+def upgrade(log=print):
+    """Apply pending migrations. Returns the ids applied."""
+    done = applied_migrations()
+    applied = []
+    for migration_id, fn in MIGRATIONS:
+        if migration_id in done:
+            continue
+        log(f"Applying {migration_id}")
+        fn(log)
+        db.session.execute(schema_migrations.insert().values(id=migration_id, applied_at=datetime.utcnow()))
+        db.session.commit()
+        applied.append(migration_id)
+    return applied
+
+def add_column(table, column):
+    """ALTER TABLE ... ADD COLUMN for a model column missing from an existing table."""
+    existing = {c['name'] for c in inspect(db.engine).get_columns(table.name)}
+    if column.name in existing:
+        return False
+    column_type = column.type.compile(dialect=db.engine.dialect)
+    db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    db.session.commit()
+    return True
+
+def backfill_completed_answers(chunk_size=1000, log=print):
+    """Populate completed_answers for completions that have none."""
+    quizzes = CompletedQuiz.__table__
+    answers = CompletedAnswer.__table__
+    missing = ~exists().where(answers.c.completion_id == quizzes.c.id)
+    
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(quizzes.c.id, quizzes.c.quiz_id, quizzes.c.responses, quizzes.c.completed_at)
+            .where(quizzes.c.id > last_id, missing)
+            .order_by(quizzes.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return total
+        
+        batch = []
+        for completion_id, quiz_id, responses, completed_at in rows:
+            try:
+                decoded = json.loads(responses) if responses else {}
+            except json.JSONDecodeError:
+                continue
+            batch.extend(
+                {'completion_id': completion_id, 'quiz_id': quiz_id, 'question_id': int(question_id),
+                 'answer': answer, 'completed_at': completed_at}
+                for question_id, answer in decoded.items() if question_id.isdigit()
+            )
+        if batch:
+            db.session.execute(answers.insert(), batch)
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+        log(f"  backfilled answers for {total} completions")
+
+@migration('0001_completed_answers')
+def _completed_answers(log):
+    """Normalized answers table, analytics indexes, and backfill."""
+    CompletedAnswer.__table__.create(bind=db.engine, checkfirst=True)
+    for index in CompletedQuiz.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
+    backfill_completed_answers(log=log)
+
+@migration('0002_funnel_events')
+def _funnel_events(log):
+    """Append-only funnel event table."""
+    FunnelEvent.__table__.create(bind=db.engine, checkfirst=True)
+
+@migration('0003_quiz_versions')
+def _quiz_versions(log):
+    """Quiz slug/version columns, per-question is_active and live-version pointers."""
+    quizzes = Quiz.__table__
+    add_column(quizzes, quizzes.c.slug)
+    add_column(quizzes, quizzes.c.version)
+    add_column(Question.__table__, Question.__table__.c.is_active)
+    db.session.execute(Question.__table__.update()
+                       .where(Question.__table__.c.is_active.is_(None)).values(is_active=True))
+    
+    # Quizzes sharing a title become successive versions of one slug
+    versions = {}
+    for quiz_id, title, slug, version in db.session.execute(
+        select(quizzes.c.id, quizzes.c.title, quizzes.c.slug, quizzes.c.version).order_by(quizzes.c.id)
+    ).all():
+        slug = slug or slugify(title)
+        versions[slug] = versions.get(slug, 0) + 1
+        if version is None:
+            db.session.execute(quizzes.update().where(quizzes.c.id == quiz_id)
+                               .values(slug=slug, version=f'v{versions[slug]}'))
+    db.session.commit()
+    for index in quizzes.indexes:
+        index.create(bind=db.engine, checkfirst=True)
+    
+    # The first active quiz of each slug stays live, as get_active_quiz() used to pick
+    QuizPointer.__table__.create(bind=db.engine, checkfirst=True)
+    pointers = QuizPointer.__table__
+    live = {row[0] for row in db.session.execute(select(pointers.c.slug))}
+    for quiz_id, slug in db.session.execute(
+        select(quizzes.c.id, quizzes.c.slug).where(quizzes.c.is_active.is_(True)).order_by(quizzes.c.id)
+    ).all():
+        if slug not in live:
+            live.add(slug)
+            db.session.execute(pointers.insert().values(slug=slug, quiz_id=quiz_id, activated_at=datetime.utcnow()))
+            log(f"  {slug} -> quiz {quiz_id}")
+    db.session.commit()
+
+@migration('0004_user_agents')
+def _user_agents(log):
+    """Interned User-Agent strings for completed_quizzes."""
+    from quiz.retention import intern_existing_user_agents
+    UserAgent.__table__.create(bind=db.engine, checkfirst=True)
+    add_column(CompletedQuiz.__table__, CompletedQuiz.__table__.c.user_agent_id)
+    intern_existing_user_agents(log=log)
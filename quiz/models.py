@@ -1,14 +1,55 @@
 """Database models for the quiz application."""
 
 import json
+import re
 from datetime import datetime
 from quiz import db
 
+SLUG_PATTERN = r'^[a-z0-9]+(?:-[a-z0-9]+)*$'
+
+def slugify(text):
+    """URL slug for a quiz title: lowercase words joined by hyphens."""
+    return re.sub(r'[^a-z0-9]+', '-', (text or '').lower()).strip('-')[:100] or 'quiz'
+
+def _memoized_json(instance, attr, default):
+    """Decode a JSON text column, memoizing the result per loaded value.
+    
+    The memo is keyed on the raw string, so assigning a new value to the
+    column invalidates it. Callers must treat the returned value as read-only.
+    """
+    raw = getattr(instance, attr)
+    if not raw:
+        return default()
+    
+    memo = instance.__dict__.get('_json_memo')
+    if memo is None:
+        memo = instance.__dict__['_json_memo'] = {}
+    cached = memo.get(attr)
+    if cached is not None and cached[0] is raw:
+        return cached[1]
+    
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        value = default()
+    memo[attr] = (raw, value)
+    return value
+
 class Quiz(db.Model):
-    """Quiz model - contains quiz metadata."""
+    """Quiz model - contains quiz metadata.
+    
+    Each row is one version of the quiz published under `slug`; which
+    version is live is recorded in QuizPointer. is_active takes a quiz
+    offline without touching its pointer.
+    """
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        db.Index('uq_quizzes_slug_version', 'slug', 'version', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(100), nullable=False)
+    version = db.Column(db.String(50), nullable=False, default='v1')
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -20,6 +61,21 @@ class Quiz(db.Model):
     def __repr__(self):
         return f'<Quiz {self.title}>'
 
+class QuizPointer(db.Model):
+    """Live version of each quiz slug.
+    
+    Activating a version rewrites this one row, so the switch is atomic and
+    sessions already running on the previous version are not affected.
+    """
+    __tablename__ = 'quiz_pointers'
+    
+    slug = db.Column(db.String(100), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    activated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<QuizPointer {self.slug} -> {self.quiz_id}>'
+
 class Question(db.Model):
     """Question model - individual quiz questions."""
     __tablename__ = 'questions'
@@ -33,15 +89,15 @@ class Question(db.Model):
     required = db.Column(db.Boolean, default=True)
     order_index = db.Column(db.Integer, nullable=False)
     weight = db.Column(db.Float, default=1.0)
+    is_active = db.Column(db.Boolean, default=True)
     
     def get_options(self):
-        """Parse options JSON string."""
-        if self.options:
-            try:
-                return json.loads(self.options)
-            except json.JSONDecodeError:
-                return []
-        return []
+        """Parse options JSON string (decoded once per loaded value)."""
+        return _memoized_json(self, 'options', list)
+    
+    def set_options(self, options):
+        """Store options as a JSON string."""
+        self.options = json.dumps(options) if options else None
     
     def __repr__(self):
         return f'<Question {self.question_text[:50]}...>'
@@ -54,8 +110,10 @@ class CompletedQuiz(db.Model):
     session_id = db.Column(db.String(36), nullable=False, unique=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
     
-    # User data
+    # User data; the agent string is interned in user_agents (rows written
+    # before migration 0004 kept it inline in user_agent)
     user_ip = db.Column(db.String(45))
+    user_agent_id = db.Column(db.Integer, db.ForeignKey('user_agents.id'))
     user_agent = db.Column(db.Text)
     
     # Timing
@@ -69,24 +127,98 @@ class CompletedQuiz(db.Model):
     
     # Relationships
     quiz = db.relationship('Quiz', backref='completed_quizzes')
+    agent = db.relationship('UserAgent')
+    
+    __table_args__ = (
+        # Dashboard/analytics access patterns: per-quiz time ranges and result breakdowns
+        db.Index('ix_completed_quizzes_quiz_completed_at', 'quiz_id', 'completed_at'),
+        db.Index('ix_completed_quizzes_quiz_result_type', 'quiz_id', 'result_type'),
+    )
     
     def get_responses(self):
-        """Parse responses JSON string."""
-        if self.responses:
-            try:
-                return json.loads(self.responses)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        """Parse responses JSON string (decoded once per loaded value)."""
+        return _memoized_json(self, 'responses', dict)
     
     def get_result_data(self):
-        """Parse result data JSON string."""
-        if self.result_data:
-            try:
-                return json.loads(self.result_data)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        """Parse result data JSON string (decoded once per loaded value)."""
+        return _memoized_json(self, 'result_data', dict)
+    
+    def __repr__(self):
+        return f'<CompletedQuiz {self.session_id}>'
+
+class UserAgent(db.Model):
+    """Distinct User-Agent strings, referenced by CompletedQuiz.user_agent_id."""
+    __tablename__ = 'user_agents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_agent = db.Column(db.String(512), nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f'<UserAgent {self.user_agent[:50]}>'
+
+class CompletedAnswer(db.Model):
+    """One answer from a completed quiz, normalized out of CompletedQuiz.responses."""
+    __tablename__ = 'completed_answers'
+    __table_args__ = (
+        # Covers "how many chose X for question Y" as an index-only GROUP BY
+        db.Index('ix_completed_answers_quiz_question_answer', 'quiz_id', 'question_id', 'answer'),
+        db.Index('ix_completed_answers_quiz_question_completed_at', 'quiz_id', 'question_id', 'completed_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    completion_id = db.Column(db.Integer, db.ForeignKey('completed_quizzes.id', ondelete='CASCADE'),
+                              nullable=False, index=True)
+    quiz_id = db.Column(db.Integer, nullable=False)
+    question_id = db.Column(db.Integer, nullable=False)
+    answer = db.Column(db.Text)
+    completed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<CompletedAnswer {self.completion_id}:{self.question_id}>'
+
+class AnalyticsRollup(db.Model):
+    """Pre-aggregated counters read by the admin dashboard.
+    
+    One row per (quiz, period bucket, metric, dimension, value). Metrics:
+    'start', 'completion', 'result_type' (value = result type), 'answer'
+    (dimension = question id, value = chosen option) and 'abandon'
+    (dimension = page the session was abandoned on).
+    """
+    __tablename__ = 'analytics_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('quiz_id', 'granularity', 'bucket_date', 'metric', 'dimension', 'value',
+                            name='uq_analytics_rollup_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, nullable=False)
+    granularity = db.Column(db.String(5), nullable=False, default='day')  # day, month
+    bucket_date = db.Column(db.Date, nullable=False)
+    metric = db.Column(db.String(20), nullable=False)
+    dimension = db.Column(db.String(50), nullable=False, default='')
+    value = db.Column(db.String(200), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<AnalyticsRollup {self.metric} {self.bucket_date} {self.value}>'
+
+class FunnelEvent(db.Model):
+    """Append-only quiz funnel event, written in bulk by quiz.funnel.FunnelBuffer.
+    
+    Events: 'begin', 'page_view' and 'autosave' (with the page), 'abandon'
+    (page the user was on when the tab closed) and 'complete'.
+    """
+    __tablename__ = 'funnel_events'
+    __table_args__ = (
+        db.Index('ix_funnel_events_quiz_event_created_at', 'quiz_id', 'event', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    session_id = db.Column(db.String(36), nullable=False, index=True)
+    quiz_id = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.String(20), nullable=False)
+    page = db.Column(db.Integer)
     
     def __repr__(self):
-        return f'<CompletedQuiz {self.session_id}>'
\ No newline at end of file
+        return f'<FunnelEvent {self.event} {self.session_id}>'
@@ -0,0 +1,275 @@
+"""Rate limiting and load shedding for the autosave and beacon endpoints.
+
+/save_answer, /save_answers and /cleanup_session are unauthenticated and
+called in the background, so a broken client or a script can flood them
+and crowd /submit out of the same workers. Two guards sit in front of
+them (LIMITED_ENDPOINTS):
+
+- Token buckets per quiz session and per client IP (RATE_LIMIT_SESSION,
+  RATE_LIMIT_IP as (tokens per second, burst)). An empty bucket answers
+  429 with Retry-After. RATE_LIMIT_STORE 'memory' keeps the buckets per
+  process; 'sqlite' keeps them in one file shared by all workers on the
+  host, like the sqlite session store. The IP is request.remote_addr,
+  which behind a reverse proxy is only the client's with
+  TRUSTED_PROXY_HOPS set (quiz/__init__.py applies ProxyFix).
+- Load shedding: once more than LOAD_SHED_MAX_PENDING requests are in
+  flight in the process (under ASGI, including those still waiting for a
+  thread), these endpoints answer 503 straight away so the threads go to
+  page loads and /submit. Under ASGI the 503 is sent from the event loop
+  without borrowing a thread at all. A threaded WSGI worker never has more
+  requests in flight than threads, so there the threshold must sit below
+  GUNICORN_THREADS; left unset it is derived from the thread count of
+  whichever server runs the app.
+
+/submit and page loads are never limited or shed. The client-side
+autosave keeps rejected answers and sends them again later; they are also
+part of the final submit.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request, session
+
+logger = logging.getLogger(__name__)
+
+LIMITED_ENDPOINTS = frozenset(('save_answer', 'save_answers', 'cleanup_session'))
+
+# environ key marking a request as already counted by the load shedder
+PENDING_KEY = 'quiz.load_shedder'
+
+# Default ASGI threshold, in requests per pool thread (running or queued)
+ASGI_PENDING_PER_THREAD = 4
+
+def is_limited(endpoint):
+    """True for the autosave/beacon endpoints, under either blueprint registration."""
+    return bool(endpoint) and endpoint.rsplit('.', 1)[-1] in LIMITED_ENDPOINTS
+
+class RateLimiter:
+    """Interface for token-bucket storage keyed by an arbitrary string."""
+    
+    def consume(self, key, rate, burst):
+        """Take one token from `key`'s bucket.
+        
+        Returns 0.0 if a token was taken, otherwise the seconds until one
+        will be available.
+        """
+        raise NotImplementedError
+
+def _refill(tokens, updated, now, rate, burst):
+    """Refill a bucket for the time since `updated` and take a token if one is there.
+    
+    Returns (new level, seconds until the next token or 0.0 if one was taken).
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+class MemoryRateLimiter(RateLimiter):
+    """In-process buckets; each worker enforces the limits on its own."""
+    
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+    
+    def consume(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, retry_after = _refill(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)  # a forgotten bucket restarts full
+        return retry_after
+
+class SQLiteRateLimiter(RateLimiter):
+    """Buckets in a SQLite file shared by all workers on one host.
+    
+    Each check is one short IMMEDIATE transaction. If the file stays
+    locked past `timeout` the request is let through rather than delayed.
+    """
+    
+    PURGE_EVERY = 1000  # checks between sweeps of idle (refilled) buckets
+    
+    def __init__(self, path, timeout=0.25):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._checks = 0
+    
+    def _connect(self):
+        # One connection per thread; reconnect after fork. Created lazily.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # losing a few refills in a crash is harmless
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def consume(self, key, rate, burst):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?',
+                                   (key,)).fetchone()
+                tokens, retry_after = _refill(*(row or (burst, now)), now, rate, burst)
+                conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                             (key, tokens, now))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.OperationalError:
+            logger.warning("Rate limit store busy; allowing request", exc_info=True)
+            return 0.0
+        
+        self._checks += 1
+        if self._checks % self.PURGE_EVERY == 0:
+            self.purge_idle(max_age=3600)
+        return retry_after
+    
+    def purge_idle(self, max_age):
+        """Delete buckets untouched for `max_age` seconds (long since full again)."""
+        try:
+            self._connect().execute('DELETE FROM rate_limit_buckets WHERE updated < ?', (time.time() - max_age,))
+        except sqlite3.OperationalError:
+            pass  # next sweep
+
+def create_rate_limiter(app):
+    """Build the limiter selected by RATE_LIMIT_STORE, or None when disabled."""
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    backend = app.config.get('RATE_LIMIT_STORE', 'memory')
+    if backend == 'memory':
+        return MemoryRateLimiter()
+    if backend == 'sqlite':
+        path = app.config.get('RATE_LIMIT_STORE_PATH') or os.path.join(app.instance_path, 'ratelimit.db')
+        return SQLiteRateLimiter(path)
+    raise ValueError(f"Unknown RATE_LIMIT_STORE backend: {backend}")
+
+class LoadShedder:
+    """Per-process count of requests in flight."""
+    
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+    
+    def enter(self):
+        with self._lock:
+            self.pending += 1
+    
+    def exit(self):
+        with self._lock:
+            self.pending -= 1
+    
+    def overloaded(self):
+        """True when low-priority requests should be turned away."""
+        return bool(self.max_pending) and self.pending > self.max_pending
+    
+    def reject(self):
+        self.shed += 1
+    
+    def stats(self):
+        return {'pending': self.pending, 'shed': self.shed}
+
+def _error(message, status, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def init_rate_limiting(app):
+    """Register the limiter and load shedder for LIMITED_ENDPOINTS."""
+    limiter = app.extensions['rate_limiter'] = create_rate_limiter(app)
+    max_pending = app.config.get('LOAD_SHED_MAX_PENDING')
+    if max_pending is None:
+        # Shed once every thread is busy; a single-threaded worker never sheds
+        max_pending = max(0, app.config.get('GUNICORN_THREADS', 4) - 1)
+    shedder = app.extensions['load_shedder'] = LoadShedder(max_pending)
+    session_limit = app.config.get('RATE_LIMIT_SESSION')
+    ip_limit = app.config.get('RATE_LIMIT_IP')
+    
+    @app.before_request
+    def guard_background_endpoints():
+        # Under ASGI the request was counted (and maybe shed) before it got a thread
+        if PENDING_KEY not in request.environ:
+            request.environ[PENDING_KEY] = 'wsgi'
+            shedder.enter()
+        if not is_limited(request.endpoint):
+            return None
+        
+        if shedder.overloaded():
+            shedder.reject()
+            return _error('Server busy', 503, 1)
+        if limiter is None:
+            return None
+        checks = []
+        if session_limit and session.get('quiz_session_id'):
+            checks.append(('session:' + session['quiz_session_id'], session_limit))
+        if ip_limit and request.remote_addr:
+            checks.append(('ip:' + request.remote_addr, ip_limit))
+        for key, (rate, burst) in checks:
+            retry_after = limiter.consume(key, rate, burst)
+            if retry_after:
+                logger.info("Rate limited %s", key.split(':', 1)[0], extra={'event': 'rate_limited'})
+                return _error('Too many requests', 429, retry_after)
+        return None
+    
+    @app.teardown_request
+    def release_pending(exc):
+        if request.environ.get(PENDING_KEY) == 'wsgi':
+            shedder.exit()
+
+def use_asgi_threads(app, threads):
+    """ASGI hook: size an unset LOAD_SHED_MAX_PENDING for a pool of `threads`."""
+    shedder = app.extensions.get('load_shedder')
+    if shedder is not None and app.config.get('LOAD_SHED_MAX_PENDING') is None:
+        shedder.max_pending = ASGI_PENDING_PER_THREAD * threads
+
+def shed_before_dispatch(app, environ):
+    """ASGI hook: count the request and return True if it should get a 503 now.
+    
+    Called on the event loop before the request waits for a thread, so the
+    count includes requests queued for the pool. A counted request must be
+    released with finish_dispatch().
+    """
+    shedder = app.extensions.get('load_shedder')
+    if shedder is None:
+        return False
+    if shedder.overloaded():
+        try:
+            endpoint, _ = app.url_map.bind_to_environ(environ).match()
+        except Exception:  # 404/405 etc.; let Flask answer
+            endpoint = None
+        if is_limited(endpoint):
+            shedder.reject()
+            return True
+    environ[PENDING_KEY] = 'asgi'
+    shedder.enter()
+    return False
+
+def finish_dispatch(app, environ):
+    """ASGI hook: release a request counted by shed_before_dispatch()."""
+    if environ.get(PENDING_KEY) == 'asgi':
+        app.extensions['load_shedder'].exit()
@@ -0,0 +1,129 @@
+"""Rendered-page cache for the catalog-driven quiz pages.
+
+Question pages, the landing page, the single-page shell and the catalog
+JSON only change when the catalog does, so
+their HTML is rendered once per quiz catalog version and reused. Per-user state
+(the pre-filled answers) is not rendered into the markup: templates emit
+PAYLOAD_MARKER once, near the end of the document, and each request splices
+its JSON in at that point.
+
+Cached pages are also kept gzip-precompressed. The static prefix is deflated
+once and sync-flushed to a byte boundary; a request only deflates its short
+tail (payload and closing tags) with a small throwaway compressor, appends
+it as the final blocks of the same stream and writes the gzip trailer from
+the running CRC. Brotli is not used: its streams cannot be resumed like
+this, which would mean recompressing the whole page on every request.
+"""
+
+import hashlib
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+PAYLOAD_MARKER = '<!--quiz-payload-->'
+
+# Fixed gzip member header: deflate, no flags, no mtime, unknown OS
+_GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+class RenderedPage:
+    """One rendered template, split around its payload marker."""
+    
+    __slots__ = ('prefix', 'suffix', 'etag', 'gzip_level', '_gzip_prefix', '_prefix_crc', '_prefix_size')
+    
+    def __init__(self, html, gzip_level=None):
+        html = str(html)  # plain str, so Markup payloads are not re-escaped on concat
+        prefix, marker, suffix = html.partition(PAYLOAD_MARKER)
+        self.prefix = prefix
+        self.suffix = suffix if marker else ''
+        self.etag = hashlib.sha1(html.encode('utf-8')).hexdigest()[:16]
+        self.gzip_level = gzip_level
+        self._gzip_prefix = None
+        if gzip_level is not None:
+            data = prefix.encode('utf-8')
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, -15)  # raw deflate
+            self._gzip_prefix = (_GZIP_HEADER + compressor.compress(data)
+                                 + compressor.flush(zlib.Z_SYNC_FLUSH))
+            self._prefix_crc = zlib.crc32(data)
+            self._prefix_size = len(data)
+    
+    @property
+    def precompressed(self):
+        return self._gzip_prefix is not None
+    
+    def body(self, payload=''):
+        """Uncompressed HTML with `payload` spliced in."""
+        return (self.prefix + str(payload) + self.suffix).encode('utf-8')
+    
+    def gzip_body(self, payload=''):
+        """Gzip-encoded HTML with `payload` spliced in."""
+        tail = (str(payload) + self.suffix).encode('utf-8')
+        # A 512-byte window is plenty for the tail and far cheaper to set up
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, -9, 1)
+        trailer = struct.pack('<II', zlib.crc32(tail, self._prefix_crc),
+                              (self._prefix_size + len(tail)) & 0xffffffff)
+        return self._gzip_prefix + compressor.compress(tail) + compressor.flush() + trailer
+
+class PageCache:
+    """Rendered pages keyed by (catalog version, page key).
+    
+    Versions are content digests, so an edited catalog simply stops hitting
+    its old entries. Several quizzes, and the previous version of one still
+    serving in-flight sessions, share the cache; the least recently used
+    pages are evicted beyond MAX_ENTRIES.
+    """
+    
+    MAX_ENTRIES = 256
+    
+    def __init__(self, enabled=True, gzip_level=6):
+        self.enabled = enabled
+        self.gzip_level = gzip_level
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @classmethod
+    def from_config(cls, app):
+        return cls(enabled=app.config.get('PAGE_CACHE_ENABLED', True),
+                   gzip_level=app.config.get('PAGE_CACHE_GZIP_LEVEL', 6))
+    
+    def get(self, version, key, render):
+        """Return the cached page, calling render() for the HTML on a miss."""
+        if not self.enabled:
+            return RenderedPage(render())
+        
+        key = (version, key)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+        
+        page = RenderedPage(render(), gzip_level=self.gzip_level)
+        with self._lock:
+            self.misses += 1
+            self._pages[key] = page
+            while len(self._pages) > self.MAX_ENTRIES:
+                self._pages.popitem(last=False)
+        return page
+    
+    def clear(self):
+        with self._lock:
+            self._pages = OrderedDict()
+    
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._pages)}
+
+def page_response(page, payload='', mimetype='text/html'):
+    """Build a response for a cached page, gzip-encoded when the client accepts it."""
+    if page.precompressed and request.accept_encodings['gzip']:
+        response = current_app.response_class(page.gzip_body(payload), mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(page.body(payload), mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,192 @@
+"""Bulk re-scoring of historical completed quizzes.
+
+Rows are read in keyset-paginated chunks (``id > last_id``), so memory stays
+flat and each query is an index range scan. Each chunk is decoded and
+scored in one pass and written back with a single executemany UPDATE in
+its own transaction. Only rows whose result changed are updated. After
+each commit the last processed id is recorded in an optional checkpoint
+file, which lets an interrupted run resume from there.
+
+Archived completions are re-scored by rewriting their partition files
+(rescore_archive).
+"""
+
+import json
+import multiprocessing
+import os
+from collections import Counter, deque
+
+from sqlalchemy import bindparam, select, update
+
+from quiz import db
+from quiz.models import CompletedQuiz
+
+_worker_table = None
+
+def _init_worker(table):
+    global _worker_table
+    _worker_table = table
+
+def score_rows(table, rows):
+    """Score (id, responses_json, result_type, result_data_json) rows.
+    
+    Returns (changes, transitions) where changes holds update parameter
+    dicts for rows whose stored result differs.
+    """
+    changes = []
+    transitions = Counter()
+    for row_id, responses, old_type, old_data in rows:
+        try:
+            decoded = json.loads(responses) if responses else {}
+        except json.JSONDecodeError:
+            decoded = {}
+        result = table.score(decoded)
+        new_data = json.dumps(result)
+        if new_data != old_data:
+            changes.append({'b_id': row_id, 'b_type': result['result_type'], 'b_data': new_data})
+            transitions[(old_type, result['result_type'])] += 1
+    return changes, transitions
+
+def _score_in_worker(rows):
+    return score_rows(_worker_table, rows)
+
+class Checkpoint:
+    """Last committed id for a re-score run, stored as JSON."""
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def load(self):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def save(self, state):
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+def iter_chunks(chunk_size, after_id=0, quiz_id=None):
+    """Yield lists of (id, responses, result_type, result_data) in id order."""
+    table = CompletedQuiz.__table__
+    scope = [table.c.quiz_id == quiz_id] if quiz_id is not None else []
+    last_id = after_id
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.responses, table.c.result_type, table.c.result_data)
+            .where(table.c.id > last_id, *scope)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1][0]
+
+def rescore(table, chunk_size=1000, dry_run=False, checkpoint_path=None, resume=False,
+            workers=1, progress=None, quiz_id=None):
+    """Re-score every completed quiz (or only those of `quiz_id`) with the given ScoringTable.
+    
+    Returns a summary dict with scanned/changed counts and result type
+    transitions. With dry_run nothing is written, checkpoint included.
+    """
+    checkpoint = Checkpoint(None if dry_run else checkpoint_path)
+    state = {'last_id': 0, 'scanned': 0, 'changed': 0, 'scoring_version': table.version}
+    if resume:
+        saved = checkpoint.load()
+        if saved:
+            if saved.get('scoring_version') != table.version:
+                raise ValueError(
+                    f"Checkpoint was written for scoring version {saved.get('scoring_version')}, "
+                    f"not {table.version}; start a fresh run instead of resuming"
+                )
+            state.update(saved)
+    
+    transitions = Counter()
+    stmt = (
+        update(CompletedQuiz.__table__)
+        .where(CompletedQuiz.__table__.c.id == bindparam('b_id'))
+        .values(result_type=bindparam('b_type'), result_data=bindparam('b_data'))
+    )
+    
+    def apply(rows, changes, chunk_transitions):
+        transitions.update(chunk_transitions)
+        if changes and not dry_run:
+            db.session.execute(stmt, changes)
+            db.session.commit()
+        state['last_id'] = rows[-1][0]
+        state['scanned'] += len(rows)
+        state['changed'] += len(changes)
+        checkpoint.save(state)
+        if progress:
+            progress(state)
+    
+    chunks = iter_chunks(chunk_size, after_id=state['last_id'], quiz_id=quiz_id)
+    if workers > 1:
+        # The parent owns the database connection; workers only decode and
+        # score. Up to 2 chunks per worker are in flight, applied in order.
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(table,)) as pool:
+            pending = deque()
+            for rows in chunks:
+                pending.append((rows, pool.apply_async(_score_in_worker, (rows,))))
+                if len(pending) >= workers * 2:
+                    done_rows, result = pending.popleft()
+                    apply(done_rows, *result.get())
+            while pending:
+                done_rows, result = pending.popleft()
+                apply(done_rows, *result.get())
+    else:
+        for rows in chunks:
+            apply(rows, *score_rows(table, rows))
+    
+    db.session.rollback()  # end the read transaction
+    return {
+        'scanned': state['scanned'],
+        'changed': state['changed'],
+        'last_id': state['last_id'],
+        'scoring_version': table.version,
+        'transitions': {f'{old} -> {new}': count for (old, new), count in transitions.most_common()}
+    }
+
+def rescore_archive(table, archive_dir, quiz_id=None, dry_run=False, progress=None):
+    """Re-score archived completions (see quiz/retention.py) with the given ScoringTable.
+    
+    Partition files holding changed rows are rewritten atomically, so an
+    interrupted run is simply repeated; files already done report no changes.
+    """
+    from quiz.retention import iter_partitions, read_partition, write_partition
+    
+    state = {'files': 0, 'scanned': 0, 'changed': 0}
+    transitions = Counter()
+    for day, path in iter_partitions(archive_dir):
+        rows = list(read_partition(path))
+        scoped = [(row.id, row.responses, row.result_type, row.result_data)
+                  for row in rows if quiz_id is None or row.quiz_id == quiz_id]
+        changes, file_transitions = score_rows(table, scoped)
+        transitions.update(file_transitions)
+        if changes and not dry_run:
+            updated = {change['b_id']: change for change in changes}
+            write_partition(path, [
+                row._replace(result_type=updated[row.id]['b_type'], result_data=updated[row.id]['b_data'])
+                if row.id in updated else row
+                for row in rows
+            ])
+        state['files'] += 1
+        state['scanned'] += len(scoped)
+        state['changed'] += len(changes)
+        if progress:
+            progress(state)
+    
+    return {
+        'files': state['files'],
+        'scanned': state['scanned'],
+        'changed': state['changed'],
+        'transitions': {f'{old} -> {new}': count for (old, new), count in transitions.most_common()}
+    }
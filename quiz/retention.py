@@ -0,0 +1,301 @@
+"""Retention and archival for completed quizzes.
+
+``flask retention archive`` moves completions older than RETENTION_DAYS out
+of the hot completed_quizzes table into gzip-compressed NDJSON files under
+ARCHIVE_DIR, partitioned by completion date:
+
+    <ARCHIVE_DIR>/completed_quizzes/dt=2024-03-01/part-0000001200-0000001874.ndjson.gz
+
+Rows are moved in batches of RETENTION_BATCH_SIZE. Each batch is written
+and fsynced to its partition files before the rows (and their
+completed_answers) are deleted in one short transaction, so a crash can
+leave a batch archived but not yet deleted, never the reverse. When a
+later run (perhaps with another cutoff or batch size) archives those rows
+again, it first strips them from any existing file of the same day whose
+id range overlaps the new one, so each row is archived exactly once.
+Dashboard rollups are already aggregated and are not touched.
+
+User-Agent strings are interned into the user_agents table, so each
+completion stores a small integer instead of the full header.
+
+iter_archived_completions() reads the partitions back as row-like tuples
+for the export, rollup rebuild and re-scoring tools.
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time
+
+from sqlalchemy import bindparam, delete, func, select, text
+
+from quiz import db
+from quiz.models import CompletedAnswer, CompletedQuiz, UserAgent
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT_MAX_LENGTH = 512
+
+ARCHIVE_FIELDS = ('id', 'session_id', 'quiz_id', 'user_ip', 'user_agent', 'started_at',
+                  'completed_at', 'result_type', 'result_data', 'responses')
+_DATETIME_FIELDS = ('started_at', 'completed_at')
+
+ArchivedCompletion = namedtuple('ArchivedCompletion', ARCHIVE_FIELDS)
+
+def normalize_user_agent(user_agent):
+    """The form a User-Agent string is interned in (None if empty)."""
+    return user_agent[:USER_AGENT_MAX_LENGTH] if user_agent else None
+
+def intern_user_agents(connection, dialect_name, user_agents):
+    """Return {user_agent: id} for normalized strings, inserting any that are new."""
+    values = sorted(set(filter(None, user_agents)))
+    if not values:
+        return {}
+    table = UserAgent.__table__
+    rows = [{'user_agent': value} for value in values]
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        connection.execute(insert(table).on_conflict_do_nothing(index_elements=['user_agent']), rows)
+    else:
+        known = set(connection.execute(
+            select(table.c.user_agent).where(table.c.user_agent.in_(values))
+        ).scalars())
+        missing = [row for row in rows if row['user_agent'] not in known]
+        if missing:
+            connection.execute(table.insert(), missing)
+    return dict(connection.execute(
+        select(table.c.user_agent, table.c.id).where(table.c.user_agent.in_(values))
+    ).all())
+
+class UserAgentCache:
+    """Bounded LRU of User-Agent string -> user_agents.id.
+    
+    Browsers send a few hundred distinct strings at most, so after warm-up
+    a completion resolves its agent id without a query.
+    """
+    
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def lookup(self, user_agent):
+        """Return the id for `user_agent`, interning it on first sight."""
+        user_agent = normalize_user_agent(user_agent)
+        if user_agent is None:
+            return None
+        with self._lock:
+            agent_id = self._entries.get(user_agent)
+            if agent_id is not None:
+                self._entries.move_to_end(user_agent)
+                return agent_id
+        
+        # Own short transaction, independent of the request's session
+        with db.engine.begin() as connection:
+            agent_id = intern_user_agents(connection, connection.dialect.name, [user_agent])[user_agent]
+        with self._lock:
+            self._entries[user_agent] = agent_id
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return agent_id
+
+def intern_existing_user_agents(chunk_size=1000, log=print):
+    """Move inline user_agent strings of existing completions into user_agents."""
+    table = CompletedQuiz.__table__
+    dialect_name = db.engine.dialect.name
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.user_agent)
+            .where(table.c.id > last_id, table.c.user_agent.isnot(None))
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return total
+        
+        ids = intern_user_agents(db.session, dialect_name,
+                                 [normalize_user_agent(user_agent) for _, user_agent in rows])
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam('b_id'))
+            .values(user_agent_id=bindparam('b_agent'), user_agent=None),
+            [{'b_id': row_id, 'b_agent': ids.get(normalize_user_agent(user_agent))}
+             for row_id, user_agent in rows]
+        )
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+        log(f"  interned user agents for {total} completions")
+
+def archive_root(app):
+    """Directory holding the archive partitions."""
+    return app.config.get('ARCHIVE_DIR') or os.path.join(app.instance_path, 'archive')
+
+def partition_path(root, day, first_id, last_id):
+    return os.path.join(root, 'completed_quizzes', f'dt={day.isoformat()}',
+                        f'part-{first_id:010d}-{last_id:010d}.ndjson.gz')
+
+def partition_id_range(path):
+    """(first_id, last_id) from an archive file name, or None if it has no range."""
+    name = os.path.basename(path)
+    if not name.startswith('part-'):
+        return None
+    try:
+        first_id, last_id = name[len('part-'):].split('.', 1)[0].split('-')
+        return int(first_id), int(last_id)
+    except ValueError:
+        return None
+
+def iter_partitions(root, start=None, end=None, after_id=0):
+    """Yield (day, path) for archive files in date order, pruned to [start, end).
+    
+    With after_id, files whose name shows they hold only ids up to it are skipped.
+    """
+    for directory in sorted(glob.glob(os.path.join(root, 'completed_quizzes', 'dt=*'))):
+        day = date.fromisoformat(os.path.basename(directory)[len('dt='):])
+        if start is not None and datetime.combine(day, time.max) < _as_datetime(start):
+            continue
+        if end is not None and datetime.combine(day, time.min) >= _as_datetime(end):
+            continue
+        for path in sorted(glob.glob(os.path.join(directory, '*.ndjson.gz'))):
+            if after_id:
+                id_range = partition_id_range(path)
+                if id_range is not None and id_range[1] <= after_id:
+                    continue
+            yield day, path
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.combine(value, time.min)
+
+def read_partition(path):
+    """Yield ArchivedCompletion rows from one archive file."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            for field in _DATETIME_FIELDS:
+                if record.get(field):
+                    record[field] = datetime.fromisoformat(record[field])
+            yield ArchivedCompletion(**{field: record.get(field) for field in ARCHIVE_FIELDS})
+
+def write_partition(path, records):
+    """Atomically write ArchivedCompletion rows (or dicts) to `path`."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as f:
+            for record in records:
+                record = record._asdict() if isinstance(record, ArchivedCompletion) else record
+                encoded = {field: record.get(field) for field in ARCHIVE_FIELDS}
+                for field in _DATETIME_FIELDS:
+                    if encoded[field] is not None:
+                        encoded[field] = encoded[field].isoformat()
+                f.write((json.dumps(encoded, separators=(',', ':')) + '\n').encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+def iter_archived_completions(root, quiz_id=None, start=None, end=None, after_id=0):
+    """Archived completions in date order, filtered like export.iter_completions."""
+    start = _as_datetime(start) if start is not None else None
+    end = _as_datetime(end) if end is not None else None
+    for day, path in iter_partitions(root, start=start, end=end, after_id=after_id):
+        for row in read_partition(path):
+            if row.id <= after_id:
+                continue
+            if quiz_id is not None and row.quiz_id != quiz_id:
+                continue
+            if start is not None and row.completed_at < start:
+                continue
+            if end is not None and row.completed_at >= end:
+                continue
+            yield row
+
+def archive_completions(root, before, batch_size=1000, dry_run=False, log=print):
+    """Move completions finished before `before` into the archive.
+    
+    Returns the number of completions archived (or, with dry_run, that would be).
+    """
+    quizzes = CompletedQuiz.__table__
+    agents = UserAgent.__table__
+    query = (
+        select(quizzes.c.id, quizzes.c.session_id, quizzes.c.quiz_id, quizzes.c.user_ip,
+               func.coalesce(agents.c.user_agent, quizzes.c.user_agent).label('user_agent'),
+               quizzes.c.started_at, quizzes.c.completed_at, quizzes.c.result_type,
+               quizzes.c.result_data, quizzes.c.responses)
+        .select_from(quizzes.outerjoin(agents, agents.c.id == quizzes.c.user_agent_id))
+        .where(quizzes.c.completed_at < before)
+        .order_by(quizzes.c.id)
+        .limit(batch_size)
+    )
+    
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(query.where(quizzes.c.id > last_id)).all()
+        if not rows:
+            db.session.rollback()  # end the read transaction
+            return total
+        last_id = rows[-1].id
+        total += len(rows)
+        if dry_run:
+            continue
+        
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row.completed_at.date(), []).append(row._asdict())
+        for day, records in by_day.items():
+            path = partition_path(root, day, records[0]['id'], records[-1]['id'])
+            records = _supersede_archived(path, records)
+            write_partition(path, records)
+        
+        ids = [row.id for row in rows]
+        db.session.execute(delete(CompletedAnswer.__table__).where(CompletedAnswer.__table__.c.completion_id.in_(ids)))
+        db.session.execute(delete(quizzes).where(quizzes.c.id.in_(ids)))
+        db.session.commit()
+        log(f"  archived {total} completions (through id {last_id})")
+
+def _supersede_archived(path, records):
+    """Drop `records`' ids from the other files of `path`'s day whose range overlaps.
+    
+    Such copies are left by a run that crashed between writing and deleting
+    a batch; the rows are still in the table, so its copy wins. Rows already
+    in `path` itself that are not in this batch are carried over into the
+    new file. Returns the records to write to `path`.
+    """
+    ids = {record['id'] for record in records}
+    first_id, last_id = records[0]['id'], records[-1]['id']
+    carried = []
+    for other in glob.glob(os.path.join(os.path.dirname(path), '*.ndjson.gz')):
+        id_range = partition_id_range(other)
+        if id_range is None or id_range[1] < first_id or id_range[0] > last_id:
+            continue
+        rows = list(read_partition(other))
+        keep = [row for row in rows if row.id not in ids]
+        if other == path:
+            carried = [row._asdict() for row in keep]
+        elif not keep:
+            os.remove(other)
+        elif len(keep) < len(rows):
+            write_partition(other, keep)
+    if carried:
+        records = sorted(carried + records, key=lambda record: record['id'])
+    return records
+
+def reclaim_space(log=print):
+    """Return freed pages to the filesystem (SQLite only; PostgreSQL autovacuums)."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM'))
+    log("  vacuumed database file")
+    return True
@@ -1,69 +1,175 @@
 """Route handlers for the quiz application."""
 
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify
+import logging
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, current_app, g, abort
 from datetime import date
-from quiz import db
-from quiz.models import Quiz, Question, CompletedQuiz
-from quiz.services import SessionService, QuizService, ResultCalculator
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from quiz.services import SessionService, QuizService, catalog_cache
+from quiz.render import PAYLOAD_MARKER, page_response
+from quiz.funnel import record_event
 
-# Create blueprint
+logger = logging.getLogger(__name__)
+
+# Create blueprint. It is registered twice: at / for the default quiz
+# (DEFAULT_QUIZ_SLUG) and at /q/<slug>/ for every quiz, so templates and
+# redirects use relative endpoints ('.results') to stay on the same one.
 quiz_bp = Blueprint('quiz', __name__)
 
+@quiz_bp.url_value_preprocessor
+def pull_quiz_slug(endpoint, values):
+    g.quiz_slug = values.pop('slug', None) if values else None
+
+@quiz_bp.url_defaults
+def add_quiz_slug(endpoint, values):
+    slug = g.get('quiz_slug')
+    if slug and 'slug' not in values and current_app.url_map.is_endpoint_expecting(endpoint, 'slug'):
+        values['slug'] = slug
+
+def _live_snapshot():
+    """Live catalog of the quiz this URL addresses."""
+    snapshot = catalog_cache.for_slug(g.quiz_slug)
+    if snapshot is None:
+        abort(404)
+    return snapshot
+
+def _session_snapshot(session_data):
+    """Catalog of the version the session started on, or None if it is another quiz's."""
+    snapshot = catalog_cache.get(session_data['quiz_id'])
+    if g.quiz_slug and (snapshot.quiz is None or snapshot.quiz.slug != g.quiz_slug):
+        return None
+    return snapshot
+
+def _cached_page(snapshot, key, render):
+    # Links in the markup depend on which registration served the page
+    return current_app.extensions['quiz_page_cache'].get(snapshot.version, (request.blueprint,) + key, render)
+
 @quiz_bp.route('/')
 def landing():
-    """Landing page - clears any existing session."""
+    """Landing page - clears any existing session.
+    
+    The page only depends on the catalog, so it is rendered once per catalog
+    version and revalidated by browsers with If-None-Match.
+    """
     SessionService.clear_session(session)
-    quiz = QuizService.get_active_quiz()
-    return render_template('landing.html', quiz=quiz)
+    snapshot = _live_snapshot()
+    page = _cached_page(snapshot, ('landing',), lambda: render_template('landing.html', quiz=snapshot.quiz))
+    response = page_response(page)
+    response.set_etag(page.etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @quiz_bp.route('/begin')
 def begin_quiz():
-    """Start a new quiz session."""
+    """Start a new quiz session on the quiz's live version."""
+    snapshot = _live_snapshot()
+    if snapshot.quiz is None:
+        return redirect(url_for('.landing'))
+    
     # Always start fresh - clear any existing session
     SessionService.clear_session(session)
-    session_id = SessionService.init_session(session)
-    return redirect(url_for('quiz.questions_page', page=1))
+    session_id = SessionService.init_session(session, snapshot.quiz_id)
+    record_event('begin', session_id, snapshot.quiz_id)
+    rollups = current_app.extensions.get('rollups')
+    if rollups is not None:
+        rollups.record_start(quiz_id=snapshot.quiz_id)
+    
+    if current_app.config.get('QUIZ_MODE') == 'single_page':
+        # The whole quiz runs client-side from the versioned catalog JSON
+        page = _cached_page(
+            snapshot, ('single_page',),
+            lambda: render_template('quiz_app.html', quiz=snapshot.quiz,
+                                    catalog_url=url_for('.catalog', quiz_id=snapshot.quiz_id,
+                                                        version=snapshot.version))
+        )
+        response = page_response(page)
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        return response
+    return redirect(url_for('.questions_page', page=1))
+
+@quiz_bp.route('/catalog/<int:quiz_id>/<version>.json')
+def catalog(quiz_id, version):
+    """Question catalog for single-page mode; immutable for a given version.
+    
+    The URL names the quiz version the session started on, so any worker
+    can load it and clients that began before an activation finish on the
+    catalog they started with. Only live versions and the session's own
+    are served. If the catalog was edited since, the client is redirected
+    to the same quiz's current catalog.
+    """
+    session_data = SessionService.get_session_data(session)
+    if quiz_id not in catalog_cache.live_quiz_ids() and not (session_data and session_data['quiz_id'] == quiz_id):
+        abort(404)
+    snapshot = catalog_cache.get(quiz_id)
+    if snapshot.quiz is None or (g.quiz_slug and snapshot.quiz.slug != g.quiz_slug):
+        abort(404)
+    if snapshot.version != version:
+        previous = catalog_cache.find_version(version)
+        if previous is None or previous.quiz_id != quiz_id:
+            return redirect(url_for('.catalog', quiz_id=quiz_id, version=snapshot.version))
+        snapshot = previous
+    page = _cached_page(snapshot, ('catalog',), lambda: htmlsafe_json_dumps(snapshot.to_payload()))
+    response = page_response(page, mimetype='application/json')
+    response.set_etag(page.etag, weak=True)  # same validator for the gzip and identity bodies
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response.make_conditional(request)
 
 @quiz_bp.route('/questions/<int:page>')
 def questions_page(page):
     """Display questions for a specific page."""
     session_data = SessionService.get_session_data(session)
     if not session_data:
-        return redirect(url_for('quiz.landing'))
+        return redirect(url_for('.landing'))
     
     # Prevent access to quiz pages after completion
     if session_data['completed']:
-        return redirect(url_for('quiz.results'))
+        return redirect(url_for('.results'))
     
-    questions = QuizService.get_questions_for_page(page)
+    snapshot = _session_snapshot(session_data)
+    if snapshot is None:
+        return redirect(url_for('.landing'))
+    questions = snapshot.pages.get(page, ())
     if not questions:
-        return redirect(url_for('quiz.questions_page', page=1))
+        return redirect(url_for('.questions_page', page=1))
     
     # Update current page
-    session['current_page'] = page
-    session.modified = True
+    SessionService.set_current_page(session, page)
+    record_event('page_view', session_data['session_id'], snapshot.quiz_id, page=page)
     
-    max_page = QuizService.get_max_page()
+    max_page = snapshot.max_page
     
-    # Get existing responses for pre-population
+    # Existing responses are pre-filled client-side from a JSON block, so the
+    # rest of the page is shared by all users (see quiz/render.py)
     existing_responses = {}
     for question in questions:
         if str(question.id) in session_data['responses']:
             existing_responses[question.id] = session_data['responses'][str(question.id)]
     
-    return render_template('questions.html', 
-                         questions=questions, 
-                         page=page, 
-                         max_page=max_page, 
-                         existing_responses=existing_responses,
-                         today=date.today())
+    today = date.today()
+    rendered = _cached_page(
+        snapshot, ('questions', page, today),
+        lambda: render_template('questions.html', 
+                                questions=questions, 
+                                page=page, 
+                                max_page=max_page, 
+                                payload_marker=Markup(PAYLOAD_MARKER),
+                                today=today)
+    )
+    response = page_response(rendered, htmlsafe_json_dumps(existing_responses))
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
 
 @quiz_bp.route('/submit', methods=['POST'])
 def submit_answers():
     """Process submitted answers."""
     session_data = SessionService.get_session_data(session)
-    if not session_data or session_data['completed']:
-        return redirect(url_for('quiz.landing'))
+    if request.is_json:
+        return _submit_all_answers(session_data)
+    if not session_data:
+        return redirect(url_for('.landing'))
+    if session_data['completed']:
+        # Repeated final submit (double click, retried POST): show the same results
+        return redirect(url_for('.results'))
     
     # Save responses to session
     for key, value in request.form.items():
@@ -83,32 +189,69 @@ def submit_answers():
             )
             
             # Mark as completed in session
-            session['quiz_completed'] = True
-            session['result_data'] = result_data
-            session.modified = True
+            SessionService.mark_completed(session, result_data)
+            record_event('complete', session_data['session_id'], session_data['quiz_id'])
             
-            return redirect(url_for('quiz.results'))
-        except Exception as e:
+            return redirect(url_for('.results'))
+        except Exception:
             # Log error and redirect to landing
-            print(f"Error completing quiz: {e}")
-            return redirect(url_for('quiz.landing'))
+            logger.exception("Error completing quiz", extra={'event': 'completion_error'})
+            return redirect(url_for('.landing'))
     else:
-        return redirect(url_for('quiz.questions_page', page=int(next_page)))
+        return redirect(url_for('.questions_page', page=int(next_page)))
+
+def _submit_all_answers(session_data):
+    """Single-page mode: save every answer and complete the quiz in one request."""
+    if not session_data:
+        return jsonify({'error': 'No active session'}), 400
+    if session_data['completed']:
+        # Retried submit: same outcome as the first one
+        return jsonify({'success': True, 'redirect': url_for('.results')})
+    
+    answers = _parse_answers(request.get_json(silent=True))
+    if answers is None:
+        return jsonify({'error': 'Invalid data'}), 400
+    SessionService.save_responses(session, answers)
+    
+    try:
+        result_data = QuizService.complete_quiz(
+            session_data=SessionService.get_session_data(session),
+            user_ip=request.remote_addr,
+            user_agent=request.headers.get('User-Agent', '')
+        )
+        SessionService.mark_completed(session, result_data)
+    except Exception:
+        logger.exception("Error completing quiz", extra={'event': 'completion_error'})
+        return jsonify({'error': 'Could not complete quiz'}), 500
+    record_event('complete', session_data['session_id'], session_data['quiz_id'])
+    return jsonify({'success': True, 'redirect': url_for('.results')})
+
+def _parse_answers(data):
+    """Return {question_id: answer} from an {"answers": {...}} body, or None if malformed."""
+    answers = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(answers, dict):
+        return None
+    
+    cleaned = {}
+    for question_id, answer in answers.items():
+        if not str(question_id).isdigit() or not isinstance(answer, str):
+            return None
+        cleaned[int(question_id)] = answer
+    return cleaned
 
 @quiz_bp.route('/save_answer', methods=['POST'])
 def save_answer():
-    """Save answer in real-time via AJAX."""
+    """Save a single answer via AJAX (kept for older clients; see save_answers)."""
     try:
         session_data = SessionService.get_session_data(session)
         if not session_data:
-            print("DEBUG: No active session for save_answer")
+            logger.debug("No active session for save_answer", extra={'event': 'autosave'})
             return jsonify({'error': 'No active session'}), 400
         
         data = request.get_json()
-        print(f"DEBUG: Received save_answer data: {data}")
         
         if not data or 'question_id' not in data or 'answer' not in data:
-            print("DEBUG: Invalid data structure")
+            logger.debug("Invalid save_answer payload", extra={'event': 'autosave'})
             return jsonify({'error': 'Invalid data'}), 400
         
         question_id = data['question_id']
@@ -116,23 +259,45 @@ def save_answer():
         
         # Save the answer
         SessionService.save_response(session, question_id, answer)
-        print(f"DEBUG: Saved answer for question {question_id}: {answer}")
+        record_event('autosave', session_data['session_id'], session_data['quiz_id'],
+                     page=session_data['current_page'])
+        if current_app.config.get('LOG_PAYLOADS'):
+            logger.debug("Saved answer", extra={'event': 'autosave', 'question_id': question_id, 'answer': answer})
         
         return jsonify({'success': True})
     except Exception as e:
-        print(f"DEBUG: Error in save_answer: {e}")
+        logger.exception("Error in save_answer", extra={'event': 'autosave'})
         return jsonify({'error': str(e)}), 500
 
+@quiz_bp.route('/save_answers', methods=['POST'])
+def save_answers():
+    """Save a batch of answers collected by the client-side autosave."""
+    session_data = SessionService.get_session_data(session)
+    if not session_data:
+        return jsonify({'error': 'No active session'}), 400
+    if session_data['completed']:
+        return jsonify({'error': 'Quiz already completed'}), 409
+    
+    cleaned = _parse_answers(request.get_json(silent=True))
+    if cleaned is None:
+        return jsonify({'error': 'Invalid data'}), 400
+    
+    SessionService.save_responses(session, cleaned)
+    record_event('autosave', session_data['session_id'], session_data['quiz_id'],
+                     page=session_data['current_page'])
+    if current_app.config.get('LOG_PAYLOADS'):
+        logger.debug("Saved answers", extra={'event': 'autosave', 'answers': cleaned})
+    return jsonify({'success': True, 'saved': len(cleaned)})
+
 @quiz_bp.route('/cleanup_session', methods=['POST'])
 def cleanup_session():
     """Clean up session when user closes tab."""
-    print("DEBUG: cleanup_session called")
     session_data = SessionService.get_session_data(session)
     if session_data and not session_data['completed']:
-        print("DEBUG: Clearing incomplete session")
+        logger.debug("Clearing incomplete session", extra={'event': 'cleanup'})
+        record_event('abandon', session_data['session_id'], session_data['quiz_id'],
+                     page=session_data['current_page'])
         SessionService.clear_session(session)
-    else:
-        print("DEBUG: Not clearing session - either no session or already completed")
     return '', 204
 
 @quiz_bp.route('/results')
@@ -140,12 +305,12 @@ def results():
     """Display quiz results."""
     session_data = SessionService.get_session_data(session)
     if not session_data or not session_data['completed']:
-        return redirect(url_for('quiz.landing'))
+        return redirect(url_for('.landing'))
     
-    result_data = session.get('result_data', {
+    result_data = SessionService.get_result_data(session) or {
         'result_type': 'Type A',
         'title': 'Type A Personality',
         'description': 'You are a Type A personality.'
-    })
+    }
     
     return render_template('results.html', result_data=result_data)
\ No newline at end of file
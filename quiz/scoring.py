@@ -0,0 +1,201 @@
+"""Weighted scoring engine for quiz results.
+
+A scoring profile defines the result archetypes and how much each answer
+contributes to each archetype. At catalog load the profile is compiled
+against the Question rows into a dense table: one score vector per
+(question, option), pre-multiplied by Question.weight. Scoring a response
+set is then a dictionary lookup per answer and a column-wise sum, with no
+per-question branching.
+
+The built-in profile can be replaced by a JSON file at SCORING_PROFILE_PATH
+with the same structure as DEFAULT_PROFILE.
+"""
+
+import hashlib
+import json
+
+DEFAULT_PROFILE = {
+    # Archetypes in tie-break order. A result needs at least `threshold`
+    # share of the total score; otherwise the fallback archetype is used.
+    'archetypes': [
+        {
+            'result_type': 'Type A',
+            'title': 'Type A Personality',
+            'description': 'You are driven, competitive and focused on getting things done.',
+            'traits': ['Driven', 'Competitive', 'Time-conscious', 'Achievement-oriented'],
+            'recommendations': [
+                'Practice stress management techniques',
+                'Take regular breaks',
+                'Focus on work-life balance',
+                'Consider meditation or relaxation exercises'
+            ],
+            'threshold': 0.3
+        },
+        {
+            'result_type': 'Type B',
+            'title': 'Type B Personality',
+            'description': 'You are easygoing, patient and comfortable going with the flow.',
+            'traits': ['Relaxed', 'Patient', 'Flexible', 'Imaginative'],
+            'recommendations': [
+                'Set small, concrete goals to keep momentum',
+                'Use reminders for important deadlines',
+                'Share your calm with people under pressure'
+            ],
+            'threshold': 0.3
+        },
+        {
+            'result_type': 'Type C',
+            'title': 'Type C Personality',
+            'description': 'You are thoughtful and analytical, and you like to understand before you act.',
+            'traits': ['Analytical', 'Detail-oriented', 'Reserved', 'Thorough'],
+            'recommendations': [
+                'Give yourself permission to decide with incomplete information',
+                'Voice your ideas early in group discussions',
+                'Schedule time for unstructured fun'
+            ],
+            'threshold': 0.3
+        },
+        {
+            'result_type': 'Type S',
+            'title': 'Social Connector',
+            'description': 'You draw energy from people and bring groups together.',
+            'traits': ['Outgoing', 'Empathetic', 'Collaborative', 'Expressive'],
+            'recommendations': [
+                'Protect some quiet time to recharge',
+                'Follow through on plans made in the moment',
+                'Use your network to support your own goals too'
+            ],
+            'threshold': 0.3
+        }
+    ],
+    'fallback': 'Type B',
+    # question_text -> answer -> {result_type: points}
+    'option_scores': {
+        'What is your ideal weekend?': {
+            'Adventure outdoors': {'Type A': 1.0, 'Type B': 0.5},
+            'Cozy at home': {'Type B': 1.0, 'Type C': 0.5},
+            'Social gathering': {'Type S': 1.0},
+            'Learning something new': {'Type C': 1.0, 'Type A': 0.5}
+        },
+        'Do you consider yourself introverted?': {
+            'yes': {'Type C': 1.0, 'Type B': 0.5},
+            'no': {'Type S': 1.0, 'Type A': 0.5}
+        },
+        'How do you handle stress?': {
+            'Talk it out with friends': {'Type S': 1.0},
+            'Exercise or physical activity': {'Type A': 1.0},
+            'Take time alone to think': {'Type C': 1.0},
+            'Dive into work or projects': {'Type A': 1.0, 'Type C': 0.5}
+        },
+        'Do you prefer planning ahead over being spontaneous?': {
+            'yes': {'Type A': 1.0, 'Type C': 1.0},
+            'no': {'Type B': 1.0, 'Type S': 0.5}
+        },
+        'In group settings, you tend to:': {
+            'Take charge and lead': {'Type A': 1.0},
+            'Contribute ideas actively': {'Type S': 1.0, 'Type A': 0.5},
+            'Listen and support others': {'Type B': 1.0, 'Type S': 0.5},
+            'Observe and analyze': {'Type C': 1.0}
+        },
+        'Do you often daydream or think about possibilities?': {
+            'yes': {'Type B': 1.0, 'Type C': 0.5},
+            'no': {'Type A': 1.0}
+        }
+    }
+}
+
+def load_profile(path=None):
+    """Load a scoring profile from a JSON file, or the built-in default."""
+    if not path:
+        return DEFAULT_PROFILE
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _answers_for(question):
+    """Possible answers for a question, in display order."""
+    options = question.get_options()
+    if options:
+        return list(options)
+    if question.question_type == 'yes_no':
+        return ['yes', 'no']
+    return []
+
+class ScoringTable:
+    """Compiled per-option score matrix for one question catalog.
+    
+    Plain lists and dicts only, so the table pickles cheaply for
+    multiprocess re-scoring.
+    """
+    
+    def __init__(self, archetypes, fallback, index, rows, version):
+        self.archetypes = archetypes            # archetype dicts, column order
+        self.result_types = [a['result_type'] for a in archetypes]
+        self.thresholds = [a.get('threshold', 0.0) for a in archetypes]
+        self.fallback = self.result_types.index(fallback)
+        self.index = index                      # (question_id str, answer) -> row
+        self.rows = rows                        # row -> tuple of points per archetype
+        self.version = version
+    
+    @classmethod
+    def compile(cls, questions, profile):
+        """Build the table for the given questions (Question or CachedQuestion)."""
+        archetypes = profile['archetypes']
+        result_types = [a['result_type'] for a in archetypes]
+        option_scores = profile.get('option_scores', {})
+        
+        index = {}
+        rows = []
+        for question in sorted(questions, key=lambda q: q.id):
+            scores = option_scores.get(question.question_text)
+            if not scores:
+                continue
+            weight = question.weight if question.weight is not None else 1.0
+            for answer in _answers_for(question):
+                points = scores.get(answer, {})
+                index[(str(question.id), answer)] = len(rows)
+                rows.append(tuple(points.get(t, 0.0) * weight for t in result_types))
+        
+        digest = hashlib.sha1(json.dumps(
+            [profile, sorted((k[0], k[1], v) for k, v in index.items()), rows],
+            sort_keys=True
+        ).encode('utf-8'))
+        return cls(archetypes, profile.get('fallback', result_types[0]), index, rows,
+                   digest.hexdigest()[:12])
+    
+    def totals(self, responses):
+        """Sum the score vectors selected by a {question_id: answer} mapping."""
+        index = self.index
+        selected = [self.rows[i] for i in
+                    (index.get((str(qid), answer)) for qid, answer in responses.items())
+                    if i is not None]
+        if not selected:
+            return [0.0] * len(self.result_types)
+        return [sum(column) for column in zip(*selected)]
+    
+    def classify(self, totals):
+        """Pick the archetype column for a totals vector."""
+        grand_total = sum(totals)
+        if grand_total <= 0:
+            return self.fallback
+        best = max(range(len(totals)), key=lambda i: (totals[i], -i))
+        if totals[best] / grand_total < self.thresholds[best]:
+            return self.fallback
+        return best
+    
+    def score(self, responses):
+        """Return the result data dict for one response set."""
+        totals = self.totals(responses)
+        archetype = self.archetypes[self.classify(totals)]
+        return {
+            'result_type': archetype['result_type'],
+            'title': archetype['title'],
+            'description': archetype['description'],
+            'traits': list(archetype.get('traits', [])),
+            'recommendations': list(archetype.get('recommendations', [])),
+            'scores': {t: round(v, 4) for t, v in zip(self.result_types, totals)},
+            'scoring_version': self.version
+        }
+    
+    def score_many(self, responses_list):
+        """Score many response sets; used for bulk re-scoring."""
+        return [self.score(responses) for responses in responses_list]
@@ -1,99 +1,682 @@
 """Business logic services for the quiz application."""
 
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from quiz import db
-from quiz.models import Quiz, Question, CompletedQuiz
+from quiz.models import Quiz, QuizPointer, Question, CompletedQuiz, CompletedAnswer
+from quiz.metrics import track
+from quiz.scoring import ScoringTable, load_profile
+
+# WSGI environ keys set by the ASGI adapter (quiz/asgi.py). Under
+# COMPLETION_DEFER_KEY it passes a list: complete_quiz appends
+# (record, result_data) instead of writing, and persist_state leaves the
+# session write under DEFERRED_STATE_KEY, so both happen on the event loop
+# once the view has returned and the row is committed.
+COMPLETION_DEFER_KEY = 'quiz.deferred_completions'
+DEFERRED_STATE_KEY = 'quiz.deferred_state'
 
 class SessionService:
-    """Handles quiz session management."""
+    """Handles quiz session management.
+    
+    Quiz state lives either in the signed cookie itself or, when a server-side
+    SESSION_STORE is configured, in that store keyed by the cookie's
+    quiz_session_id. Server-side state is loaded at most once per request and
+    written back by persist_state() after the response is built.
+    """
+    
+    STATE_KEYS = ('quiz_id', 'quiz_started_at', 'quiz_completed', 'current_page', 'responses', 'result_data')
+    
+    @staticmethod
+    def _store():
+        return current_app.extensions.get('quiz_session_store')
     
     @staticmethod
-    def init_session(session):
-        """Initialize a new quiz session."""
+    def _state(session):
+        """Return the mapping holding quiz state, or None without an active session."""
+        session_id = session.get('quiz_session_id')
+        if session_id is None:
+            return None
+        store = SessionService._store()
+        if store is None:
+            return session
+        
+        cached = g.get('quiz_state')
+        if cached is None or cached['session_id'] != session_id:
+            state = store.load(session_id)
+            if state is None:
+                return None  # expired or evicted
+            cached = g.quiz_state = {'session_id': session_id, 'state': state, 'dirty': False}
+        return cached['state']
+    
+    @staticmethod
+    def _touch(session):
+        """Flag the state as changed so it is written back."""
+        if SessionService._store() is None:
+            session.modified = True
+        else:
+            g.quiz_state['dirty'] = True
+    
+    @staticmethod
+    def init_session(session, quiz_id=None):
+        """Initialize a new quiz session on the given quiz version."""
         import uuid
         
         session_id = str(uuid.uuid4())
         session['quiz_session_id'] = session_id
-        session['quiz_started_at'] = datetime.utcnow().isoformat()
-        session['quiz_completed'] = False
-        session['current_page'] = 1
-        session['responses'] = {}
+        state = {
+            'quiz_id': quiz_id,
+            'quiz_started_at': datetime.utcnow().isoformat(),
+            'quiz_completed': False,
+            'current_page': 1,
+            'responses': {}
+        }
+        if SessionService._store() is None:
+            session.update(state)
+        else:
+            g.quiz_state = {'session_id': session_id, 'state': state, 'dirty': True}
         return session_id
     
     @staticmethod
     def get_session_data(session):
         """Get current session data."""
-        if 'quiz_session_id' not in session:
+        state = SessionService._state(session)
+        if state is None:
             return None
         
         return {
             'session_id': session['quiz_session_id'],
-            'started_at': session.get('quiz_started_at'),
-            'completed': session.get('quiz_completed', False),
-            'current_page': session.get('current_page', 1),
-            'responses': session.get('responses', {})
+            # Sessions started before quiz versioning belong to the default quiz
+            'quiz_id': state.get('quiz_id') or catalog_cache.get().quiz_id,
+            'started_at': state.get('quiz_started_at'),
+            'completed': state.get('quiz_completed', False),
+            'current_page': state.get('current_page', 1),
+            'responses': state.get('responses', {})
         }
     
     @staticmethod
     def save_response(session, question_id, answer):
         """Save a response to the session."""
-        if 'responses' not in session:
-            session['responses'] = {}
-        session['responses'][str(question_id)] = answer
-        session.modified = True
+        SessionService.save_responses(session, {question_id: answer})
+    
+    @staticmethod
+    def save_responses(session, answers):
+        """Save several responses with a single session update."""
+        state = SessionService._state(session)
+        if 'responses' not in state:
+            state['responses'] = {}
+        responses = state['responses']
+        for question_id, answer in answers.items():
+            responses[str(question_id)] = answer
+        SessionService._touch(session)
+    
+    @staticmethod
+    def set_current_page(session, page):
+        """Record the page the user is on."""
+        state = SessionService._state(session)
+        if state.get('current_page') != page:
+            state['current_page'] = page
+            SessionService._touch(session)
+    
+    @staticmethod
+    def mark_completed(session, result_data):
+        """Mark the session completed and keep its results for the results page."""
+        state = SessionService._state(session)
+        state['quiz_completed'] = True
+        state['result_data'] = result_data
+        SessionService._touch(session)
+    
+    @staticmethod
+    def get_result_data(session):
+        """Get the stored results, or None."""
+        state = SessionService._state(session)
+        return state.get('result_data') if state is not None else None
     
     @staticmethod
     def clear_session(session):
         """Clear all quiz-related session data."""
-        keys_to_remove = [
-            'quiz_session_id', 'quiz_started_at', 'quiz_completed', 
-            'current_page', 'responses', 'result_data'
-        ]
-        for key in keys_to_remove:
+        store = SessionService._store()
+        if store is not None and 'quiz_session_id' in session:
+            store.delete(session['quiz_session_id'])
+            g.pop('quiz_state', None)
+        
+        for key in ('quiz_session_id',) + SessionService.STATE_KEYS:
             session.pop(key, None)
+    
+    @staticmethod
+    def persist_state(response):
+        """after_request hook: write changed server-side state back to the store."""
+        cached = g.get('quiz_state')
+        if cached is not None and cached['dirty']:
+            if request.environ.get(COMPLETION_DEFER_KEY):
+                # Not marked completed until its row is committed (quiz/asgi.py)
+                request.environ[DEFERRED_STATE_KEY] = (cached['session_id'], cached['state'])
+                cached['dirty'] = False
+                return response
+            with track('session'):
+                SessionService._store().save(cached['session_id'], cached['state'])
+            cached['dirty'] = False
+        return response
+
+class CachedQuestion:
+    """Read-only snapshot of a Question row held by the catalog cache."""
+    
+    __slots__ = ('id', 'quiz_id', 'page_number', 'question_type', 'question_text',
+                 'options', 'required', 'order_index', 'weight')
+    
+    def __init__(self, question):
+        self.id = question.id
+        self.quiz_id = question.quiz_id
+        self.page_number = question.page_number
+        self.question_type = question.question_type
+        self.question_text = question.question_text
+        self.options = question.get_options()  # parsed once per catalog load
+        self.required = question.required
+        self.order_index = question.order_index
+        self.weight = question.weight
+    
+    def get_options(self):
+        """Return the pre-parsed options list."""
+        return self.options
+    
+    def __repr__(self):
+        return f'<CachedQuestion {self.question_text[:50]}...>'
+
+class CachedQuiz:
+    """Read-only snapshot of a Quiz row."""
+    
+    __slots__ = ('id', 'slug', 'version', 'title', 'description')
+    
+    def __init__(self, quiz):
+        self.id = quiz.id
+        self.slug = quiz.slug
+        self.version = quiz.version
+        self.title = quiz.title
+        self.description = quiz.description
+
+class CatalogSnapshot:
+    """Immutable view of one quiz's question catalog at one version."""
+    
+    def __init__(self, generation, questions, scoring_profile, quiz=None):
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+        self.quiz = quiz
+        
+        pages = {}
+        for question in questions:
+            pages.setdefault(question.page_number, []).append(question)
+        self.pages = {
+            page: tuple(sorted(items, key=lambda q: q.order_index))
+            for page, items in pages.items()
+        }
+        self.max_page = max(self.pages) if self.pages else 1
+        self.questions = {q.id: q for q in questions}
+        
+        # Content digest - stable across workers, so it can be used in ETags
+        digest = hashlib.sha1()
+        if quiz is not None:
+            digest.update(json.dumps([quiz.id, quiz.slug, quiz.version, quiz.title,
+                                      quiz.description]).encode('utf-8'))
+        for question in sorted(questions, key=lambda q: q.id):
+            digest.update(json.dumps([
+                question.id, question.quiz_id, question.page_number, question.question_type,
+                question.question_text, question.options, question.required,
+                question.order_index, question.weight
+            ]).encode('utf-8'))
+        self.version = digest.hexdigest()[:12]
+        
+        self.scoring = ScoringTable.compile(questions, scoring_profile)
+    
+    @property
+    def quiz_id(self):
+        return self.quiz.id if self.quiz is not None else None
+    
+    def to_payload(self):
+        """Return the whole catalog as a JSON-ready dict for single-page mode."""
+        quiz = self.quiz
+        return {
+            'version': self.version,
+            'quiz': {'id': quiz.id, 'slug': quiz.slug, 'title': quiz.title,
+                     'description': quiz.description} if quiz else None,
+            'max_page': self.max_page,
+            'pages': [
+                {
+                    'page': page,
+                    'questions': [
+                        {'id': q.id, 'type': q.question_type, 'text': q.question_text,
+                         'options': q.options, 'required': q.required}
+                        for q in questions
+                    ]
+                }
+                for page, questions in sorted(self.pages.items())
+            ]
+        }
+
+class CatalogCache:
+    """Versioned read-through cache of the per-quiz question catalogs.
+    
+    Catalogs only change when an admin edits them, so page views are served
+    from in-process snapshots keyed by quiz id. A slug is resolved to its
+    live quiz through the quiz_pointers table; sessions keep the quiz id
+    they started on, so activating a new version leaves their snapshot in
+    place. Writers must call invalidate() after commit.
+    
+    CATALOG_CACHE_TTL (seconds, 0 disables) bounds how stale a snapshot can
+    get in multi-worker deployments where an invalidation only reaches the
+    worker that made it. Pointers are re-read every CATALOG_POINTER_TTL
+    seconds; the new version's snapshot is compiled before the refreshed
+    pointers are published, and other requests keep using the old ones
+    while that happens.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pointer_lock = threading.Lock()
+        self._snapshots = {}
+        self._pointers = None
+        self._pointers_loaded_at = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, quiz_id=None):
+        """Return the snapshot for `quiz_id` (default: the default quiz's live version)."""
+        if quiz_id is None:
+            quiz_id = self.resolve()
+        snapshot = self._snapshots.get(quiz_id)
+        if snapshot is not None and not self._expired(snapshot):
+            self.hits += 1
+            return snapshot
+        
+        with self._lock:
+            snapshot = self._snapshots.get(quiz_id)
+            if snapshot is not None and not self._expired(snapshot):
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            snapshot = self._snapshots[quiz_id] = self._load(quiz_id)
+            return snapshot
+    
+    def for_slug(self, slug):
+        """Live snapshot for `slug`, or None if no version of it is live."""
+        quiz_id = self.resolve(slug)
+        if quiz_id is None and slug:
+            return None
+        return self.get(quiz_id)
+    
+    def find_version(self, version):
+        """A loaded snapshot with the given catalog version, or None."""
+        for snapshot in list(self._snapshots.values()):
+            if snapshot.version == version:
+                return snapshot
+        return None
+    
+    def resolve(self, slug=None):
+        """Live quiz id for `slug`.
+        
+        Without a slug, the default quiz's: DEFAULT_QUIZ_SLUG if it is live,
+        otherwise the first live slug's.
+        """
+        pointers = self._current_pointers()
+        if slug:
+            return pointers.get(slug)
+        default = current_app.config.get('DEFAULT_QUIZ_SLUG')
+        if default in pointers:
+            return pointers[default]
+        return pointers[min(pointers)] if pointers else None
+    
+    def live_quiz_ids(self):
+        """Ids of the quiz versions currently live for some slug."""
+        return set(self._current_pointers().values())
+    
+    def publish(self, slug, quiz_id):
+        """Point `slug` at `quiz_id` in this worker, compiling its snapshot first."""
+        self.get(quiz_id)
+        pointers = dict(self._current_pointers())
+        pointers[slug] = quiz_id
+        self._pointers = pointers  # a single reference swap; readers see old or new
+    
+    def questions_for(self, quiz_ids):
+        """Merged question_id -> question map across the given quizzes."""
+        questions = {}
+        for quiz_id in set(quiz_ids):
+            questions.update(self.get(quiz_id).questions)
+        return questions
+    
+    def invalidate(self, quiz_id=None):
+        """Drop one quiz's snapshot (default: all, and the pointers); the next read reloads."""
+        with self._lock:
+            if quiz_id is None:
+                self._snapshots = {}
+                self._pointers = None
+            else:
+                self._snapshots.pop(quiz_id, None)
+    
+    def stats(self):
+        """Return hit/miss counters and the loaded versions."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'generation': self._generation,
+            'quizzes': len(self._snapshots),
+            'pointers': dict(self._pointers or {}),
+        }
+    
+    def _current_pointers(self):
+        pointers = self._pointers
+        ttl = current_app.config.get('CATALOG_POINTER_TTL', 5)
+        if pointers is not None and not (ttl and time.monotonic() - self._pointers_loaded_at > ttl):
+            return pointers
+        # One thread refreshes; the others carry on with the pointers they have
+        if not self._pointer_lock.acquire(blocking=pointers is None):
+            return pointers
+        try:
+            if self._pointers is not pointers:
+                return self._pointers
+            table = QuizPointer.__table__
+            quizzes = Quiz.__table__
+            refreshed = dict(db.session.execute(
+                select(table.c.slug, table.c.quiz_id)
+                .join(quizzes, quizzes.c.id == table.c.quiz_id)
+                .where(quizzes.c.is_active.is_(True))
+            ).all())
+            for quiz_id in refreshed.values():
+                self.get(quiz_id)  # warm before anyone is sent to it
+            self._pointers = refreshed
+            self._pointers_loaded_at = time.monotonic()
+            return refreshed
+        finally:
+            self._pointer_lock.release()
+    
+    def _load(self, quiz_id):
+        self._generation += 1
+        quiz = db.session.get(Quiz, quiz_id) if quiz_id is not None else None
+        questions = []
+        if quiz is not None:
+            questions = (Question.query
+                         .filter(Question.quiz_id == quiz_id, Question.is_active.isnot(False))
+                         .order_by(Question.page_number, Question.order_index)
+                         .all())
+        profile = load_profile(current_app.config.get('SCORING_PROFILE_PATH'))
+        return CatalogSnapshot(self._generation, [CachedQuestion(q) for q in questions], profile,
+                               quiz=CachedQuiz(quiz) if quiz else None)
+    
+    @staticmethod
+    def _expired(snapshot):
+        ttl = current_app.config.get('CATALOG_CACHE_TTL', 0)
+        return bool(ttl) and time.monotonic() - snapshot.loaded_at > ttl
+
+catalog_cache = CatalogCache()
+
+class RecentCompletions:
+    """Bounded LRU of session_id -> result_data for recently completed quizzes.
+    
+    Answers a double-clicked or retried /submit from memory. It is per
+    process, so a retry that reaches another worker falls through to the
+    conflict-ignoring insert instead.
+    """
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get(self, session_id):
+        with self._lock:
+            result_data = self._entries.get(session_id)
+            if result_data is not None:
+                self._entries.move_to_end(session_id)
+            return result_data
+    
+    def add(self, session_id, result_data):
+        with self._lock:
+            self._entries[session_id] = result_data
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
 class QuizService:
     """Handles quiz-related business logic."""
     
     @staticmethod
-    def get_active_quiz():
-        """Get the active quiz."""
-        return Quiz.query.filter_by(is_active=True).first()
+    def get_active_quiz(slug=None):
+        """Get the live version of a quiz (served from the catalog cache)."""
+        snapshot = catalog_cache.for_slug(slug)
+        return snapshot.quiz if snapshot is not None else None
     
     @staticmethod
-    def get_questions_for_page(page_number):
-        """Get questions for a specific page."""
-        return Question.query.filter_by(page_number=page_number).order_by(Question.order_index).all()
+    def get_questions_for_page(page_number, quiz_id=None):
+        """Get a quiz's questions for a specific page."""
+        return catalog_cache.get(quiz_id).pages.get(page_number, ())
     
     @staticmethod
-    def get_max_page():
-        """Get the maximum page number."""
-        return db.session.query(db.func.max(Question.page_number)).scalar() or 1
+    def get_max_page(quiz_id=None):
+        """Get the maximum page number of a quiz."""
+        return catalog_cache.get(quiz_id).max_page
     
     @staticmethod
-    def complete_quiz(session_data, user_ip, user_agent):
-        """Complete a quiz and save results to database."""
-        # Calculate results
-        result_data = ResultCalculator.calculate(session_data['responses'])
-        
-        # Save to database
-        completed_quiz = CompletedQuiz(
-            session_id=session_data['session_id'],
-            quiz_id=1,  # Assuming single quiz for now
-            user_ip=user_ip,
-            user_agent=user_agent,
-            started_at=datetime.fromisoformat(session_data['started_at']),
-            result_type=result_data['result_type'],
-            result_data=json.dumps(result_data),
-            responses=json.dumps(session_data['responses'])
-        )
+    def questions_by_id(quiz_id=None):
+        """question_id -> question for one quiz version, or every quiz and version.
+        
+        Read from the database rather than the catalog cache and including
+        inactive questions, for exports, analytics and rebuilds whose rows
+        may answer questions since retired.
+        """
+        query = Question.query
+        if quiz_id is not None:
+            query = query.filter_by(quiz_id=quiz_id)
+        return {q.id: CachedQuestion(q) for q in query}
+    
+    @staticmethod
+    def activate_quiz(quiz_id):
+        """Make a quiz version the live one for its slug.
         
-        db.session.add(completed_quiz)
+        The new catalog is compiled before the pointer row is rewritten, so
+        the first sessions on it are served warm; sessions still running on
+        the previous version keep their snapshot until they finish.
+        """
+        quiz = db.session.get(Quiz, quiz_id)
+        if quiz is None:
+            raise ValueError(f"No quiz with id {quiz_id}")
+        catalog_cache.invalidate(quiz.id)
+        catalog_cache.get(quiz.id)
+        
+        pointer = db.session.get(QuizPointer, quiz.slug)
+        if pointer is None:
+            pointer = QuizPointer(slug=quiz.slug)
+            db.session.add(pointer)
+        pointer.quiz_id = quiz.id
+        pointer.activated_at = datetime.utcnow()
+        db.session.commit()
+        catalog_cache.publish(quiz.slug, quiz.id)
+        return quiz
+    
+    @staticmethod
+    def copy_quiz(quiz_id, version):
+        """Copy a quiz and its questions into a new, not yet live, version."""
+        source = db.session.get(Quiz, quiz_id)
+        if source is None:
+            raise ValueError(f"No quiz with id {quiz_id}")
+        quiz = Quiz(slug=source.slug, version=version, title=source.title,
+                    description=source.description, is_active=True)
+        db.session.add(quiz)
+        db.session.flush()
+        for question in Question.query.filter_by(quiz_id=source.id):
+            db.session.add(Question(
+                quiz_id=quiz.id, page_number=question.page_number, question_type=question.question_type,
+                question_text=question.question_text, options=question.options, required=question.required,
+                order_index=question.order_index, weight=question.weight, is_active=question.is_active
+            ))
         db.session.commit()
+        return quiz
+    
+    @staticmethod
+    def complete_quiz(session_data, user_ip, user_agent):
+        """Complete a quiz and save results to database.
+        
+        Idempotent per session: a repeated submit returns the first result
+        from the in-process RecentCompletions set, or else the insert skips
+        the duplicate and the stored row's result is returned. The stored
+        row is only read when the insert reports a conflict.
         
+        With COMPLETION_WRITE_MODE = 'write_behind' the row is handed to the
+        background writer and remembered as soon as it is queued (and
+        spooled), so a quick double submit is answered from memory; if the
+        writer's insert conflicts, the remembered result is replaced with the
+        stored one. If its queue is saturated we write synchronously.
+        Under the ASGI server (quiz/asgi.py) the row is only queued on the
+        request here; the adapter writes it with the async driver after the
+        view returns, without holding a thread, and saves the session state
+        and sends the response only once it is committed.
+        """
+        session_id = session_data['session_id']
+        recent = current_app.extensions.get('recent_completions')
+        if recent is not None:
+            result_data = recent.get(session_id)
+            if result_data is not None:
+                return result_data  # double-clicked or retried submit
+        
+        # Calculate results against the version the session started on
+        quiz_id = session_data['quiz_id']
+        result_data = ResultCalculator.calculate(session_data['responses'], quiz_id)
+        
+        record = {
+            'session_id': session_id,
+            'quiz_id': quiz_id,
+            'user_ip': user_ip,
+            'user_agent_id': current_app.extensions['user_agents'].lookup(user_agent),
+            'started_at': datetime.fromisoformat(session_data['started_at']),
+            'completed_at': datetime.utcnow(),
+            'result_type': result_data['result_type'],
+            'result_data': json.dumps(result_data),
+            'responses': json.dumps(session_data['responses'])
+        }
+        
+        deferred = request.environ.get(COMPLETION_DEFER_KEY) if has_request_context() else None
+        if deferred is not None:
+            deferred.append((record, result_data))
+            return result_data
+        writer = current_app.extensions.get('completion_writer')
+        if writer is not None and writer.submit(record):
+            if recent is not None:
+                recent.add(session_id, result_data)
+            return result_data
+        
+        if not QuizService.save_completions([record]):
+            # Stored by an earlier request on another worker or before a restart
+            result_data = QuizService.get_stored_result(session_id) or result_data
+        if recent is not None:
+            recent.add(session_id, result_data)
         return result_data
     
+    @staticmethod
+    def get_stored_result(session_id):
+        """Return the saved result_data for a completed session, or None."""
+        table = CompletedQuiz.__table__
+        stored = db.session.execute(
+            select(table.c.result_data).where(table.c.session_id == session_id)
+        ).scalar()
+        return json.loads(stored) if stored else None
+    
+    @staticmethod
+    def get_stored_results(session_ids):
+        """Return {session_id: result_data} for those of `session_ids` already saved."""
+        table = CompletedQuiz.__table__
+        rows = db.session.execute(
+            select(table.c.session_id, table.c.result_data).where(table.c.session_id.in_(list(session_ids)))
+        )
+        return {session_id: json.loads(stored) for session_id, stored in rows if stored}
+    
+    @staticmethod
+    def save_completions(records):
+        """Insert completion records in one transaction, skipping duplicates.
+        
+        Duplicates are skipped in the INSERT itself where the dialect allows;
+        elsewhere an IntegrityError triggers a row-by-row retry.
+        
+        Each completion's answers are also written to completed_answers, and
+        inserted rows are counted into the dashboard rollups. Returns the
+        number of completions inserted.
+        """
+        try:
+            inserted = QuizService._insert_completions(records)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Fall back to row-by-row so one duplicate doesn't sink the batch
+            inserted = []
+            for record in records:
+                try:
+                    inserted.extend(QuizService._insert_completions([record]))
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+        
+        rollups = current_app.extensions.get('rollups')
+        if rollups is not None and inserted:
+            rollups.record_completions(inserted, catalog_cache.questions_for(r['quiz_id'] for r in inserted))
+        return len(inserted)
+    
+    @staticmethod
+    def completion_insert(dialect_name):
+        """INSERT ... RETURNING for completed_quizzes that skips stored sessions where supported."""
+        table = CompletedQuiz.__table__
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['session_id'])
+        elif dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['session_id'])
+        else:
+            stmt = table.insert()  # duplicates raise IntegrityError instead
+        return stmt.returning(table.c.session_id, table.c.id)
+    
+    @staticmethod
+    def inserted_records(records, ids):
+        """The records that were actually inserted, given {session_id: id} from RETURNING."""
+        inserted, seen = [], set()
+        for record in records:
+            session_id = record['session_id']
+            if session_id in ids and session_id not in seen:
+                seen.add(session_id)
+                inserted.append(record)
+        return inserted
+    
+    @staticmethod
+    def answer_rows(records, ids):
+        """completed_answers rows for `records`, given {session_id: completion id}."""
+        return [
+            {'completion_id': ids[record['session_id']], 'quiz_id': record['quiz_id'],
+             'question_id': int(question_id), 'answer': answer,
+             'completed_at': record['completed_at']}
+            for record in records
+            for question_id, answer in json.loads(record['responses']).items()
+            if question_id.isdigit()
+        ]
+    
+    @staticmethod
+    def _insert_completions(records):
+        """Insert new completions and their normalized answers (no commit).
+        
+        Returns the records inserted; on SQLite/PostgreSQL already-stored
+        sessions are skipped by ON CONFLICT DO NOTHING rather than raising.
+        """
+        ids = dict(db.session.execute(
+            QuizService.completion_insert(db.engine.dialect.name), records
+        ).all())
+        
+        inserted = QuizService.inserted_records(records, ids)
+        answers = QuizService.answer_rows(inserted, ids)
+        if answers:
+            db.session.execute(CompletedAnswer.__table__.insert(), answers)
+        return inserted
+    
     @staticmethod
     def seed_database():
         """Seed the database with initial data."""
@@ -102,6 +685,8 @@ class QuizService:
         
         # Create quiz
         quiz = Quiz(
+            slug='personality-assessment',
+            version='v1',
             title="Personality Assessment",
             description="Discover your personality archetype through this comprehensive assessment."
         )
@@ -159,26 +744,15 @@ class QuizService:
         
         for question in questions:
             db.session.add(question)
+        db.session.add(QuizPointer(slug=quiz.slug, quiz_id=quiz.id))
         
         db.session.commit()
+        catalog_cache.invalidate()
 
 class ResultCalculator:
     """Calculates quiz results."""
     
     @staticmethod
-    def calculate(responses):
-        """Calculate quiz results based on responses."""
-        # For now, always return Type A
-        # This can be expanded with more complex logic later
-        return {
-            'result_type': 'Type A',
-            'title': 'Type A Personality',
-            'description': 'You are a Type A personality.',
-            'traits': ['Driven', 'Competitive', 'Time-conscious', 'Achievement-oriented'],
-            'recommendations': [
-                'Practice stress management techniques',
-                'Take regular breaks',
-                'Focus on work-life balance',
-                'Consider meditation or relaxation exercises'
-            ]
-        }
\ No newline at end of file
+    def calculate(responses, quiz_id=None):
+        """Calculate quiz results based on responses to the given quiz."""
+        return catalog_cache.get(quiz_id).scoring.score(responses)
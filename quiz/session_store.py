@@ -0,0 +1,138 @@
+"""Server-side storage backends for quiz session state.
+
+With a server-side store the signed cookie only carries the opaque
+``quiz_session_id``; answers, progress and results live here instead.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class SessionStore:
+    """Interface for server-side quiz session state keyed by session id."""
+    
+    def load(self, session_id):
+        """Return the stored state dict, or None if missing or expired."""
+        raise NotImplementedError
+    
+    def save(self, session_id, state):
+        """Store state for a session, refreshing its expiry."""
+        raise NotImplementedError
+    
+    def delete(self, session_id):
+        """Remove a session's state."""
+        raise NotImplementedError
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store with a sliding TTL.
+    
+    State is only visible to the worker that wrote it, so this backend suits
+    single-process deployments and development.
+    """
+    
+    def __init__(self, ttl=7200, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # session_id -> (expires_at, state)
+    
+    def load(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            # A copy, like the SQLite store: changes only count once saved
+            return copy.deepcopy(entry[1])
+    
+    def save(self, session_id, state):
+        with self._lock:
+            self._entries[session_id] = (time.monotonic() + self.ttl, state)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by all workers on one host."""
+    
+    PURGE_EVERY = 500  # saves between expired-row sweeps
+    
+    def __init__(self, path, ttl=7200):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._saves = 0
+    
+    def _connect(self):
+        # One connection per thread; reconnect after fork. The file and table
+        # are created on first use so building the app touches no disk.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS quiz_session_state ('
+                    'session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+                )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def load(self, session_id):
+        row = self._connect().execute(
+            'SELECT data FROM quiz_session_state WHERE session_id = ? AND expires_at > ?',
+            (session_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def save(self, session_id, state):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO quiz_session_state (session_id, data, expires_at) VALUES (?, ?, ?)',
+                (session_id, json.dumps(state, separators=(',', ':')), time.time() + self.ttl)
+            )
+        self._saves += 1
+        if self._saves % self.PURGE_EVERY == 0:
+            self.purge_expired()
+    
+    def delete(self, session_id):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM quiz_session_state WHERE session_id = ?', (session_id,))
+    
+    def purge_expired(self):
+        """Delete expired rows."""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM quiz_session_state WHERE expires_at <= ?', (time.time(),))
+
+def create_session_store(app):
+    """Build the store selected by SESSION_STORE, or None for cookie sessions."""
+    backend = app.config.get('SESSION_STORE', 'cookie')
+    ttl = app.config.get('SESSION_STORE_TTL') or int(app.config['PERMANENT_SESSION_LIFETIME'].total_seconds())
+    
+    if backend == 'cookie':
+        return None
+    if backend == 'memory':
+        return MemorySessionStore(ttl=ttl, max_entries=app.config.get('SESSION_STORE_MAX_ENTRIES', 10000))
+    if backend == 'sqlite':
+        path = app.config.get('SESSION_STORE_PATH') or os.path.join(app.instance_path, 'sessions.db')
+        return SQLiteSessionStore(path, ttl=ttl)
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
@@ -0,0 +1,323 @@
+"""Write-behind queue for quiz completions.
+
+In ``write_behind`` mode /submit hands the finished CompletedQuiz record to a
+background thread and redirects straight away. The thread group-commits
+batches so concurrent finishers share one transaction instead of queueing
+on the SQLite write lock.
+
+Durability:
+- Each record is appended to a per-process spool file before it is queued,
+  and the spool is truncated once everything queued has been committed.
+  When the writer thread starts, spools left by dead processes are
+  replayed. Replay is idempotent because ``session_id`` is unique.
+- A batch that fails for a non-transient reason is retried row by row;
+  records that still fail are moved to ``rejected-<pid>.ndjson`` in the
+  spool directory for inspection. Records whose write keeps failing with
+  an OperationalError (database locked or down) stay in memory and are
+  retried with the next batch, so the spool is only truncated once every
+  record in it has been written or rejected.
+- The queue is bounded. When it stays full for COMPLETION_ENQUEUE_TIMEOUT,
+  submit() returns False and the caller writes synchronously.
+- Pending records are flushed at interpreter shutdown.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from quiz import db
+from quiz.services import QuizService
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_DATETIME_FIELDS = ('started_at', 'completed_at')
+
+def _encode(record):
+    return json.dumps({
+        key: value.isoformat() if key in _DATETIME_FIELDS and value else value
+        for key, value in record.items()
+    }, separators=(',', ':'))
+
+def _decode(line):
+    record = json.loads(line)
+    for key in _DATETIME_FIELDS:
+        if record.get(key):
+            record[key] = datetime.fromisoformat(record[key])
+    return record
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class CompletionWriter:
+    """Background group-commit writer for CompletedQuiz rows."""
+    
+    RETRIES = 3
+    RETRY_INTERVAL = 1.0  # seconds between attempts at records left unsaved
+    
+    def __init__(self, app, queue_size=1000, batch_size=100, flush_interval=0.05,
+                 enqueue_timeout=0.5, spool_dir=None, spool_fsync=False):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spool_dir = spool_dir
+        self.spool_fsync = spool_fsync
+        self._queue_size = queue_size
+        self._start_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._spool = None
+        self._unsaved = []  # records a transient error kept out of the database
+        self.written = 0
+        self.batches = 0
+        self.rejected = 0
+        self.quarantined = 0
+    
+    @classmethod
+    def from_config(cls, app):
+        """Build a writer from COMPLETION_* settings."""
+        config = app.config
+        spool_dir = config.get('COMPLETION_SPOOL_DIR')
+        if spool_dir is None:
+            spool_dir = os.path.join(app.instance_path, 'spool')
+        return cls(
+            app,
+            queue_size=config.get('COMPLETION_QUEUE_SIZE', 1000),
+            batch_size=config.get('COMPLETION_BATCH_SIZE', 100),
+            flush_interval=config.get('COMPLETION_FLUSH_INTERVAL', 0.05),
+            enqueue_timeout=config.get('COMPLETION_ENQUEUE_TIMEOUT', 0.5),
+            spool_dir=spool_dir or None,
+            spool_fsync=config.get('COMPLETION_SPOOL_FSYNC', False)
+        )
+    
+    def _ensure_started(self):
+        # Threads do not survive fork, so each worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self._queue_size)
+            self._spool = None
+            if self.spool_dir:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                path = os.path.join(self.spool_dir, f'completions-{os.getpid()}.ndjson')
+                if os.path.exists(path):
+                    # Left by an earlier process with this pid; replayed by the thread
+                    os.replace(path, os.path.join(self.spool_dir, f'completions-{os.getpid()}.{time.time_ns()}.ndjson'))
+                self._spool = open(path, 'a', encoding='utf-8')
+            self._thread = threading.Thread(target=self._run, name='completion-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.shutdown)
+    
+    def submit(self, record):
+        """Queue a completion record. Returns False if the queue is saturated."""
+        self._ensure_started()
+        with self._spool_lock:
+            try:
+                self._queue.put(record, timeout=self.enqueue_timeout)
+            except queue.Full:
+                self.rejected += 1
+                return False
+            if self._spool is not None:
+                self._spool.write(_encode(record) + '\n')
+                self._spool.flush()
+                if self.spool_fsync:
+                    os.fsync(self._spool.fileno())
+        return True
+    
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+    
+    def shutdown(self):
+        """Write out pending records and stop the thread."""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._spool is not None:
+            empty = self._spool.tell() == 0
+            self._spool.close()
+            if empty:
+                os.remove(self._spool.name)
+    
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'written': self.written,
+            'batches': self.batches,
+            'rejected': self.rejected,
+            'unsaved': len(self._unsaved),
+            'quarantined': self.quarantined
+        }
+    
+    def _run(self):
+        if self.spool_dir:
+            self._replay_spools()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.RETRY_INTERVAL if self._unsaved else None)
+                batch = [item]
+            except queue.Empty:
+                batch = []  # nothing new; just retry the unsaved records
+            deadline = time.monotonic() + self.flush_interval
+            while batch and len(batch) < self.batch_size and batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = bool(batch) and batch[-1] is _STOP
+            # _unsaved is only replaced once the write is over, so stats() stays accurate
+            records = self._unsaved + [record for record in batch if record is not _STOP]
+            try:
+                if records:
+                    self._unsaved = self._write_batch(records)
+            finally:
+                # Always account for the batch, so flush() and shutdown() cannot hang
+                for _ in batch:
+                    self._queue.task_done()
+            self._truncate_spool()
+            if stop:
+                return
+    
+    def _write_batch(self, records):
+        """Write records, falling back to one at a time. Returns those left unsaved."""
+        with self.app.app_context():
+            for attempt in range(self.RETRIES):
+                try:
+                    self._save(records)
+                    self.batches += 1
+                    return []
+                except OperationalError as e:
+                    db.session.rollback()
+                    logger.warning("Completion batch failed (attempt %d): %s", attempt + 1, e)
+                    time.sleep(0.1 * 2 ** attempt)
+                except Exception:
+                    # Not transient (bad data, rollup error, ...): find the culprit
+                    db.session.rollback()
+                    logger.exception("Completion batch failed; writing it row by row")
+                    break
+            return self._write_rows(records)
+    
+    def _write_rows(self, records):
+        rejected = []
+        for index, record in enumerate(records):
+            try:
+                self._save([record])
+            except OperationalError:
+                db.session.rollback()
+                logger.error("Keeping %d completions for a later retry; they remain in the spool",
+                             len(records) - index)
+                unsaved = records[index:]
+                break
+            except Exception:
+                db.session.rollback()
+                logger.exception("Completion for session %s cannot be written", record.get('session_id'))
+                rejected.append(_encode(record))
+        else:
+            unsaved = []
+        if rejected:
+            self._reject(rejected)
+        return unsaved
+    
+    def _save(self, records):
+        written = QuizService.save_completions(records)
+        self.written += written
+        if written < len(records):
+            self._remember_stored(records)
+    
+    def _reject(self, lines):
+        """Move records that cannot be written out of the spool."""
+        self.quarantined += len(lines)
+        if not self.spool_dir:
+            logger.error("Dropping %d completions that cannot be written", len(lines))
+            return
+        path = os.path.join(self.spool_dir, f'rejected-{os.getpid()}.ndjson')
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(line.rstrip('\n') + '\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        logger.error("Moved %d completions that cannot be written to %s", len(lines), path)
+    
+    def _remember_stored(self, records):
+        # Some were already saved (e.g. by another worker): submit() remembered
+        # the freshly scored result, but the stored one is what counts
+        recent = self.app.extensions.get('recent_completions')
+        if recent is None:
+            return
+        stored = QuizService.get_stored_results(record['session_id'] for record in records)
+        for session_id, result_data in stored.items():
+            recent.add(session_id, result_data)
+    
+    def _truncate_spool(self):
+        # Skip if a submitter holds the lock; the next batch will retry
+        if self._spool is None or self._unsaved or not self._spool_lock.acquire(blocking=False):
+            return
+        try:
+            if self._queue.unfinished_tasks == 0:
+                self._spool.truncate(0)
+                self._spool.seek(0)
+        finally:
+            self._spool_lock.release()
+    
+    def _replay_spools(self):
+        """Write out records left behind by processes that died mid-batch."""
+        own_spool = self._spool.name if self._spool is not None else None
+        for path in glob.glob(os.path.join(self.spool_dir, 'completions-*.ndjson')):
+            try:
+                pid = int(os.path.basename(path)[len('completions-'):-len('.ndjson')].split('.')[0])
+            except ValueError:
+                continue
+            if path == own_spool or (pid != os.getpid() and _pid_alive(pid)):
+                continue
+            try:
+                self._replay_spool(path)
+            except Exception:
+                # Leave the file for the next start and carry on with the others
+                logger.exception("Replaying completion spool %s failed", path)
+    
+    def _replay_spool(self, path):
+        records = []
+        try:
+            with open(path, encoding='utf-8') as spool:
+                for line in spool:
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(_decode(line))
+                    except ValueError:  # e.g. a line cut short by the crash
+                        self._reject([line])
+        except FileNotFoundError:
+            return  # another worker replayed it first
+        if records:
+            written = self.written
+            if self._write_batch(records):
+                logger.error("Database unavailable; keeping %s for the next start", path)
+                return
+            logger.info("Replayed %d of %d spooled completions from %s", self.written - written, len(records), path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,43 @@
+"""Shared fixtures: every test gets an app on a throwaway SQLite database."""
+
+import pytest
+
+from quiz import create_app
+
+# A full set of answers for the seeded personality quiz
+ANSWERS = {f'question_{i}': 'yes' for i in range(1, 10)}
+ANSWERS.update({'question_1': 'Ann', 'question_2': '1990-01-01', 'question_3': 'Urban',
+                'question_4': 'Cozy at home', 'question_6': 'Take time alone to think'})
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory for apps sharing this test's temporary directory."""
+    def make(**overrides):
+        config_overrides = {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'quiz.db'),
+            'SESSION_STORE_PATH': str(tmp_path / 'sessions.db'),
+            'COMPLETION_SPOOL_DIR': str(tmp_path / 'spool'),
+            'ARCHIVE_DIR': str(tmp_path / 'archive'),
+            'LOG_LEVEL': 'CRITICAL',
+        }
+        config_overrides.update(overrides)
+        return create_app('development', config_overrides=config_overrides)
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def finish_quiz():
+    """Start a quiz with `client` and submit every answer in one final POST."""
+    def finish(client):
+        client.get('/begin')
+        response = client.post('/submit', data=dict(ANSWERS, next_page='results'))
+        assert response.status_code == 302
+        return response
+    return finish
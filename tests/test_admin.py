@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from quiz import db
+from quiz.models import Question
+from quiz.services import QuizService
+
+@pytest.fixture
+def app(make_app):
+    return make_app(ADMIN_ENABLED=True, ADMIN_PASSWORD='secret', WTF_CSRF_ENABLED=False)
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    client.post('/admin/login', data={'username': 'admin', 'password': 'secret'})
+    return client
+
+def test_unknown_quiz_id_is_404(admin):
+    assert admin.get('/admin/analytics?quiz_id=999').status_code == 404
+    assert admin.get('/admin/export/responses?quiz_id=999').status_code == 404
+
+def test_export_keeps_answers_to_retired_questions(app, admin, finish_quiz):
+    finish_quiz(app.test_client())
+    with app.app_context():
+        db.session.get(Question, 5).is_active = False
+        db.session.commit()
+    
+    body = admin.get('/admin/export/responses?format=ndjson&quiz_id=1').get_data(as_text=True)
+    question_ids = {str(json.loads(line)['question_id']) for line in body.splitlines()}
+    assert '5' in question_ids
+    assert admin.get('/admin/analytics?quiz_id=1').status_code == 200
+
+def test_edit_quiz_version_collision_is_a_form_error(app, admin):
+    with app.app_context():
+        QuizService.copy_quiz(1, 'v2')
+    response = admin.post('/admin/quiz/1/edit', data={
+        'slug': 'personality-assessment', 'title': 'Personality', 'description': '',
+        'is_active': 'y', 'version': 'v2'
+    })
+    assert response.status_code == 200
+    assert b'already has a version v2' in response.data
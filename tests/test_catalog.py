@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+from quiz import db
+from quiz.services import QuizService
+
+@pytest.fixture
+def app(make_app):
+    return make_app(QUIZ_MODE='single_page')
+
+def _catalog_url(client, prefix=''):
+    response = client.get(prefix + '/begin')
+    assert response.status_code == 200
+    return re.search(r"CATALOG_URL = '([^']+)'", response.get_data(as_text=True)).group(1)
+
+def _new_version(app):
+    with app.app_context():
+        draft = QuizService.copy_quiz(1, 'v2')
+        QuizService.activate_quiz(draft.id)
+        return draft.id
+
+def test_catalog_is_cacheable(client):
+    url = _catalog_url(client)
+    assert url.startswith('/catalog/1/')
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json['pages']
+    assert response.headers['ETag'].startswith('W/')
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_stale_version_redirects_to_current(client):
+    current = _catalog_url(client)
+    response = client.get('/catalog/1/0123456789ab.json')
+    assert response.status_code == 302
+    assert response.location.endswith(current)
+
+def test_unknown_or_unrelated_quiz_is_not_served(app, client):
+    _catalog_url(client)
+    assert client.get('/catalog/999/0123456789ab.json').status_code == 404
+    with app.app_context():
+        draft_id = QuizService.copy_quiz(1, 'draft').id
+    assert client.get(f'/catalog/{draft_id}/0123456789ab.json').status_code == 404
+
+def test_session_finishes_on_its_version(app, client):
+    old_url = _catalog_url(client)
+    new_id = _new_version(app)
+    
+    assert client.get(old_url).status_code == 200  # the session's own version
+    other = app.test_client()
+    assert other.get(old_url).status_code == 404  # no longer live, not theirs
+    assert _catalog_url(other).startswith(f'/catalog/{new_id}/')
+
+def test_scoped_url_checks_slug(app, client):
+    url = _catalog_url(client, prefix='/q/personality-assessment')
+    assert url.startswith('/q/personality-assessment/catalog/1/')
+    assert client.get(url).status_code == 200
+    with app.app_context():
+        other = QuizService.copy_quiz(1, 'other-v1')
+        other.slug = 'other'
+        db.session.commit()
+        QuizService.activate_quiz(other.id)
+        other_id = other.id
+    assert client.get(f'/q/other/catalog/{other_id}/0123456789ab.json').status_code == 302
+    assert client.get(f'/q/personality-assessment/catalog/{other_id}/0123456789ab.json').status_code == 404
@@ -0,0 +1,47 @@
+from flask import session
+
+from quiz import db
+from quiz.models import CompletedQuiz
+from quiz.services import QuizService, RecentCompletions, SessionService
+
+def _session_data():
+    SessionService.init_session(session, 1)
+    data = SessionService.get_session_data(session)
+    data['responses'] = {'4': 'Cozy at home', '5': 'yes'}
+    return data
+
+def test_duplicate_submit_returns_stored_result(app):
+    with app.test_request_context('/'):
+        data = _session_data()
+        first = QuizService.complete_quiz(data, '1.2.3.4', 'ua')
+        
+        # Stored row with a different result, as if scored by an older profile
+        row = CompletedQuiz.query.filter_by(session_id=data['session_id']).one()
+        row.result_data = '{"result_type": "Stored"}'
+        db.session.commit()
+        assert QuizService.complete_quiz(data, '1.2.3.4', 'ua') == first  # from memory
+        
+        # Another worker (or a restart) has nothing in memory: the insert conflicts
+        app.extensions['recent_completions'] = RecentCompletions()
+        assert QuizService.complete_quiz(data, '1.2.3.4', 'ua') == {'result_type': 'Stored'}
+        assert CompletedQuiz.query.filter_by(session_id=data['session_id']).count() == 1
+
+def test_write_behind_double_submit(make_app):
+    app = make_app(COMPLETION_WRITE_MODE='write_behind')
+    writer = app.extensions['completion_writer']
+    with app.test_request_context('/'):
+        data = _session_data()
+        first = QuizService.complete_quiz(data, '1.2.3.4', 'ua')
+        assert QuizService.complete_quiz(data, '1.2.3.4', 'ua') == first
+        writer.flush()
+        assert writer.stats()['written'] == 1
+        assert CompletedQuiz.query.filter_by(session_id=data['session_id']).count() == 1
+    writer.shutdown()
+
+def test_repeated_final_post_shows_same_results(client, finish_quiz):
+    finish_quiz(client)
+    response = client.post('/submit', data={'next_page': 'results'})
+    assert response.status_code == 302 and response.location.endswith('/results')
+    assert client.get('/results').status_code == 200
+    with client.application.app_context():
+        assert CompletedQuiz.query.count() == 1
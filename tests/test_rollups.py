@@ -0,0 +1,27 @@
+import pytest
+
+from quiz.analytics import rebuild_rollups
+from quiz.models import AnalyticsRollup
+
+def _counts(metric):
+    return sorted((row.dimension, row.count) for row in AnalyticsRollup.query.filter_by(metric=metric))
+
+@pytest.mark.parametrize('sink', ['db', 'file'])
+def test_rebuild_keeps_starts_and_abandons(make_app, tmp_path, finish_quiz, sink):
+    app = make_app(FUNNEL_SINK=sink, FUNNEL_LOG_PATH=str(tmp_path / 'funnel.ndjson'))
+    for _ in range(2):
+        client = app.test_client()
+        client.get('/begin')
+        client.get('/questions/1')
+        client.post('/cleanup_session')  # tab closed on page 1
+    finish_quiz(app.test_client())
+    app.extensions['funnel'].flush()
+    app.extensions['rollups'].flush()
+    
+    with app.app_context():
+        starts, abandons = _counts('start'), _counts('abandon')
+        assert abandons == [('1', 2)]
+        assert rebuild_rollups() == 1
+        assert _counts('start') == starts
+        assert _counts('abandon') == abandons
+        assert _counts('completion') == [('', 1)]
@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from quiz.models import CompletedQuiz
+from quiz.services import QuizService
+from quiz.writer import CompletionWriter
+
+def _record(session_id, **fields):
+    record = {'session_id': session_id, 'quiz_id': 1, 'user_ip': '1.2.3.4', 'user_agent_id': None,
+              'started_at': datetime(2024, 1, 1), 'completed_at': datetime(2024, 1, 1),
+              'result_type': 'Type A', 'result_data': '{"result_type": "Type A"}',
+              'responses': '{"4": "Cozy at home"}'}
+    record.update(fields)
+    return record
+
+def _spooled(record):
+    return json.dumps(record, default=datetime.isoformat)
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+def _stored(app):
+    with app.app_context():
+        return sorted(row.session_id for row in CompletedQuiz.query)
+
+def test_replay_quarantines_poison_records(app, tmp_path):
+    spool_dir = tmp_path / 'spool'
+    spool_dir.mkdir()
+    lines = [_spooled(_record('good')), _spooled(_record('poison', responses='{not json')), '{"cut sho']
+    (spool_dir / f'completions-{_dead_pid()}.ndjson').write_text('\n'.join(lines))
+    (spool_dir / f'completions-{_dead_pid()}.ndjson').write_text(_spooled(_record('other')) + '\n')
+    
+    writer = CompletionWriter(app, spool_dir=str(spool_dir))
+    writer.submit(_record('live'))
+    writer.flush()
+    
+    assert _stored(app) == ['good', 'live', 'other']
+    assert writer.stats()['quarantined'] == 2
+    rejected = (spool_dir / f'rejected-{os.getpid()}.ndjson').read_text().splitlines()
+    assert '{"cut sho' in rejected
+    assert [json.loads(line)['session_id'] for line in rejected if line != '{"cut sho'] == ['poison']
+    writer.shutdown()
+    assert os.listdir(spool_dir) == [f'rejected-{os.getpid()}.ndjson']  # replayed spools removed
+
+def test_failed_batch_does_not_pin_spool(app, tmp_path):
+    writer = CompletionWriter(app, spool_dir=str(tmp_path / 'spool'))
+    writer.submit(_record('poison', responses='{not json'))
+    writer.submit(_record('fine'))
+    writer.flush()
+    time.sleep(0.2)  # the spool is truncated just after the batch is accounted for
+    
+    assert _stored(app) == ['fine']
+    assert writer.stats()['quarantined'] == 1
+    assert os.path.getsize(writer._spool.name) == 0
+    writer.shutdown()
+
+def test_transient_failure_is_retried(app, tmp_path, monkeypatch):
+    save = QuizService.save_completions
+    database_down = [True]
+    
+    def flaky_save(records):
+        if database_down[0]:
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        return save(records)
+    
+    monkeypatch.setattr(QuizService, 'save_completions', staticmethod(flaky_save))
+    monkeypatch.setattr(CompletionWriter, 'RETRY_INTERVAL', 0.05)
+    writer = CompletionWriter(app, spool_dir=str(tmp_path / 'spool'))
+    writer.submit(_record('late'))
+    writer.flush()
+    assert writer.stats()['unsaved'] == 1
+    assert os.path.getsize(writer._spool.name) > 0  # still the only copy
+    
+    database_down[0] = False
+    deadline = time.monotonic() + 5
+    while writer.stats()['unsaved'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _stored(app) == ['late']
+    assert writer.stats()['quarantined'] == 0
+    writer.shutdown()
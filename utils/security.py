@@ -0,0 +1,16 @@
+"""Input hygiene helpers for admin forms."""
+
+import unicodedata
+
+def sanitize_input(value, max_length=200):
+    """Strip control characters and surrounding whitespace, and cap the length.
+    
+    Output escaping is left to Jinja's autoescaping.
+    """
+    if value is None:
+        return None
+    cleaned = ''.join(
+        ch for ch in str(value)
+        if ch in '\n\t' or unicodedata.category(ch)[0] != 'C'
+    )
+    return cleaned.strip()[:max_length]
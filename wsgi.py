@@ -0,0 +1,11 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The config is chosen by FLASK_CONFIG (or FLASK_ENV) and defaults to production.
+"""
+
+from config import config_name_from_env
+from quiz import create_app
+
+app = create_app(config_name_from_env(default='production'))